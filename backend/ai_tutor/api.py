@@ -148,12 +148,25 @@ async def _shutdown_async_clients():
         import logging
         logging.getLogger("ai_tutor").warning("Failed to close openai client on shutdown: %s", exc)
 
-# --- Startup event for ephemeral GC ---
-from ai_tutor.routers.whiteboard_ws import start_ephemeral_gc
+# --- Startup event for ephemeral expiry ---
+from ai_tutor.routers.whiteboard_ws import start_ephemeral_gc, shutdown_whiteboard
 
 @app.on_event("startup")
 async def _startup_whiteboard_gc():
-    """Launch the background GC loop for ephemeral whiteboard entries."""
+    """Launch the background expiry scheduler for ephemeral whiteboard entries."""
     start_ephemeral_gc()
 
+@app.on_event("startup")
+async def _startup_layout_store():
+    """Select where layout-allocator boards live (LAYOUT_ALLOCATOR_STORE)."""
+    from ai_tutor.dependencies import REDIS_CLIENT
+    from ai_tutor.services import layout_allocator
+
+    layout_allocator.configure_store(layout_allocator.store_from_env(REDIS_CLIENT))
+
+@app.on_event("shutdown")
+async def _shutdown_whiteboard_persistence():
+    """Write any unpersisted whiteboard changes before the worker exits."""
+    await shutdown_whiteboard()
+
 # To run the API: uvicorn ai_tutor.api:app --reload --port 8001 
\ No newline at end of file
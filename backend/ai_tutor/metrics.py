@@ -1,4 +1,4 @@
-from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client import Counter, Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST
 from fastapi import Response
 
 # Core counters / histograms (feel free to extend)
@@ -14,6 +14,127 @@ TOOL_LATENCY = Histogram(
     ["tool_name"],
 )
 
+# --- Whiteboard (Yjs) persistence ---
+WHITEBOARD_PERSIST_WRITES = Counter(
+    "ai_tutor_whiteboard_persist_writes_total",
+    "Number of Redis writes issued by the whiteboard write-behind persister",
+)
+
+WHITEBOARD_PERSIST_BYTES = Counter(
+    "ai_tutor_whiteboard_persist_bytes_total",
+    "Bytes written to Redis by the whiteboard write-behind persister",
+)
+
+WHITEBOARD_COMPACTIONS = Counter(
+    "ai_tutor_whiteboard_compactions_total",
+    "Number of times a whiteboard update log was folded into a new base snapshot",
+)
+
+WHITEBOARD_UPDATES_COALESCED = Histogram(
+    "ai_tutor_whiteboard_updates_per_flush",
+    "Number of client updates folded into a single persistence flush",
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 1000),
+)
+
+WHITEBOARD_UNPERSISTED_AGE = Histogram(
+    "ai_tutor_whiteboard_unpersisted_age_seconds",
+    "Age of the oldest unpersisted change when a flush is written (observed data-loss window)",
+)
+
+WHITEBOARD_LOSS_WINDOW = Gauge(
+    "ai_tutor_whiteboard_loss_window_seconds",
+    "Configured upper bound on how long a whiteboard change may stay unpersisted",
+)
+
+WHITEBOARD_SNAPSHOT_RATIO = Histogram(
+    "ai_tutor_whiteboard_snapshot_ratio",
+    "Stored size / raw size of whiteboard base snapshots written by compaction",
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.1),
+)
+
+WHITEBOARD_RESIDENT_DOCS = Gauge(
+    "ai_tutor_whiteboard_resident_docs",
+    "Whiteboard documents currently held in memory by this worker",
+)
+
+WHITEBOARD_RESIDENT_BYTES = Gauge(
+    "ai_tutor_whiteboard_resident_bytes",
+    "Estimated memory held by resident whiteboard documents",
+)
+
+WHITEBOARD_DOC_EVICTIONS = Counter(
+    "ai_tutor_whiteboard_doc_evictions_total",
+    "Idle whiteboard documents persisted and dropped to stay within the memory budget",
+)
+
+# --- Whiteboard (Yjs) fan-out ---
+WHITEBOARD_PEER_OVERFLOWS = Counter(
+    "ai_tutor_whiteboard_peer_overflows_total",
+    "Times a whiteboard peer's outgoing queue overflowed, by the action taken",
+    ["action"],
+)
+
+WHITEBOARD_PEER_QUEUE_DEPTH = Histogram(
+    "ai_tutor_whiteboard_peer_queue_depth",
+    "Outgoing queue depth of a whiteboard peer when an update is enqueued",
+    buckets=(0, 1, 2, 5, 10, 25, 50, 100, 250, 1000),
+)
+
+WHITEBOARD_COALESCE_UPDATES = Counter(
+    "ai_tutor_whiteboard_coalesce_updates_total",
+    "Whiteboard updates entering (stage=in) and leaving (stage=out) frame-window coalescing",
+    ["stage"],
+)
+
+WHITEBOARD_COALESCE_BYTES = Counter(
+    "ai_tutor_whiteboard_coalesce_bytes_total",
+    "Bytes of whiteboard updates entering (stage=in) and leaving (stage=out) frame-window coalescing",
+    ["stage"],
+)
+
+WHITEBOARD_INITIAL_SYNC_BYTES = Histogram(
+    "ai_tutor_whiteboard_initial_sync_bytes",
+    "Bytes sent to a connecting whiteboard client to bring it up to date, by protocol",
+    ["protocol"],
+    buckets=(16, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+)
+
+WHITEBOARD_EPHEMERAL_EXPIRED = Counter(
+    "ai_tutor_whiteboard_ephemeral_expired_total",
+    "Ephemeral whiteboard entries (pointers, highlights) deleted on expiry",
+)
+
+WHITEBOARD_EPHEMERAL_EXPIRY_LAG = Histogram(
+    "ai_tutor_whiteboard_ephemeral_expiry_lag_seconds",
+    "Delay between an ephemeral entry's expiresAt and its actual deletion",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 10),
+)
+
+
+WHITEBOARD_INGRESS_LIMITED = Counter(
+    "ai_tutor_whiteboard_ingress_limited_total",
+    "Incoming whiteboard messages over a per-connection limit, by reason (rate/size) and action taken",
+    ["reason", "action"],
+)
+
+WHITEBOARD_INGRESS_DELAY = Histogram(
+    "ai_tutor_whiteboard_ingress_delay_seconds",
+    "Time a rate-limited whiteboard socket was paused before its next message was processed",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+
+WHITEBOARD_DIGEST_BUILDS = Counter(
+    "ai_tutor_whiteboard_digest_builds_total",
+    "Board summary requests by how the digest was produced (cached, incremental, full, snapshot)",
+    ["mode"],
+)
+
+SESSION_ACCESS_CHECKS = Counter(
+    "ai_tutor_session_access_checks_total",
+    "Session ownership checks, by whether they were answered from cache",
+    ["result"],
+)
+
 
 def metrics_endpoint():
     """FastAPI route handler for /metrics (scraped by Prometheus)."""
@@ -40,6 +40,7 @@ from ai_tutor.exceptions import ToolInputError  # Import custom tool input error
 
 # Import allocator and template resolver services
 from ai_tutor.services import layout_allocator as _alloc
+from ai_tutor.services import session_access
 from ai_tutor.services import layout_templates as _template_resolver
 
 router = APIRouter()
@@ -212,6 +213,12 @@ async def tutor_stream(
             log.info(f"WebSocket: DB fetch completed for session {session_id}. Data found: {'Yes' if row else 'No'}")
             if row:
                  log.debug(f"WebSocket: Raw data dict from DB for {session_id}: {row}")
+                 # The row was selected by owner, so the whiteboard socket and
+                 # board summary opened next can skip their own lookup.
+                 session_access.remember(user.id, session_id)
+            else:
+                 # Deleted or not this user's: drop any verdict cached earlier
+                 session_access.invalidate(session_id, user.id)
 
         except APIError as api_err:
             if api_err.code == "204":
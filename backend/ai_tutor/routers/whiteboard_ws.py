@@ -5,12 +5,23 @@ from __future__ import annotations
 # whiteboard document.  This endpoint is intentionally minimal: it receives raw Yjs
 # binary updates from each connected client, applies them to the authoritative
 # server-side YDoc, and immediately relays the same binary payload to all other
-# clients connected to the *same* session.  When the last client disconnects the
-# current state vector is persisted to a local file so that it can be restored on
-# the next connection (a more robust Redis-based implementation will follow in
-# Phase-1).
+# clients connected to the *same* session.  Local transactions committed within a
+# short frame window are merged into one update before they are broadcast,
+# relayed and persisted.  Sends never happen inline: every connection has a
+# bounded outgoing queue drained by its own writer task.  Persistence is write-behind: applied
+# updates are buffered and appended to a Redis update log once per interval (and
+# on last disconnect / shutdown); the log is periodically compacted into a base
+# snapshot (see `ai_tutor.services.whiteboard_store`).
 #
-#   Route:  /ws/v2/session/{session_id}/whiteboard
+#   Route:  /ws/v2/session/{session_id}/whiteboard[?proto=2]
+#
+# Without ``proto`` the socket carries raw Yjs updates and the client gets the
+# full document on connect.  With ``?proto=2`` messages are framed as
+# y-protocols sync messages and the client receives only the diff against the
+# state vector it announces (see `ai_tutor.services.whiteboard_protocol`).
+# Those sockets also carry ephemeral messages (pointer pings, highlights,
+# question tags): relayed to peers and kept in a TTL'd in-memory store, but
+# never applied to the YDoc (see `ai_tutor.services.whiteboard_ephemeral`).
 #
 # Security & tenancy rules mirror those of the existing tutor_ws endpoint: the
 # client must include a valid Supabase JWT (either via the standard
@@ -24,17 +35,52 @@ from __future__ import annotations
 
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
 from uuid import UUID
-from y_py import YDoc, apply_update, encode_state_as_update  # type: ignore
+from y_py import YDoc, apply_update, encode_state_as_update, encode_state_vector  # type: ignore
+from collections import deque
+from contextlib import contextmanager
 import asyncio
+import heapq
+import json
 import logging
 import os
-from typing import Dict, Set
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Set, Tuple
 import time
 
 from ai_tutor.dependencies import get_supabase_client, get_redis_client
+from ai_tutor.services import (
+    board_digest,
+    layout_allocator,
+    session_access,
+    whiteboard_ephemeral,
+    whiteboard_protocol,
+    whiteboard_relay,
+    whiteboard_store,
+    whiteboard_view,
+)
 from supabase import Client
 from redis.asyncio import Redis  # type: ignore
 
+from ai_tutor.metrics import (
+    WHITEBOARD_COALESCE_BYTES,
+    WHITEBOARD_COALESCE_UPDATES,
+    WHITEBOARD_COMPACTIONS,
+    WHITEBOARD_DOC_EVICTIONS,
+    WHITEBOARD_EPHEMERAL_EXPIRED,
+    WHITEBOARD_EPHEMERAL_EXPIRY_LAG,
+    WHITEBOARD_INGRESS_DELAY,
+    WHITEBOARD_INGRESS_LIMITED,
+    WHITEBOARD_INITIAL_SYNC_BYTES,
+    WHITEBOARD_LOSS_WINDOW,
+    WHITEBOARD_PEER_OVERFLOWS,
+    WHITEBOARD_PEER_QUEUE_DEPTH,
+    WHITEBOARD_PERSIST_BYTES,
+    WHITEBOARD_PERSIST_WRITES,
+    WHITEBOARD_RESIDENT_BYTES,
+    WHITEBOARD_RESIDENT_DOCS,
+    WHITEBOARD_UNPERSISTED_AGE,
+    WHITEBOARD_UPDATES_COALESCED,
+)
+
 # We reuse the private helper from the chat WebSocket router for JWT validation.
 from ai_tutor.routers.tutor_ws import _authenticate_ws  # pylint: disable=protected-access
 
@@ -42,73 +88,1055 @@ log = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/ws/v2")  # Final path = /ws/v2/session/{id}/whiteboard
 
+# The only owner value learner-side clients may write
+_VALID_SOURCE = "user"
+
+# Write-behind persistence.  Applied updates are buffered in memory and
+# appended to the Redis update log at most `_PERSIST_INTERVAL_S` after the
+# first buffered change, or immediately once `_PERSIST_MAX_BYTES` have
+# accumulated.  The interval is therefore the upper bound on changes lost if
+# the worker dies.
+_PERSIST_INTERVAL_S = float(os.environ.get("WHITEBOARD_PERSIST_INTERVAL_S", "2.0"))
+_PERSIST_MAX_BYTES = int(os.environ.get("WHITEBOARD_PERSIST_MAX_BYTES", str(256 * 1024)))
+
+WHITEBOARD_LOSS_WINDOW.set(_PERSIST_INTERVAL_S)
+
+# Fan updates out to other workers hosting the same session via Redis pub/sub.
+_RELAY_ENABLED = os.environ.get("WHITEBOARD_RELAY_ENABLED", "1") != "0"
+
+# y-py reports read-only transactions with this (empty) update payload.
+_EMPTY_UPDATE = b"\x00\x00"
+
+# Frame-window coalescing.  Local transactions committed within this window
+# (freehand strokes emit dozens per second) are merged into a single update –
+# the state-vector diff since the window opened – which is then broadcast,
+# relayed and persisted once.  When that diff would be larger than the
+# window's own updates (big delete sets) they are forwarded as they are.
+# 0 emits every transaction on its own.
+_COALESCE_WINDOW_S = float(os.environ.get("WHITEBOARD_COALESCE_WINDOW_MS", "16")) / 1000.0
+
+# Memory budget for resident documents.  Each doc's footprint is estimated as
+# its encoded size times `_MEMORY_OVERHEAD_FACTOR` (YDoc structs + the decoded
+# board view).  When the total exceeds the budget, the least recently active
+# docs idle for at least `_EVICT_MIN_IDLE_S` are persisted and dropped; their
+# sockets are closed (1001) and clients reconnect into a fresh hydrate.
+_MEMORY_BUDGET_BYTES = int(os.environ.get("WHITEBOARD_MEMORY_BUDGET_MB", "512")) * 1024 * 1024
+_MEMORY_OVERHEAD_FACTOR = int(os.environ.get("WHITEBOARD_MEMORY_OVERHEAD_FACTOR", "24"))
+_EVICT_MIN_IDLE_S = float(os.environ.get("WHITEBOARD_EVICT_MIN_IDLE_S", "120"))
+_EVICT_CHECK_INTERVAL_S = 5.0
+
+# Per-peer outgoing queues.  When a peer has more than `_PEER_QUEUE_MAX`
+# messages waiting, `_SLOW_PEER_POLICY` decides what happens to it:
+#   "resync"     – drop its backlog and send one full-state update instead
+#   "disconnect" – close the socket (1013); the client reconnects and gets
+#                  the full state on join.
+POLICY_RESYNC = "resync"
+POLICY_DISCONNECT = "disconnect"
+_PEER_QUEUE_MAX = int(os.environ.get("WHITEBOARD_PEER_QUEUE_MAX", "256"))
+_SLOW_PEER_POLICY = os.environ.get("WHITEBOARD_SLOW_PEER_POLICY", POLICY_RESYNC)
+if _SLOW_PEER_POLICY not in (POLICY_RESYNC, POLICY_DISCONNECT):
+    log.warning("[whiteboard_ws] Unknown WHITEBOARD_SLOW_PEER_POLICY %r – using %r", _SLOW_PEER_POLICY, POLICY_RESYNC)
+    _SLOW_PEER_POLICY = POLICY_RESYNC
+
+# Per-connection ingress limits.  Each socket has two token buckets (messages
+# and bytes per second, each with a burst allowance) and a cap on the size of
+# a single message.  `_INGRESS_ACTION` decides what happens to a message that
+# exceeds its rate:
+#   "delay" – wait for tokens before reading on (TCP back-pressure)
+#   "drop"  – discard the message
+#   "close" – close the socket (1013, the client reconnects and resyncs)
+# Oversized messages cannot be delayed; `_OVERSIZE_ACTION` is "drop" or
+# "close" (1009).  Dropped Yjs updates are recovered by the client's next
+# sync handshake.
+INGRESS_DELAY = "delay"
+INGRESS_DROP = "drop"
+INGRESS_CLOSE = "close"
+_INGRESS_MSGS_PER_S = float(os.environ.get("WHITEBOARD_INGRESS_MSGS_PER_S", "60"))
+_INGRESS_MSG_BURST = float(os.environ.get("WHITEBOARD_INGRESS_MSG_BURST", "120"))
+_INGRESS_BYTES_PER_S = float(os.environ.get("WHITEBOARD_INGRESS_BYTES_PER_S", str(256 * 1024)))
+_MAX_UPDATE_BYTES = int(os.environ.get("WHITEBOARD_MAX_UPDATE_BYTES", str(1024 * 1024)))
+_INGRESS_BYTE_BURST = float(os.environ.get("WHITEBOARD_INGRESS_BYTE_BURST", str(_MAX_UPDATE_BYTES)))
+_INGRESS_ACTION = os.environ.get("WHITEBOARD_INGRESS_ACTION", INGRESS_DELAY)
+if _INGRESS_ACTION not in (INGRESS_DELAY, INGRESS_DROP, INGRESS_CLOSE):
+    log.warning("[whiteboard_ws] Unknown WHITEBOARD_INGRESS_ACTION %r – using %r", _INGRESS_ACTION, INGRESS_DELAY)
+    _INGRESS_ACTION = INGRESS_DELAY
+_OVERSIZE_ACTION = os.environ.get("WHITEBOARD_OVERSIZE_ACTION", INGRESS_CLOSE)
+if _OVERSIZE_ACTION not in (INGRESS_DROP, INGRESS_CLOSE):
+    log.warning("[whiteboard_ws] Unknown WHITEBOARD_OVERSIZE_ACTION %r – using %r", _OVERSIZE_ACTION, INGRESS_CLOSE)
+    _OVERSIZE_ACTION = INGRESS_CLOSE
+
+# ------------------------- Write-behind persister ------------------------- #
+
+class _PersistScheduler:
+    """Coalesces update-log writes for one session's YDoc.
+
+    Every locally committed transaction on the doc (client updates, sanitiser
+    patches, GC deletions) is handed to :meth:`mark_dirty` and buffered.
+    A background task appends the buffer to the Redis update log in a single
+    ``RPUSH`` once the interval elapses or the byte threshold is hit, and
+    triggers compaction when the log grows past its thresholds.  Nothing here
+    runs under the session lock.
+    """
+
+    def __init__(
+        self,
+        session_id: str,
+        redis: Redis,
+        interval_s: float = _PERSIST_INTERVAL_S,
+        max_bytes: int = _PERSIST_MAX_BYTES,
+    ) -> None:
+        self.session_id = session_id
+        self.redis = redis
+        self.interval_s = interval_s
+        self.max_bytes = max_bytes
+        self._pending: List[bytes] = []
+        self._pending_bytes = 0
+        self._dirty_since: Optional[float] = None
+        self._tail_bytes = 0
+        self._kick = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._compaction: Optional[asyncio.Task] = None
+
+    @property
+    def dirty(self) -> bool:
+        return self._dirty_since is not None
+
+    def mark_dirty(self, update: bytes) -> None:
+        """Buffer *update* for the next flush and schedule one if needed."""
+        if self._dirty_since is None:
+            self._dirty_since = time.monotonic()
+        self._pending.append(update)
+        self._pending_bytes += len(update)
+        if self._pending_bytes >= self.max_bytes:
+            self._kick.set()
+        if self._task is None or self._task.done():
+            try:
+                self._task = asyncio.get_running_loop().create_task(self._run())
+            except RuntimeError:
+                # No loop (e.g. doc hydrated synchronously) – close() flushes.
+                self._task = None
+
+    def discard_pending(self) -> None:
+        """Forget buffered updates that are already persisted (e.g. on hydrate)."""
+        self._pending, self._pending_bytes, self._dirty_since = [], 0, None
+        self._kick.clear()
+
+    async def _run(self) -> None:
+        while self._dirty_since is not None:
+            remaining = self.interval_s - (time.monotonic() - self._dirty_since)
+            if remaining > 0 and not self._kick.is_set():
+                try:
+                    await asyncio.wait_for(self._kick.wait(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    pass
+            if not await self.flush():
+                # Back off instead of hammering an unavailable Redis.
+                await asyncio.sleep(self.interval_s)
+
+    async def flush(self) -> bool:
+        """Append buffered updates to the log if dirty.  Returns False on failure."""
+        if self._dirty_since is None:
+            return True
+        self._kick.clear()
+        dirty_since, batch, batch_bytes = self._dirty_since, self._pending, self._pending_bytes
+        self.discard_pending()
+
+        try:
+            tail_length = await whiteboard_store.append_updates(self.redis, self.session_id, batch)
+        except Exception as persist_err:  # pragma: no cover
+            log.error(
+                "[whiteboard_ws] Redis persist failed for %s: %s",
+                self.session_id,
+                persist_err,
+                exc_info=True,
+            )
+            # Put the batch back in front so the next attempt keeps the order.
+            self._pending = batch + self._pending
+            self._pending_bytes += batch_bytes
+            self._dirty_since = min(dirty_since, self._dirty_since or dirty_since)
+            return False
+
+        WHITEBOARD_PERSIST_WRITES.inc()
+        WHITEBOARD_PERSIST_BYTES.inc(batch_bytes)
+        WHITEBOARD_UPDATES_COALESCED.observe(len(batch))
+        WHITEBOARD_UNPERSISTED_AGE.observe(time.monotonic() - dirty_since)
+
+        self._tail_bytes += batch_bytes
+        if whiteboard_store.needs_compaction(tail_length, self._tail_bytes):
+            self._schedule_compaction()
+        return True
+
+    def _schedule_compaction(self) -> None:
+        if self._compaction is not None and not self._compaction.done():
+            return
+        self._tail_bytes = 0
+        self._compaction = asyncio.create_task(self._compact())
+
+    async def _compact(self) -> None:
+        try:
+            if await whiteboard_store.compact(self.redis, self.session_id):
+                WHITEBOARD_COMPACTIONS.inc()
+        except Exception as exc:  # pragma: no cover
+            log.error("[whiteboard_ws] Compaction failed for %s: %s", self.session_id, exc, exc_info=True)
+
+    async def close(self) -> bool:
+        """Stop the background task and write any outstanding changes."""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        flushed = await self.flush()
+        if self._compaction is not None:
+            # Let an in-flight compaction finish; it is atomic either way.
+            await self._compaction
+            self._compaction = None
+        return flushed
+
+
+# --------------------------- Per-peer writer ---------------------------- #
+
+class _PeerWriter:
+    """Bounded outgoing queue and writer task for one websocket.
+
+    :meth:`send` never awaits, so broadcasting under the session lock costs
+    O(peers) appends regardless of how fast each client drains its socket.
+    Queued entries are ``(is_update, message)`` pairs already framed for the
+    peer's protocol; a ``None`` message stands for "send the full document
+    state".  Only peers created with ``ephemeral=True`` (sync protocol)
+    receive ephemeral-channel messages.
+    """
+
+    def __init__(
+        self,
+        ws: WebSocket,
+        full_state: Callable[[], bytes],
+        on_close: Callable[["_PeerWriter"], None],
+        max_queue: int = _PEER_QUEUE_MAX,
+        policy: str = _SLOW_PEER_POLICY,
+        frame: Optional[Callable[[bytes], bytes]] = None,
+        ephemeral: bool = False,
+    ) -> None:
+        self.ws = ws
+        self.max_queue = max_queue
+        self.policy = policy
+        self.ephemeral = ephemeral
+        self.closed = False
+        self._full_state = full_state
+        self._on_close = on_close
+        # Wraps Yjs updates for the peer's protocol (identity for legacy peers)
+        self._frame = frame
+        self._queue: Deque[Tuple[bool, Optional[bytes]]] = deque()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    @property
+    def backlog(self) -> int:
+        return len(self._queue)
+
+    def send(self, update: bytes) -> bool:
+        """Queue Yjs *update* for this peer.  Returns False if the peer was dropped."""
+        return self._enqueue(True, self._frame(update) if self._frame else update)
+
+    def send_message(self, message: bytes) -> bool:
+        """Queue an already framed control or ephemeral *message*.
+
+        Subject to the same bound, but never dropped by a resync: the full
+        document state only stands in for document updates.
+        """
+        return self._enqueue(False, message)
+
+    def _enqueue(self, is_update: bool, message: bytes) -> bool:
+        if self.closed:
+            return False
+        WHITEBOARD_PEER_QUEUE_DEPTH.observe(len(self._queue))
+        if len(self._queue) < self.max_queue:
+            self._queue.append((is_update, message))
+        else:
+            WHITEBOARD_PEER_OVERFLOWS.labels(action=self.policy).inc()
+            kept = [entry for entry in self._queue if not entry[0]]
+            if not is_update:
+                kept.append((False, message))
+            if self.policy == POLICY_DISCONNECT or len(kept) >= self.max_queue:
+                log.warning("[whiteboard_ws] Disconnecting slow peer (%d queued updates)", len(self._queue))
+                self.abort(code=1013, reason="Too far behind")
+                return False
+            # A full-state update (computed when it is actually sent) covers
+            # every queued document update and *message* itself; control and
+            # ephemeral frames stay queued in order ahead of it.
+            log.info("[whiteboard_ws] Peer fell behind by %d updates – scheduling resync", len(self._queue))
+            self._queue.clear()
+            self._queue.extend(kept)
+            self._queue.append((True, None))
+        self._wakeup.set()
+        return True
+
+    async def _run(self) -> None:
+        try:
+            while True:
+                while not self._queue:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                _, item = self._queue.popleft()
+                if item is None:
+                    state = self._full_state()
+                    item = self._frame(state) if self._frame else state
+                await self.ws.send_bytes(item)
+        except asyncio.CancelledError:
+            raise
+        except (WebSocketDisconnect, RuntimeError):
+            self._mark_closed()
+        except Exception as exc:  # pragma: no cover
+            log.error("[whiteboard_ws] Unexpected send error: %s", exc, exc_info=True)
+            self._mark_closed()
+
+    def _mark_closed(self) -> None:
+        if not self.closed:
+            self.closed = True
+            self._queue.clear()
+            self._on_close(self)
+
+    def abort(self, code: int, reason: str) -> None:
+        """Drop the peer and close its socket in the background."""
+        self._mark_closed()
+        self._task.cancel()
+        asyncio.create_task(self._close_socket(code, reason))
+
+    async def _close_socket(self, code: int, reason: str) -> None:
+        try:
+            await asyncio.wait_for(self.ws.close(code=code, reason=reason), timeout=1.0)
+        except Exception:  # Socket already gone or stalled – nothing left to do
+            pass
+
+    async def close(self) -> None:
+        """Stop the writer task; queued updates are discarded."""
+        self._mark_closed()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+
+# ---------------------------- Ingress limits ---------------------------- #
+
+class _TokenBucket:
+    """Refills at *rate* tokens/s up to *burst*; debt is allowed for delaying."""
+
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self._stamp = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    def wait_time(self, n: float, now: float) -> float:
+        """Seconds until *n* tokens are available (0 if they are now)."""
+        self._refill(now)
+        if self.rate <= 0 or self.tokens >= n:
+            return 0.0
+        return (n - self.tokens) / self.rate
+
+    def take(self, n: float) -> None:
+        self.tokens -= n
+
+
+class _IngressLimiter:
+    """Token-bucket admission of one socket's incoming messages."""
+
+    def __init__(
+        self,
+        msgs_per_s: float = _INGRESS_MSGS_PER_S,
+        msg_burst: float = _INGRESS_MSG_BURST,
+        bytes_per_s: float = _INGRESS_BYTES_PER_S,
+        byte_burst: float = _INGRESS_BYTE_BURST,
+        max_message_bytes: int = _MAX_UPDATE_BYTES,
+        action: str = _INGRESS_ACTION,
+        oversize_action: str = _OVERSIZE_ACTION,
+    ) -> None:
+        self.messages = _TokenBucket(msgs_per_s, msg_burst)
+        # A single maximum-size message must always fit into the bucket.
+        self.bytes = _TokenBucket(bytes_per_s, max(byte_burst, max_message_bytes))
+        self.max_message_bytes = max_message_bytes
+        self.action = action
+        self.oversize_action = oversize_action
+
+    async def admit(self, nbytes: int) -> str:
+        """Return :data:`INGRESS_DROP`, :data:`INGRESS_CLOSE` or "" to process the message.
+
+        With the delay action this sleeps until the socket is back within its
+        rates; the session lock is not held meanwhile.
+        """
+        if nbytes > self.max_message_bytes:
+            WHITEBOARD_INGRESS_LIMITED.labels(reason="size", action=self.oversize_action).inc()
+            return self.oversize_action
+
+        now = time.monotonic()
+        wait = max(self.messages.wait_time(1, now), self.bytes.wait_time(nbytes, now))
+        if wait > 0:
+            WHITEBOARD_INGRESS_LIMITED.labels(reason="rate", action=self.action).inc()
+            if self.action != INGRESS_DELAY:
+                return self.action
+            WHITEBOARD_INGRESS_DELAY.observe(wait)
+            await asyncio.sleep(wait)
+        self.messages.take(1)
+        self.bytes.take(nbytes)
+        return ""
+
+
 # ---------------------- In-memory document registry ---------------------- #
 
 class _SessionDoc:
     """Holds the YDoc and the set of active websocket connections for a session."""
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        session_id: str,
+        redis: Redis,
+        persist_interval_s: float = _PERSIST_INTERVAL_S,
+        persist_max_bytes: int = _PERSIST_MAX_BYTES,
+        coalesce_window_s: float = _COALESCE_WINDOW_S,
+    ) -> None:
+        self.session_id = session_id
+        self.redis = redis
         self.ydoc: YDoc = YDoc()
-        self.connections: Set[WebSocket] = set()
+        self.objects = self.ydoc.get_map("objects")
+        # websocket -> its writer; broadcasting only enqueues on the writers
+        self.connections: Dict[WebSocket, _PeerWriter] = {}
         # Lock to ensure that apply/broadcast is atomic when many clients send
         # concurrently.  The lock is per-session so parallel sessions are not
         # blocked.
         self._lock = asyncio.Lock()
+        # Keys of the `objects` map added/updated since the last sanitiser
+        # pass.  Filled synchronously by the YMap observer while an update is
+        # being applied so the sanitiser only has to look at what changed.
+        self._dirty_keys: Set[str] = set()
+        # Decoded specs for readers (summary, find, anchors), fed by the same
+        # observers; registered for lookup once hydration has finished.
+        self.view = whiteboard_view.BoardView(session_id)
+        self._objects_sub = self.objects.observe(self._on_objects_change)
+        # Pointers, highlights and question tags: written by sync-protocol
+        # clients through the ephemeral channel, never persisted.
+        self.ephemeral_store = whiteboard_ephemeral.EphemeralStore(session_id)
+        # Legacy clients still write them into the YDoc; those entries are
+        # mirrored into the store, fanned out to sync-protocol peers and
+        # handed to the expiry heap as they are written – including on
+        # hydration and from relays.  Compaction drops them from the base.
+        self.ephemeral = self.ydoc.get_map("ephemeral")
+        self._ephemeral_sub = self.ephemeral.observe(self._on_ephemeral_change)
+        self.persister = _PersistScheduler(
+            session_id, redis, interval_s=persist_interval_s, max_bytes=persist_max_bytes
+        )
+        # Local updates not yet published to the other workers.
+        self._outbox: List[bytes] = []
+        # Layout-allocator regions of objects deleted by local updates, not
+        # yet released (see `_release_regions`).
+        self._freed_regions: List[str] = []
+        # True while applying updates that are already persisted / relayed by
+        # someone else (Redis hydration, frames from other workers).
+        self._foreign = False
+        # Coalescing window: state vector at the last emit, and the local
+        # transaction updates waiting to be emitted, each with the socket it
+        # came from (None = server-side write such as a sanitiser patch).
+        self.coalesce_window_s = coalesce_window_s
+        self._window_sv = encode_state_vector(self.ydoc)
+        self._window_updates: List[Tuple[Optional[WebSocket], bytes]] = []
+        self._window_task: Optional[asyncio.Task] = None
+        self._current_origin: Optional[WebSocket] = None
+        self._txn_sub = self.ydoc.observe_after_transaction(self._on_transaction)
+        # Set once hydration from Redis finished; concurrent connects wait on it.
+        self.ready = asyncio.Event()
+        # LRU bookkeeping for the memory budget.  `charged` is what this doc
+        # currently counts against the budget.
+        self.last_active = time.monotonic()
+        self.charged = 0
+
+    def _on_objects_change(self, event) -> None:
+        keys = event.keys
+        for key, change in keys.items():
+            if change.get("action") != "delete":
+                self._dirty_keys.add(key)
+            elif not self._foreign:
+                # Whoever applied a foreign delete released its region already
+                old = self.view.get(key) or {}
+                region_id = (old.get("metadata") or {}).get("regionId")
+                if isinstance(region_id, str):
+                    self._freed_regions.append(region_id)
+        self.view.apply_event(whiteboard_view.OBJECTS, keys)
+
+    def _on_ephemeral_change(self, event) -> None:
+        keys = event.keys
+        self.ephemeral_store.apply_event(keys)
+        change: Dict[str, list] = {"set": [], "remove": []}
+        for key, key_change in keys.items():
+            value = key_change.get("newValue")
+            if key_change.get("action") == "delete" or not isinstance(value, dict):
+                change["remove"].append(key)
+                continue  # Stale heap entries are skipped when they come due
+            change["set"].append(value)
+            # Entries without a usable expiry are collected right away.
+            _expiry.schedule(self.session_id, key, whiteboard_ephemeral.expires_at_of(value))
+        # Sync-protocol peers no longer read the YDoc map; hand them legacy
+        # writes on the ephemeral channel.  Every worker applying the update
+        # does this for its own sockets, so nothing is relayed here.
+        _send_ephemeral(self, change, None)
+
+    def expire_ephemeral(self, keys: Iterable[str], now_ms: float) -> int:
+        """Delete the ephemeral *keys* whose current ``expiresAt`` has passed."""
+        keys = list(keys)
+        due = []
+        for key in keys:
+            spec = self.ephemeral.get(key)
+            if spec is None:
+                continue  # Already gone, or a channel entry
+            expires_at = whiteboard_ephemeral.expires_at_of(spec)
+            if expires_at <= now_ms:  # Otherwise refreshed; a later heap entry covers it
+                due.append((key, expires_at))
+        if due:
+            with self.ydoc.begin_transaction() as txn:
+                for key, _ in due:
+                    self.ephemeral.pop(txn, key)
+        lags = [expires_at for _, expires_at in due]
+
+        # Channel entries: drop from the store and tell the local peers.  Other
+        # workers expire their copies on the same deadline.
+        expired_channel = []
+        for key in keys:
+            spec = self.ephemeral_store.get(key)
+            if spec is not None and self.ephemeral_store.expire([key], now_ms):
+                expired_channel.append(key)
+                lags.append(whiteboard_ephemeral.expires_at_of(spec))
+        if expired_channel:
+            _send_ephemeral(self, {"set": [], "remove": expired_channel}, None)
+
+        for expires_at in lags:
+            if expires_at:
+                WHITEBOARD_EPHEMERAL_EXPIRY_LAG.observe(max(0.0, now_ms - expires_at) / 1000.0)
+        return len(due) + len(expired_channel)
+
+    def touch(self) -> None:
+        self.last_active = time.monotonic()
+
+    def _charge(self, nbytes: int) -> None:
+        self.charged += nbytes
+        _budget.charge(nbytes)
+
+    def recalibrate(self) -> None:
+        """Replace the running estimate by one based on the current encoding."""
+        self._charge(len(self.full_state()) * _MEMORY_OVERHEAD_FACTOR - self.charged)
+
+    def _on_transaction(self, event) -> None:
+        update = event.get_update()
+        if not update or update == _EMPTY_UPDATE:
+            return
+        # Growth estimate (deletes over-count until the next recalibrate()).
+        self._charge(len(update) * _MEMORY_OVERHEAD_FACTOR)
+        if self._foreign:
+            return
+        WHITEBOARD_COALESCE_UPDATES.labels(stage="in").inc()
+        WHITEBOARD_COALESCE_BYTES.labels(stage="in").inc(len(update))
+        if self.coalesce_window_s <= 0:
+            self._emit(update, self._current_origin)
+            return
+        self._window_updates.append((self._current_origin, update))
+        if self._window_task is None or self._window_task.done():
+            try:
+                self._window_task = asyncio.get_running_loop().create_task(self._close_window_later())
+            except RuntimeError:
+                # No loop (e.g. synchronous callers) – flush_window() emits on release.
+                self._window_task = None
+
+    async def _close_window_later(self) -> None:
+        await asyncio.sleep(self.coalesce_window_s)
+        self.flush_window()
+        await _publish_outbox(self)
+
+    def flush_window(self) -> None:
+        """Emit the transactions committed locally since the last flush.
+
+        A single transaction goes out verbatim.  Several are merged into the
+        state-vector diff since the window opened, which drops superseded
+        writes (a stroke rewritten 30 times is sent once).  That diff always
+        carries the doc's whole delete set, though, so on a board with many
+        deletions it can outweigh the window's own updates; those are then
+        forwarded one by one instead.  Either way no more bytes leave than
+        came in.
+        """
+        updates, self._window_updates = self._window_updates, []
+        if len(updates) > 1:
+            merged = encode_state_as_update(self.ydoc, self._window_sv)
+            if len(merged) <= sum(len(update) for _, update in updates):
+                origins = {origin for origin, _ in updates}
+                # Skip the sender only if it alone produced everything merged
+                updates = [(next(iter(origins)) if len(origins) == 1 else None, merged)]
+        self._window_sv = encode_state_vector(self.ydoc)
+        for origin, update in updates:
+            self._emit(update, origin)
+
+    def _emit(self, update: bytes, origin: Optional[WebSocket]) -> None:
+        """Broadcast (skipping *origin*), persist and queue for relay one update."""
+        WHITEBOARD_COALESCE_UPDATES.labels(stage="out").inc()
+        WHITEBOARD_COALESCE_BYTES.labels(stage="out").inc(len(update))
+        _broadcast(update, self.connections, origin)
+        self.persister.mark_dirty(update)
+        self._outbox.append(update)
+
+    async def close_window(self) -> None:
+        """Cancel the window timer and emit whatever it was holding."""
+        if self._window_task is not None and not self._window_task.done():
+            self._window_task.cancel()
+            try:
+                await self._window_task
+            except asyncio.CancelledError:
+                pass
+        self._window_task = None
+        self.flush_window()
+        await _publish_outbox(self)
+
+    @contextmanager
+    def applying_from(self, origin: Optional[WebSocket]):
+        """Attribute transactions committed inside the block to *origin*."""
+        self._current_origin = origin
+        try:
+            yield
+        finally:
+            self._current_origin = None
+
+    def full_state(self) -> bytes:
+        return encode_state_as_update(self.ydoc)
+
+    def attach(self, ws: WebSocket, initial: Optional[bytes] = None, **writer_kwargs) -> _PeerWriter:
+        """Register *ws* as a peer, queueing *initial* ahead of any broadcast."""
+        self.touch()
+        writer = _PeerWriter(ws, self.full_state, self._drop_peer, **writer_kwargs)
+        if initial:
+            writer.send(initial)
+        self.connections[ws] = writer
+        return writer
+
+    async def detach(self, ws: WebSocket) -> None:
+        writer = self.connections.pop(ws, None)
+        if writer is not None:
+            await writer.close()
+
+    def _drop_peer(self, writer: _PeerWriter) -> None:
+        if self.connections.get(writer.ws) is writer:
+            del self.connections[writer.ws]
+
+    def take_dirty_keys(self) -> Set[str]:
+        """Return and reset the keys touched since the previous call."""
+        keys, self._dirty_keys = self._dirty_keys, set()
+        return keys
+
+    def take_outbox(self) -> List[bytes]:
+        """Return and reset the local updates awaiting relay to other workers."""
+        updates, self._outbox = self._outbox, []
+        return updates
+
+    def take_freed_regions(self) -> List[str]:
+        """Return and reset the allocator regions of locally deleted objects."""
+        regions, self._freed_regions = self._freed_regions, []
+        return regions
+
+    @contextmanager
+    def foreign_updates(self):
+        """Apply updates that must not be persisted, relayed or re-sanitised."""
+        # Emit local changes first so the window diff never includes foreign ones.
+        self.flush_window()
+        self._foreign = True
+        try:
+            yield
+        finally:
+            self._foreign = False
+            # Foreign changes must never end up in the next window's diff
+            self._window_sv = encode_state_vector(self.ydoc)
+            self.take_dirty_keys()
+
+    def diff_since(self, state_vector: bytes) -> Optional[bytes]:
+        """Return what a peer with *state_vector* is missing, or None if nothing."""
+        diff = encode_state_as_update(self.ydoc, state_vector)
+        return diff if diff != _EMPTY_UPDATE else None
 
 
 # session_id (str)  ->  _SessionDoc
 _docs: Dict[str, _SessionDoc] = {}
 
-# Key prefix for Yjs snapshots in Redis
-_REDIS_KEY_PREFIX = "yjs:snapshot:"
-
 # ---------------------------- Helper utils ----------------------------- #
 
 async def _get_or_create_doc(session_id: str, redis: Redis) -> _SessionDoc:
-    """Return the in-memory `_SessionDoc` for *session_id*, loading its last
-    snapshot from Redis if it is not already in `_docs`."""
-
-    if session_id in _docs:
-        return _docs[session_id]
+    """Return the in-memory `_SessionDoc` for *session_id*, rebuilding it from
+    Redis (base snapshot + update log) if it is not already in `_docs`."""
 
-    doc_wrapper = _SessionDoc()
+    existing = _docs.get(session_id)
+    if existing is not None:
+        await existing.ready.wait()
+        return existing
 
-    # Attempt to hydrate from Redis (Phase-1 persistence strategy)
-    redis_key = f"{_REDIS_KEY_PREFIX}{session_id}"
+    # Register first so concurrent connects share this instance.
+    doc_wrapper = _SessionDoc(session_id, redis)
+    _docs[session_id] = doc_wrapper
+    WHITEBOARD_RESIDENT_DOCS.set(len(_docs))
     try:
-        snapshot_bytes: bytes | None = await redis.get(redis_key)  # type: ignore[arg-type]
-        if snapshot_bytes:
-            with doc_wrapper.ydoc.begin_transaction() as txn:
-                apply_update(txn, snapshot_bytes)
+        # Subscribe before loading so nothing published meanwhile is missed.
+        if _RELAY_ENABLED:
+            await whiteboard_relay.get_relay(redis).subscribe(
+                session_id,
+                lambda update: _apply_remote_update(doc_wrapper, update),
+                lambda state_vector: doc_wrapper.diff_since(state_vector) if doc_wrapper.connections else None,
+                lambda payload: _apply_remote_ephemeral(doc_wrapper, payload),
+            )
+
+        # Hydrate from Redis: compacted base snapshot + append-only update tail
+        base, tail = await whiteboard_store.load_parts(redis, session_id)
+        # Restored state is already persisted and was sanitised on the way in.
+        with doc_wrapper.foreign_updates():
+            restored = whiteboard_store.apply_parts(doc_wrapper.ydoc, base, tail)
+        if restored:
             log.info(
-                "[whiteboard_ws] Restored YDoc for %s from Redis snapshot (%d bytes)",
+                "[whiteboard_ws] Restored YDoc for %s from Redis (%d bytes, %d tail update(s))",
                 session_id,
-                len(snapshot_bytes),
+                restored,
+                len(tail),
             )
+
+        # Pick up updates other workers have applied but not yet persisted.
+        if _RELAY_ENABLED:
+            await whiteboard_relay.get_relay(redis).request_sync(session_id, encode_state_vector(doc_wrapper.ydoc))
     except Exception as exc:  # pragma: no cover
         log.error("[whiteboard_ws] Failed to load Redis snapshot for %s: %s", session_id, exc, exc_info=True)
-
-    _docs[session_id] = doc_wrapper
+    finally:
+        whiteboard_view.register(doc_wrapper.view)
+        whiteboard_ephemeral.register(doc_wrapper.ephemeral_store)
+        doc_wrapper.ready.set()
     return doc_wrapper
 
 
-async def _broadcast(update: bytes, peers: Set[WebSocket], origin: WebSocket) -> None:
-    """Send *update* to every websocket in *peers* except *origin*."""
-    dead: Set[WebSocket] = set()
-    for peer in peers:
-        if peer is origin:
-            continue
+async def _apply_remote_update(doc_wrapper: _SessionDoc, update: bytes) -> None:
+    """Apply an update relayed from another worker and fan it out locally."""
+    doc_wrapper.touch()
+    async with doc_wrapper._lock:
         try:
-            await peer.send_bytes(update)
-        except WebSocketDisconnect:
-            dead.add(peer)
-        except RuntimeError:
-            dead.add(peer)
+            with doc_wrapper.foreign_updates():
+                apply_update(doc_wrapper.ydoc, update)
         except Exception as exc:  # pragma: no cover
-            log.error("[whiteboard_ws] Unexpected send error: %s", exc, exc_info=True)
-            dead.add(peer)
-    # Prune connections that are no longer alive
-    peers.difference_update(dead)
+            log.error("[whiteboard_ws] Failed to apply relayed update for %s: %s", doc_wrapper.session_id, exc, exc_info=True)
+        else:
+            # Already merged by the sending worker's window.
+            _broadcast(update, doc_wrapper.connections, None)
+    # Entering foreign_updates() may have emitted a pending local window.
+    await _publish_outbox(doc_wrapper)
+
+
+async def _publish_outbox(doc_wrapper: _SessionDoc) -> None:
+    """Relay the doc's emitted local updates to other workers hosting the session."""
+    outbox = doc_wrapper.take_outbox()
+    if not (_RELAY_ENABLED and outbox):
+        return
+    try:
+        await whiteboard_relay.get_relay(doc_wrapper.redis).publish_updates(doc_wrapper.session_id, outbox)
+    except Exception as relay_err:  # pragma: no cover
+        log.error("[whiteboard_ws] Relay publish failed for %s: %s", doc_wrapper.session_id, relay_err, exc_info=True)
+
+
+async def _release_regions(doc_wrapper: _SessionDoc) -> None:
+    """Give the layout-allocator regions of deleted objects back to the board."""
+    for region_id in doc_wrapper.take_freed_regions():
+        try:
+            await layout_allocator.release_region(doc_wrapper.session_id, region_id)
+        except Exception as alloc_err:  # pragma: no cover
+            log.warning("[whiteboard_ws] Could not release region %s of %s: %s", region_id, doc_wrapper.session_id, alloc_err)
+
+
+async def _release_doc(session_key: str, doc_wrapper: _SessionDoc, redis: Redis) -> None:
+    """Persist and drop *doc_wrapper* once it has no local connections left."""
+    await doc_wrapper.close_window()
+    was_dirty = doc_wrapper.persister.dirty
+    if await doc_wrapper.persister.close() and was_dirty:
+        log.info("[whiteboard_ws] Final Redis snapshot persisted for %s", session_key)
+
+    # A new client may have joined while we were flushing.
+    if not doc_wrapper.connections and _docs.get(session_key) is doc_wrapper:
+        await _drop_doc(session_key, doc_wrapper, redis)
+
+
+async def _drop_doc(session_key: str, doc_wrapper: _SessionDoc, redis: Redis) -> None:
+    """Forget a (persisted) document: registry, views, budget and relay."""
+    _docs.pop(session_key, None)
+    whiteboard_view.unregister(doc_wrapper.view)
+    whiteboard_ephemeral.unregister(doc_wrapper.ephemeral_store)
+    board_digest.forget(session_key)
+    _budget.charge(-doc_wrapper.charged)
+    doc_wrapper.charged = 0
+    WHITEBOARD_RESIDENT_DOCS.set(len(_docs))
+    if _RELAY_ENABLED:
+        await whiteboard_relay.get_relay(redis).unsubscribe(session_key)
+
+
+async def _evict_doc(doc_wrapper: _SessionDoc) -> bool:
+    """Persist and drop an idle document, closing its sockets.  False if it woke up."""
+    session_key = doc_wrapper.session_id
+    stamp = doc_wrapper.last_active
+    await doc_wrapper.close_window()
+    if not await doc_wrapper.persister.close():
+        return False  # Redis unavailable – keep the only copy in memory
+    if (
+        doc_wrapper.last_active != stamp
+        or doc_wrapper.persister.dirty
+        or _docs.get(session_key) is not doc_wrapper
+    ):
+        return False
+    for writer in list(doc_wrapper.connections.values()):
+        writer.abort(code=1001, reason="Idle whiteboard evicted")
+    await _drop_doc(session_key, doc_wrapper, doc_wrapper.redis)
+    WHITEBOARD_DOC_EVICTIONS.inc()
+    log.info("[whiteboard_ws] Evicted idle whiteboard %s", session_key)
+    return True
+
+
+class _MemoryBudget:
+    """Process-wide estimate of resident document bytes with LRU eviction."""
+
+    def __init__(self, budget_bytes: int = _MEMORY_BUDGET_BYTES, min_idle_s: float = _EVICT_MIN_IDLE_S) -> None:
+        self.budget_bytes = budget_bytes
+        self.min_idle_s = min_idle_s
+        self.resident_bytes = 0
+        self._task: Optional[asyncio.Task] = None
+        self._last_pass = 0.0
+
+    def charge(self, nbytes: int) -> None:
+        self.resident_bytes += nbytes
+        WHITEBOARD_RESIDENT_BYTES.set(self.resident_bytes)
+        if (
+            nbytes > 0
+            and self.resident_bytes > self.budget_bytes
+            and (self._task is None or self._task.done())
+            and time.monotonic() - self._last_pass >= _EVICT_CHECK_INTERVAL_S
+        ):
+            try:
+                self._task = asyncio.get_running_loop().create_task(self.enforce())
+            except RuntimeError:
+                self._task = None
+
+    async def enforce(self) -> int:
+        """Evict least recently active idle docs until under budget; returns the count."""
+        self._last_pass = time.monotonic()
+        # Running estimates only grow; re-measure before evicting anything.
+        for wrapper in list(_docs.values()):
+            wrapper.recalibrate()
+        if self.resident_bytes <= self.budget_bytes:
+            return 0
+
+        now = time.monotonic()
+        idle = sorted(
+            (w for w in _docs.values() if now - w.last_active >= self.min_idle_s),
+            key=lambda w: w.last_active,
+        )
+        evicted = 0
+        for wrapper in idle:
+            if self.resident_bytes <= self.budget_bytes:
+                break
+            try:
+                if await _evict_doc(wrapper):
+                    evicted += 1
+            except Exception as exc:  # pragma: no cover
+                log.error("[whiteboard_ws] Eviction failed for %s: %s", wrapper.session_id, exc, exc_info=True)
+        if self.resident_bytes > self.budget_bytes:
+            log.warning(
+                "[whiteboard_ws] Whiteboard memory estimate %d bytes still above budget %d (%d docs, none idle enough)",
+                self.resident_bytes,
+                self.budget_bytes,
+                len(_docs),
+            )
+        return evicted
+
+
+_budget = _MemoryBudget()
+
+
+def _sanitise_owner_fields(doc_wrapper: _SessionDoc, keys: Set[str]) -> List[str]:
+    """Force ``metadata.source == "user"`` on the objects named by *keys*.
+
+    Learner-side clients are only authorised to write objects whose
+    metadata.source == "user".  Only the keys touched by the incoming update
+    are inspected, so the cost is O(changed objects) rather than O(board).
+    Returns the keys that had to be rewritten.
+    """
+    to_patch: list[tuple[str, dict]] = []
+    for key in keys:
+        spec = doc_wrapper.objects.get(key)
+        if not isinstance(spec, dict):
+            continue  # Deleted in the same update or unexpected type
+        md = spec.get("metadata") or {}
+        if md.get("source") != _VALID_SOURCE:
+            md["source"] = _VALID_SOURCE
+            spec["metadata"] = md
+            to_patch.append((key, spec))
+
+    if to_patch:
+        with doc_wrapper.ydoc.begin_transaction() as patch_txn:
+            for k, patched_spec in to_patch:
+                doc_wrapper.objects.set(patch_txn, k, patched_spec)  # type: ignore[arg-type]
+        # Our own patch re-marks the keys; they are clean now.
+        doc_wrapper.take_dirty_keys()
+    return [k for k, _ in to_patch]
+
+
+def _broadcast(update: bytes, peers: Dict[WebSocket, _PeerWriter], origin: Optional[WebSocket]) -> None:
+    """Queue *update* for every peer except *origin*.
+
+    Never awaits: each peer's writer task does the actual send, and peers that
+    fall too far behind are resynced or dropped by their writer's policy.
+    """
+    for ws, writer in list(peers.items()):
+        if ws is not origin:
+            writer.send(update)
+
+
+async def _handle_client_update(
+    doc_wrapper: _SessionDoc,
+    update_bytes: bytes,
+    origin: Optional[WebSocket],
+    user_id: object = None,
+) -> None:
+    """Apply and sanitise one client update; the doc's window emits it."""
+    doc_wrapper.touch()
+    # Apply + sanitise under lock so ordering is consistent
+    async with doc_wrapper._lock:
+        try:
+            with doc_wrapper.applying_from(origin):
+                apply_update(doc_wrapper.ydoc, update_bytes)
+        except Exception as parse_err:  # pragma: no cover
+            doc_wrapper.take_dirty_keys()
+            log.error("[whiteboard_ws] Failed to apply Yjs update: %s", parse_err, exc_info=True)
+            return
+
+        # --- 🚦  Owner-field validation & sanitisation ------------- #
+        try:
+            # If a malicious client tries to spoof `source:"assistant"`
+            # on any object it touched we rewrite it.
+            patched = _sanitise_owner_fields(doc_wrapper, doc_wrapper.take_dirty_keys())
+            if patched:
+                log.warning(
+                    "[whiteboard_ws] Sanitised %d object(s) with invalid owner field from client %s",
+                    len(patched),
+                    user_id,
+                )
+        except Exception as val_err:  # pragma: no cover
+            log.error("[whiteboard_ws] Validation error: %s", val_err, exc_info=True)
+
+    # Broadcast, persistence and relay all go through the doc's coalescing
+    # window (see `_SessionDoc._emit`); with the window disabled the update
+    # was emitted already and only the relay publish is left.
+    await _publish_outbox(doc_wrapper)
+    await _release_regions(doc_wrapper)
+
+
+def _apply_ephemeral(doc_wrapper: _SessionDoc, change: object, sanitise: bool) -> Optional[Dict[str, list]]:
+    """Apply an ephemeral ``{"set": [...], "remove": [...]}`` change to the store.
+
+    Returns the effective change (normalised specs, ids actually removed) or
+    None if nothing changed.  With *sanitise* the entries are forced to
+    ``metadata.source == "user"`` like client-written objects.
+    """
+    if not isinstance(change, dict):
+        return None
+    now_ms = time.time() * 1000
+    store = doc_wrapper.ephemeral_store
+    applied: List[dict] = []
+    for spec in change.get("set") or []:
+        if sanitise and isinstance(spec, dict):
+            md = spec.get("metadata")
+            spec = {**spec, "metadata": {**(md if isinstance(md, dict) else {}), "source": _VALID_SOURCE}}
+        stored = store.put(spec, now_ms)
+        if stored is not None:
+            applied.append(stored)
+            _expiry.schedule(doc_wrapper.session_id, stored["id"], stored["metadata"]["expiresAt"])
+    removed = [key for key in change.get("remove") or [] if isinstance(key, str) and store.remove(key)]
+    if not (applied or removed):
+        return None
+    return {"set": applied, "remove": removed}
+
+
+def _send_ephemeral(doc_wrapper: _SessionDoc, change: Dict[str, list], origin: Optional[WebSocket]) -> bytes:
+    """Queue an ephemeral change for every sync-protocol peer except *origin*."""
+    payload = json.dumps(change, separators=(",", ":")).encode()
+    message = whiteboard_protocol.encode_ephemeral(payload)
+    for ws, writer in list(doc_wrapper.connections.items()):
+        if writer.ephemeral and ws is not origin:
+            writer.send_message(message)
+    return payload
+
+
+async def _handle_ephemeral_message(
+    doc_wrapper: _SessionDoc,
+    message: bytes,
+    origin: Optional[WebSocket],
+    user_id: object = None,
+) -> None:
+    """Store, fan out and relay one client ephemeral message (never persisted)."""
+    try:
+        change = json.loads(whiteboard_protocol.decode_ephemeral(message))
+    except ValueError as exc:
+        log.warning("[whiteboard_ws] Dropping malformed ephemeral message from client %s: %s", user_id, exc)
+        return
+    doc_wrapper.touch()
+    applied = _apply_ephemeral(doc_wrapper, change, sanitise=True)
+    if applied is None:
+        return
+    payload = _send_ephemeral(doc_wrapper, applied, origin)
+    if _RELAY_ENABLED:
+        try:
+            await whiteboard_relay.get_relay(doc_wrapper.redis).publish_ephemeral(doc_wrapper.session_id, payload)
+        except Exception as relay_err:  # pragma: no cover
+            log.error("[whiteboard_ws] Ephemeral relay failed for %s: %s", doc_wrapper.session_id, relay_err, exc_info=True)
+
+
+async def _apply_remote_ephemeral(doc_wrapper: _SessionDoc, payload: bytes) -> None:
+    """Apply an ephemeral change relayed from another worker and fan it out locally."""
+    try:
+        change = json.loads(payload)
+    except ValueError:
+        log.warning("[whiteboard_ws] Dropping malformed relayed ephemeral change for %s", doc_wrapper.session_id)
+        return
+    applied = _apply_ephemeral(doc_wrapper, change, sanitise=False)
+    if applied is not None:
+        _send_ephemeral(doc_wrapper, applied, None)
+
+
+async def _handle_sync_message(
+    doc_wrapper: _SessionDoc,
+    writer: _PeerWriter,
+    message: bytes,
+    origin: Optional[WebSocket],
+    user_id: object = None,
+) -> None:
+    """Handle one framed message from a ``?proto=2`` client."""
+    try:
+        if whiteboard_protocol.message_type(message) == whiteboard_protocol.MESSAGE_EPHEMERAL:
+            await _handle_ephemeral_message(doc_wrapper, message, origin, user_id)
+            return
+        _, sync_type, payload = whiteboard_protocol.decode_message(message)
+    except ValueError as exc:
+        log.warning("[whiteboard_ws] Dropping malformed sync message from client %s: %s", user_id, exc)
+        return
+
+    if sync_type == whiteboard_protocol.SYNC_STEP1:
+        try:
+            diff = doc_wrapper.diff_since(payload) or _EMPTY_UPDATE
+        except Exception as exc:
+            log.warning("[whiteboard_ws] Invalid state vector from client %s (%s) – sending full state", user_id, exc)
+            diff = doc_wrapper.full_state()
+        WHITEBOARD_INITIAL_SYNC_BYTES.labels(protocol="v2").observe(len(diff))
+        writer.send_message(whiteboard_protocol.encode_sync(whiteboard_protocol.SYNC_STEP2, diff))
+    elif sync_type in (whiteboard_protocol.SYNC_STEP2, whiteboard_protocol.SYNC_UPDATE):
+        await _handle_client_update(doc_wrapper, payload, origin, user_id)
+    else:
+        log.warning("[whiteboard_ws] Unknown sync message type %d from client %s", sync_type, user_id)
 
 
 # ----------------------------- Endpoint ------------------------------ #
@@ -135,15 +1163,7 @@ async def whiteboard_stream(
     # -------- 1b️⃣  Basic tenancy guard -------- #
     try:
         # Verify that the session row belongs to the authenticated user to prevent cross-tenant leaks.
-        check = (
-            supabase.table("sessions")
-            .select("id")
-            .eq("id", str(session_id))
-            .eq("user_id", str(user.id))
-            .maybe_single()
-            .execute()
-        )
-        if not check.data:
+        if not session_access.user_owns_session(supabase, user.id, session_id):
             await ws.close(code=4403, reason="Forbidden: session does not belong to user")
             log.warning("[whiteboard_ws] Forbidden access – user %s attempted to access session %s", user.id, session_id)
             return
@@ -154,19 +1174,30 @@ async def whiteboard_stream(
 
     session_key = str(session_id)
     doc_wrapper = await _get_or_create_doc(session_key, redis)
-    doc_wrapper.connections.add(ws)
 
-    # -------- 2️⃣  Send initial state (if any) -------- #
-    try:
-        with doc_wrapper.ydoc.begin_transaction() as txn:
-            state_bytes = encode_state_as_update(txn)
-        if state_bytes:
-            await ws.send_bytes(state_bytes)
-            log.debug("[whiteboard_ws] Sent initial state (%d bytes) to client", len(state_bytes))
-    except Exception as exc:  # pragma: no cover
-        log.error("[whiteboard_ws] Failed to send initial state: %s", exc, exc_info=True)
+    # -------- 2️⃣  Initial sync, then join the broadcast set -------- #
+    # Both happen without yielding, so no broadcast can slip in between.
+    sync_protocol = ws.query_params.get("proto") == whiteboard_protocol.PROTOCOL_VERSION
+    if sync_protocol:
+        # Client answers with its state vector (step 1) and receives only the
+        # diff; our own step 1 lets it send back edits made while offline.
+        writer = doc_wrapper.attach(ws, frame=whiteboard_protocol.encode_update, ephemeral=True)
+        writer.send_message(
+            whiteboard_protocol.encode_sync(whiteboard_protocol.SYNC_STEP1, encode_state_vector(doc_wrapper.ydoc))
+        )
+        # Current pointers / highlights / tags, which are not part of the doc.
+        if len(doc_wrapper.ephemeral_store):
+            snapshot = {"set": list(doc_wrapper.ephemeral_store.values()), "remove": []}
+            writer.send_message(whiteboard_protocol.encode_ephemeral(json.dumps(snapshot, separators=(",", ":")).encode()))
+    else:
+        # Legacy clients: full state up front.
+        state_bytes = doc_wrapper.full_state()
+        writer = doc_wrapper.attach(ws, state_bytes)
+        WHITEBOARD_INITIAL_SYNC_BYTES.labels(protocol="legacy").observe(len(state_bytes))
+        log.debug("[whiteboard_ws] Queued initial state (%d bytes) for client", len(state_bytes))
 
     # -------- 3️⃣  Main receive loop -------- #
+    limiter = _IngressLimiter()
     try:
         while True:
             try:
@@ -179,109 +1210,151 @@ async def whiteboard_stream(
                 log.error("[whiteboard_ws] Error receiving message: %s", recv_err, exc_info=True)
                 break
 
-            # Apply + broadcast under lock so ordering is consistent
-            async with doc_wrapper._lock:
-                try:
-                    with doc_wrapper.ydoc.begin_transaction() as txn:
-                        apply_update(txn, update_bytes)
-                except Exception as parse_err:  # pragma: no cover
-                    log.error("[whiteboard_ws] Failed to apply Yjs update: %s", parse_err, exc_info=True)
-                    continue
+            verdict = await limiter.admit(len(update_bytes))
+            if verdict == INGRESS_DROP:
+                continue
+            if verdict == INGRESS_CLOSE:
+                oversized = len(update_bytes) > limiter.max_message_bytes
+                log.warning(
+                    "[whiteboard_ws] Closing socket of user %s on %s: %s",
+                    user.id,
+                    session_id,
+                    "message too big" if oversized else "rate limit exceeded",
+                )
+                writer.abort(code=1009 if oversized else 1013, reason="Message too big" if oversized else "Rate limit exceeded")
+                break
 
-                # --- 🚦  Owner-field validation & sanitisation ------------- #
-                try:
-                    # Learner-side clients are only authorised to write objects
-                    # whose metadata.source == "user".  We iterate over every
-                    # object to enforce the invariant; if a malicious client
-                    # tries to spoof `source:"assistant"` we rewrite it.
-                    VALID_SOURCE = "user"
-                    ymap = doc_wrapper.ydoc.get_map("objects")  # type: ignore[arg-type]
-                    to_patch: list[tuple[str, dict]] = []
-                    for key in ymap.keys():
-                        spec = ymap[key]
-                        if not isinstance(spec, dict):
-                            continue  # Unexpected type
-                        md = spec.get("metadata") or {}
-                        if md.get("source") != VALID_SOURCE:
-                            md["source"] = VALID_SOURCE
-                            spec["metadata"] = md
-                            to_patch.append((key, spec))
-
-                    # Apply sanitised specs back if needed
-                    if to_patch:
-                        with doc_wrapper.ydoc.begin_transaction() as patch_txn:
-                            for k, patched_spec in to_patch:
-                                ymap.set(k, patched_spec, txn=patch_txn)  # type: ignore[arg-type]
-                        log.warning(
-                            "[whiteboard_ws] Sanitised %d object(s) with invalid owner field from client %s",
-                            len(to_patch),
-                            user.id,
-                        )
-                except Exception as val_err:  # pragma: no cover
-                    log.error("[whiteboard_ws] Validation error: %s", val_err, exc_info=True)
-
-                # --- Broadcast to peers (excluding origin) --- #
-                await _broadcast(update_bytes, doc_wrapper.connections, ws)
-
-                # --- Persist latest snapshot to Redis --- #
-                try:
-                    with doc_wrapper.ydoc.begin_transaction() as s_txn:
-                        snapshot = encode_state_as_update(s_txn)
-                    redis_key = f"{_REDIS_KEY_PREFIX}{session_key}"
-                    # Use SET with no expiry for now; expiry policy can be tuned outside.
-                    await redis.set(redis_key, snapshot)
-                except Exception as persist_err:  # pragma: no cover
-                    log.error(
-                        "[whiteboard_ws] Redis persist failed for %s: %s",
-                        session_key,
-                        persist_err,
-                        exc_info=True,
-                    )
+            if sync_protocol:
+                await _handle_sync_message(doc_wrapper, writer, update_bytes, ws, user.id)
+            else:
+                await _handle_client_update(doc_wrapper, update_bytes, ws, user.id)
     finally:
         # --- Cleanup on disconnect --- #
-        doc_wrapper.connections.discard(ws)
+        await doc_wrapper.detach(ws)
         if not doc_wrapper.connections:
-            # Persist snapshot one last time, then free RAM.
+            # Persist outstanding changes one last time, then free RAM.
+            await _release_doc(session_key, doc_wrapper, redis)
+
+
+async def shutdown_whiteboard() -> None:
+    """Flush every resident document to Redis and stop the relay (called on shutdown)."""
+    for wrapper in list(_docs.values()):
+        try:
+            await wrapper.close_window()
+        except Exception as exc:  # pragma: no cover
+            log.error("[whiteboard_ws] Shutdown window flush failed for %s: %s", wrapper.session_id, exc, exc_info=True)
+        for ws in list(wrapper.connections):
+            await wrapper.detach(ws)
+        try:
+            await wrapper.persister.close()
+        except Exception as exc:  # pragma: no cover
+            log.error("[whiteboard_ws] Shutdown flush failed for %s: %s", wrapper.session_id, exc, exc_info=True)
+    await _expiry.stop()
+    if whiteboard_relay._RELAY is not None:
+        await whiteboard_relay._RELAY.close()
+
+# ---------------- Ephemeral expiry ----------------
+
+class _ExpiryScheduler:
+    """Process-wide min-heap of ephemeral entries keyed by ``metadata.expiresAt``.
+
+    Entries are pushed as they are written, so a single task sleeps until the
+    earliest deadline and deletes entries close to their real expiry.  Idle
+    documents cost nothing.  Heap items are never updated in place: a
+    refreshed entry gets a new item and its current deadline is tracked per
+    key, so the superseded item is skipped when it comes due.  Pointers
+    refresh many times a second, so once stale items outnumber live ones the
+    heap is rebuilt from the tracked deadlines.  Items for deleted entries or
+    released documents are also skipped (a released document re-schedules
+    its entries when it is hydrated again).
+    """
+
+    def __init__(self) -> None:
+        self._heap: List[Tuple[float, str, str]] = []
+        # (session_id, key) -> the deadline its live heap item carries
+        self._deadlines: Dict[Tuple[str, str], float] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def schedule(self, session_id: str, key: str, expires_at_ms: float) -> None:
+        expires_at_ms = float(expires_at_ms)
+        entry = (session_id, key)
+        if self._deadlines.get(entry) == expires_at_ms:
+            return  # Rewritten without a new deadline
+        self._deadlines[entry] = expires_at_ms
+        heapq.heappush(self._heap, (expires_at_ms, session_id, key))
+        if len(self._heap) > 2 * len(self._deadlines):
+            self._compact()
+        if self._heap[0][0] == expires_at_ms:
+            self._wakeup.set()  # New earliest deadline
+
+    def _compact(self) -> None:
+        """Drop superseded items: one item per tracked entry remains."""
+        self._heap = [(expires_at, session_id, key) for (session_id, key), expires_at in self._deadlines.items()]
+        heapq.heapify(self._heap)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
             try:
-                with doc_wrapper.ydoc.begin_transaction() as txn:
-                    snapshot = encode_state_as_update(txn)
-                redis_key = f"{_REDIS_KEY_PREFIX}{session_key}"
-                await redis.set(redis_key, snapshot)
-                log.info(
-                    "[whiteboard_ws] Final Redis snapshot persisted for %s (%d bytes)",
-                    session_key,
-                    len(snapshot),
-                )
-            except Exception as persist_err:  # pragma: no cover
-                log.error(
-                    "[whiteboard_ws] Failed to persist snapshot for %s: %s",
-                    session_key,
-                    persist_err,
-                    exc_info=True,
-                )
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+            delay = self._heap[0][0] / 1000.0 - time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            for wrapper in self.expire_due():
+                await _publish_outbox(wrapper)
 
-            # Remove from in-memory registry
-            _docs.pop(session_key, None)
+    def expire_due(self, now_ms: Optional[float] = None) -> List[_SessionDoc]:
+        """Delete every entry due by *now_ms*; returns the documents touched."""
+        now_ms = time.time() * 1000 if now_ms is None else now_ms
+        due: Dict[str, Set[str]] = {}
+        while self._heap and self._heap[0][0] <= now_ms:
+            expires_at, session_id, key = heapq.heappop(self._heap)
+            if self._deadlines.get((session_id, key)) != expires_at:
+                continue  # Superseded by a refresh
+            del self._deadlines[(session_id, key)]
+            due.setdefault(session_id, set()).add(key)
 
-# ---------------- Ephemeral GC Loop ----------------
-async def _gc_ephemeral_loop(interval_s: int = 10):
-    """Periodically garbage-collect expired ephemeral entries from Yjs docs."""
-    while True:
-        await asyncio.sleep(interval_s)
-        now = time.time() * 1000
-        for wrapper in _docs.values():
+        touched: List[_SessionDoc] = []
+        for session_id, keys in due.items():
+            wrapper = _docs.get(session_id)
+            if wrapper is None:
+                continue
             try:
-                with wrapper.ydoc.begin_transaction() as txn:
-                    eph_map = wrapper.ydoc.get_map("ephemeral")  # type: ignore[arg-type]
-                    for key in list(eph_map.keys()):
-                        spec = eph_map.get(key) or {}
-                        md = spec.get("metadata") or {}
-                        if md.get("expiresAt", 0) < now:
-                            del eph_map[key]
+                removed = wrapper.expire_ephemeral(keys, now_ms)
             except Exception as e:
-                log.error("[whiteboard_ws] Ephemeral GC error: %s", e, exc_info=True)
+                log.error("[whiteboard_ws] Ephemeral expiry error for %s: %s", session_id, e, exc_info=True)
+                continue
+            if removed:
+                WHITEBOARD_EPHEMERAL_EXPIRED.inc(removed)
+                touched.append(wrapper)
+        return touched
+
+
+_expiry = _ExpiryScheduler()
 
 
-def start_ephemeral_gc(interval_s: int = 10):
-    """Start the background ephemeral GC loop."""
-    asyncio.create_task(_gc_ephemeral_loop(interval_s)) 
\ No newline at end of file
+def start_ephemeral_gc() -> None:
+    """Start the background task that deletes expired ephemeral entries."""
+    _expiry.start()
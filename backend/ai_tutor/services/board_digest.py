@@ -0,0 +1,244 @@
+"""ai_tutor/services/board_digest.py
+
+The board summary ("digest") served to the LLM by the ``get_board_summary``
+skill and to clients by ``GET /sessions/{id}/board_summary``.
+
+Digest fields:
+  • ``counts.by_kind`` / ``counts.by_owner`` – objects per ``kind`` and per
+    ``metadata.source``.
+  • ``learner_question_tags`` – objects with ``metadata.role == 'question_tag'``.
+  • ``concept_clusters`` – bounding-box envelope of the objects sharing a
+    ``metadata.concept`` label.
+  • ``ephemeralSummary`` – active highlights, question tags and the most
+    recent pointer from the session's ephemeral store.  Workers that do not
+    host the session have no store; they summarise the unexpired entries of
+    the persisted document's ``ephemeral`` map (see ``BoardView.ephemeral``)
+    instead, which covers what legacy clients wrote there.
+
+For sessions hosted by this worker the digest is cached per session and
+keyed by the live :class:`~ai_tutor.services.whiteboard_view.BoardView`
+version.  When the version moves, only the objects the view reports as
+changed are re-folded; a full pass happens on first use or when the view's
+change journal no longer reaches back to the cached version.  The ephemeral
+part is keyed by the ephemeral store's version.  Detached (snapshot) views
+are summarised in one pass without caching.
+
+Returned dicts are shared with the cache; callers must not mutate them.
+"""
+
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+import time
+
+from ai_tutor.metrics import WHITEBOARD_DIGEST_BUILDS
+from ai_tutor.services import whiteboard_ephemeral
+from ai_tutor.services.whiteboard_view import BoardView
+
+log = logging.getLogger(__name__)
+
+BBox = Tuple[float, float, float, float]
+
+
+def _bbox(spec: Dict[str, Any]) -> Optional[BBox]:
+    try:
+        x = float(spec.get("x") or 0)
+        y = float(spec.get("y") or 0)
+        w = float(spec.get("width") or 0)
+        h = float(spec.get("height") or 0)
+    except (TypeError, ValueError):
+        return None  # Ignore specs with non-numeric bbox
+    return (x, y, x + w, y + h)
+
+
+class _Contribution:
+    """What one object adds to the digest, so it can be taken back out."""
+
+    __slots__ = ("kind", "owner", "tag", "concept", "bbox")
+
+    def __init__(self, spec: Dict[str, Any]) -> None:
+        md = spec.get("metadata") or {}
+        self.kind = spec.get("kind") or "unknown"
+        self.owner = md.get("source") or "unknown"
+        self.tag = (
+            {"id": spec.get("id"), "x": spec.get("x"), "y": spec.get("y"), "meta": md}
+            if md.get("role") == "question_tag"
+            else None
+        )
+        self.concept = md.get("concept") or None
+        self.bbox = _bbox(spec) if self.concept else None
+
+
+class BoardDigest:
+    """Digest of a board's objects, maintained object by object."""
+
+    def __init__(self) -> None:
+        self.by_kind: Counter = Counter()
+        self.by_owner: Counter = Counter()
+        self._contrib: Dict[str, _Contribution] = {}
+        self._tags: Dict[str, Dict[str, Any]] = {}
+        # concept -> {object key -> bbox}; envelopes are rebuilt per dirty concept
+        self._concept_boxes: Dict[str, Dict[str, BBox]] = {}
+        self._clusters: Dict[str, Dict[str, Any]] = {}
+        self._dirty_concepts: set = set()
+
+    @classmethod
+    def from_view(cls, view: BoardView) -> "BoardDigest":
+        digest = cls()
+        for key, spec in view.items():
+            digest.add(key, spec)
+        return digest
+
+    def add(self, key: str, spec: Dict[str, Any]) -> None:
+        c = _Contribution(spec)
+        self._contrib[key] = c
+        self.by_kind[c.kind] += 1
+        self.by_owner[c.owner] += 1
+        if c.tag is not None:
+            self._tags[key] = c.tag
+        if c.bbox is not None:
+            self._concept_boxes.setdefault(c.concept, {})[key] = c.bbox
+            self._dirty_concepts.add(c.concept)
+
+    def remove(self, key: str) -> None:
+        c = self._contrib.pop(key, None)
+        if c is None:
+            return
+        for counter, label in ((self.by_kind, c.kind), (self.by_owner, c.owner)):
+            counter[label] -= 1
+            if counter[label] <= 0:
+                del counter[label]
+        self._tags.pop(key, None)
+        if c.bbox is not None:
+            boxes = self._concept_boxes.get(c.concept, {})
+            boxes.pop(key, None)
+            if not boxes:
+                self._concept_boxes.pop(c.concept, None)
+            self._dirty_concepts.add(c.concept)
+
+    def update(self, view: BoardView, keys) -> None:
+        """Re-fold *keys* from their current value in *view*."""
+        for key in keys:
+            self.remove(key)
+            spec = view.get(key)
+            if spec is not None:
+                self.add(key, spec)
+
+    def _concept_clusters(self) -> List[Dict[str, Any]]:
+        for concept in self._dirty_concepts:
+            boxes = self._concept_boxes.get(concept)
+            if not boxes:
+                self._clusters.pop(concept, None)
+                continue
+            values = boxes.values()
+            self._clusters[concept] = {
+                "concept": concept,
+                "bbox": [
+                    min(b[0] for b in values),
+                    min(b[1] for b in values),
+                    max(b[2] for b in values),
+                    max(b[3] for b in values),
+                ],
+                "count": len(boxes),
+            }
+        self._dirty_concepts.clear()
+        return list(self._clusters.values())
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "counts": {"by_kind": dict(self.by_kind), "by_owner": dict(self.by_owner)},
+            "learner_question_tags": list(self._tags.values()),
+            "concept_clusters": self._concept_clusters(),
+        }
+
+
+def summarise_ephemeral(entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+    active_highlights = sum(1 for spec in entries if spec.get("kind") == "highlight_stroke")
+    active_question_tags = [
+        {"id": spec.get("id"), "linkedObjectId": (spec.get("metadata") or {}).get("linkedObjectId")}
+        for spec in entries
+        if spec.get("kind") == "question_tag"
+    ]
+    recent_pings = [spec for spec in entries if spec.get("kind") == "pointer_ping"]
+    recent_pointer = None
+    if recent_pings:
+        recent_spec = max(recent_pings, key=whiteboard_ephemeral.expires_at_of)
+        recent_pointer = {"x": recent_spec.get("x"), "y": recent_spec.get("y"), "meta": recent_spec.get("metadata")}
+    return {
+        "activeHighlights": active_highlights,
+        "activeQuestionTags": active_question_tags,
+        "recentPointer": recent_pointer,
+    }
+
+
+class _CacheEntry:
+    __slots__ = ("view", "version", "digest", "objects_part", "ephemeral_version", "ephemeral_part")
+
+    def __init__(self, view: BoardView) -> None:
+        self.view = view
+        self.version = view.version
+        self.digest = BoardDigest.from_view(view)
+        self.objects_part = self.digest.to_dict()
+        self.ephemeral_version: Optional[int] = None
+        self.ephemeral_part: Dict[str, Any] = {}
+
+
+# session_id -> cached digest of the live view hosted by this process
+_cache: Dict[str, _CacheEntry] = {}
+
+
+def _objects_part(session_id: str, view: Optional[BoardView]) -> Tuple[Dict[str, Any], Optional[_CacheEntry]]:
+    if view is None:
+        _cache.pop(session_id, None)
+        return BoardDigest().to_dict(), None
+    if not view.live:
+        _cache.pop(session_id, None)
+        WHITEBOARD_DIGEST_BUILDS.labels(mode="snapshot").inc()
+        return BoardDigest.from_view(view).to_dict(), None
+
+    entry = _cache.get(session_id)
+    if entry is None or entry.view is not view:
+        entry = _cache[session_id] = _CacheEntry(view)
+        WHITEBOARD_DIGEST_BUILDS.labels(mode="full").inc()
+    elif entry.version != view.version:
+        changed = view.changed_since(entry.version)
+        if changed is None:
+            entry.digest = BoardDigest.from_view(view)
+            WHITEBOARD_DIGEST_BUILDS.labels(mode="full").inc()
+        else:
+            entry.digest.update(view, changed)
+            WHITEBOARD_DIGEST_BUILDS.labels(mode="incremental").inc()
+        entry.version = view.version
+        entry.objects_part = entry.digest.to_dict()
+    else:
+        WHITEBOARD_DIGEST_BUILDS.labels(mode="cached").inc()
+    return entry.objects_part, entry
+
+
+def _ephemeral_part(session_id: str, view: Optional[BoardView], entry: Optional[_CacheEntry]) -> Dict[str, Any]:
+    store = whiteboard_ephemeral.hosted_store(session_id)
+    if store is None:
+        if view is None:
+            return summarise_ephemeral([])
+        # Not hosted here: nobody expires the snapshot's entries, so filter.
+        now_ms = time.time() * 1000
+        return summarise_ephemeral(
+            [spec for spec in view.ephemeral.values() if whiteboard_ephemeral.expires_at_of(spec) > now_ms]
+        )
+    if entry is None:
+        return summarise_ephemeral(list(store.values()))
+    if entry.ephemeral_version != store.version:
+        entry.ephemeral_part = summarise_ephemeral(list(store.values()))
+        entry.ephemeral_version = store.version
+    return entry.ephemeral_part
+
+
+def summarise(session_id: str, view: Optional[BoardView]) -> Dict[str, Any]:
+    """Digest of *view* (the session's board view, None if it has no board yet)."""
+    objects_part, entry = _objects_part(session_id, view)
+    return {**objects_part, "ephemeralSummary": _ephemeral_part(session_id, view, entry)}
+
+
+def forget(session_id: str) -> None:
+    """Drop the cached digest of *session_id* (its live view went away)."""
+    _cache.pop(session_id, None)
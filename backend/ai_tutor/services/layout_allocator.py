@@ -10,24 +10,49 @@ average footprint of a small text box or icon drawn by the tutor.  When the
 AI wants to add an object it calls
 :pyfunc:`reserve_region` which returns the *top-left* coordinate of the first
 contiguous block of free cells big enough to fit the requested width/height.
-
-The implementation purposefully keeps NO external dependencies – all state is
-kept in-memory and thus resets when the backend process restarts.  Persistence
-across deployments can be added later by serialising ``_allocators`` to Redis
-or Supabase.
-
-NOTE: Only the **flow** strategy is implemented for now.  The *anchor* strategy
-(described in improvements.md) can be added in a follow-up PR.
+:pyfunc:`reserve_regions` places several objects in one go – all or none.
+:pyfunc:`release_region` and :pyfunc:`reset_board` give the space back when
+objects are deleted or the board is cleared.
+
+Boards are held by a pluggable :class:`AllocatorStore`.  The default keeps
+them in-memory (``_allocators``), so they reset when the backend process
+restarts and are not shared between workers.  With
+``LAYOUT_ALLOCATOR_STORE=redis`` they live in Redis instead – one compact
+JSON board per session, updated with optimistic (WATCH/MULTI) transactions
+and expiring ``LAYOUT_ALLOCATOR_TTL_S`` after the last change – so every
+worker serving a session sees the same layout.
+
+Strategies:
+
+* **flow** – first free block of cells in row-major order.
+* **anchor** – the block directly right of / below an anchor object.
+* **pack** – pixel-exact placement among the board's maximal free rectangles
+  (MaxRects) using a best-short-side or best-area fit.  Objects are not
+  rounded up to whole cells, so a lesson fits noticeably more of them; the
+  cells they touch are still marked taken so flow/anchor never overlap them.
+
+Boards: with ``LAYOUT_ALLOCATOR_MODE=sparse`` each session gets an infinite
+board instead – ``_GRID_COLS`` wide with rows added on demand, its occupancy
+stored in fixed-size tiles that exist only where cells are taken.
 """
 
-from typing import Dict, List, Optional, Tuple, Literal
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, TypeVar, Literal
 import asyncio
+import json
 import math
+import os
+import random
+import sys
 import uuid
 import logging
 
+from redis.asyncio import Redis  # type: ignore
+from redis.exceptions import WatchError  # type: ignore
+
 log = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
 # --------------------------------------------------------------------------- #
 #  Configuration constants – tweak as needed
 # --------------------------------------------------------------------------- #
@@ -37,15 +62,136 @@ _GRID_ROWS = 12
 _CELL_WIDTH = 220   # px
 _CELL_HEIGHT = 140  # px
 
+# "dense": fixed _GRID_COLS × _GRID_ROWS board; "sparse": _GRID_COLS wide,
+# unbounded rows, occupancy kept in _CHUNK × _CHUNK cell tiles
+_ALLOCATOR_MODE = os.getenv("LAYOUT_ALLOCATOR_MODE", "dense")
+_CHUNK = 32         # cells per tile side in sparse mode
+
+# Where boards live: "memory" (this process) or "redis" (shared by workers)
+_STORE_BACKEND = os.getenv("LAYOUT_ALLOCATOR_STORE", "memory")
+ALLOCATOR_KEY_PREFIX = "layout:allocator:"
+_STORE_TTL_S = int(os.getenv("LAYOUT_ALLOCATOR_TTL_S", str(24 * 3600)))
+_STORE_MAX_ATTEMPTS = 20  # optimistic retries before giving up
+_STORE_MAX_BACKOFF_S = 0.05
+
 # Define literal types for anchor placement
 AnchorPlacement = Literal["right-of", "below"] # Add more as needed e.g. "top-left-of-anchor"
 
+# Free-rectangle choice for the "pack" strategy
+PackHeuristic = Literal["best-short-side", "best-area"]
+_PACK_HEURISTICS = ("best-short-side", "best-area")
+_PACK_GUTTER = 10   # px kept clear right of / below each packed object
+
+# (x, y, width, height) in px
+_Rect = Tuple[int, int, int, int]
+
+# --------------------------------------------------------------------------- #
+#  Maximal free rectangles (used by the "pack" strategy)
+# --------------------------------------------------------------------------- #
+
+class _MaxRects:
+    """The maximal free rectangles of a board (Jylänki's MaxRects).
+
+    Free rectangles may overlap; every free point of the board lies in at
+    least one of them and none is contained in another.  Placing a rectangle
+    splits each free rectangle it intersects into up to four maximal pieces.
+    """
+
+    def __init__(self, width: int, height: int, used: Iterable[_Rect] = ()):
+        self.free: List[_Rect] = [(0, 0, width, height)] if width > 0 and height > 0 else []
+        # False once released space was patched in by free(): every free
+        # point is still covered, but some rectangles may not be maximal
+        self.exact = True
+        for rect in used:
+            self.split(rect)
+
+    def find(self, width: int, height: int, heuristic: PackHeuristic = "best-short-side") -> Optional[Tuple[int, int]]:
+        """Top-left corner of the best free spot for *width* × *height*, or None."""
+        best: Optional[Tuple[int, int]] = None
+        best_key = None
+        for fx, fy, fw, fh in self.free:
+            if width > fw or height > fh:
+                continue
+            left_w, left_h = fw - width, fh - height
+            short, long_ = min(left_w, left_h), max(left_w, left_h)
+            if heuristic == "best-area":
+                key = (fw * fh - width * height, short, fy, fx)
+            else:
+                key = (short, long_, fy, fx)
+            if best_key is None or key < best_key:
+                best_key, best = key, (fx, fy)
+        return best
+
+    def split(self, used: _Rect) -> None:
+        ux, uy, uw, uh = used
+        ux2, uy2 = ux + uw, uy + uh
+        kept: List[_Rect] = []
+        pieces: List[_Rect] = []
+        for rect in self.free:
+            fx, fy, fw, fh = rect
+            fx2, fy2 = fx + fw, fy + fh
+            if ux >= fx2 or ux2 <= fx or uy >= fy2 or uy2 <= fy:
+                kept.append(rect)
+                continue
+            if ux > fx:
+                pieces.append((fx, fy, ux - fx, fh))
+            if ux2 < fx2:
+                pieces.append((ux2, fy, fx2 - ux2, fh))
+            if uy > fy:
+                pieces.append((fx, fy, fw, uy - fy))
+            if uy2 < fy2:
+                pieces.append((fx, uy2, fw, fy2 - uy2))
+        if not pieces and len(kept) == len(self.free):
+            return
+        # Only the new pieces can be redundant: untouched rectangles were
+        # already maximal, and a piece never contains an untouched one.
+        pieces = sorted(set(pieces), key=lambda r: r[2] * r[3], reverse=True)
+        survivors: List[_Rect] = []
+        for piece in pieces:
+            if not any(self._contains(other, piece) for other in kept) and not any(
+                self._contains(other, piece) for other in survivors
+            ):
+                survivors.append(piece)
+        self.free = kept + survivors
+
+    def free_rect(self, rect: _Rect, blockers: Iterable[_Rect]) -> None:
+        """Return *rect*, minus the *blockers* still inside it, to the free list.
+
+        The returned pieces are maximal within *rect* only – merging them with
+        the free space around it would need a rebuild – so the list stops
+        being :attr:`exact`.  Callers rebuild when a search comes up empty.
+        """
+        local = _MaxRects(0, 0)
+        local.free = [rect]
+        for used in blockers:
+            local.split(used)
+        pieces = [p for p in local.free if not any(self._contains(other, p) for other in self.free)]
+        if not pieces:
+            return
+        self.free = [f for f in self.free if not any(self._contains(p, f) for p in pieces)] + pieces
+        self.exact = False
+
+    @staticmethod
+    def _contains(outer: _Rect, inner: _Rect) -> bool:
+        return (
+            outer[0] <= inner[0]
+            and outer[1] <= inner[1]
+            and inner[0] + inner[2] <= outer[0] + outer[2]
+            and inner[1] + inner[3] <= outer[1] + outer[3]
+        )
+
 # --------------------------------------------------------------------------- #
 #  Grid allocator implementation
 # --------------------------------------------------------------------------- #
 
 class _GridAllocator:
-    """Per-session allocator instance keeping track of occupied cells."""
+    """Per-session allocator instance keeping track of occupied cells.
+
+    Occupancy is one int bitmask per row, so testing a block and finding the
+    first fit are bitwise operations on whole rows rather than per-cell loops.
+    """
+
+    mode = "dense"
 
     def __init__(self, cols: int = _GRID_COLS, rows: int = _GRID_ROWS,
                  cell_w: int = _CELL_WIDTH, cell_h: int = _CELL_HEIGHT):
@@ -53,10 +199,21 @@ class _GridAllocator:
         self.rows = rows
         self.cell_w = cell_w
         self.cell_h = cell_h
-        # Grid[row][col] -> region_id | None
-        self._grid: List[List[Optional[str]]] = [[None for _ in range(cols)] for _ in range(rows)]
-        # region_id -> list[(row, col)]
-        self._regions: Dict[str, List[Tuple[int, int]]] = {}
+        # Occupancy bitmap: bit *c* of _rows[r] is set when cell (r, c) is taken
+        self._rows: List[int] = [0] * rows
+        self._full = (1 << cols) - 1
+        # Rows above this one are completely taken (flow fills top-down)
+        self._top = 0
+        # region_id -> (col, row, cols, rows) block it occupies
+        self._regions: Dict[str, Tuple[int, int, int, int]] = {}
+        # region_id -> exact px rect (gutter included) of "pack" regions
+        self._packed: Dict[str, _Rect] = {}
+        # (col, row) -> regions whose rect touches that cell.  Packed regions
+        # can share edge cells, so release() asks the owners instead of
+        # clearing the whole block.
+        self._owners: Dict[Tuple[int, int], set] = {}
+        # Free rectangles for "pack"; built lazily, patched on release
+        self._maxrects: Optional[_MaxRects] = None
         self._lock = asyncio.Lock()
 
     # --------------------------------------------------------------------- #
@@ -121,15 +278,70 @@ class _GridAllocator:
             # For now, if specific anchor fails, we return None (strict anchoring)
             return None 
 
-        # Default: Simple row-major scan (flow strategy)
-        for r in range(self.rows - rows_needed + 1):
-            for c in range(self.cols - cols_needed + 1):
-                if self._block_free(c, r, cols_needed, rows_needed):
-                    return self._allocate_and_return(region_id=str(uuid.uuid4()), 
-                                                     col=c, row=r, 
-                                                     cols_needed=cols_needed, rows_needed=rows_needed)
+        # Default: first fit in row-major order (flow strategy)
+        fit = self._first_fit(cols_needed, rows_needed)
+        if fit is not None:
+            c, r = fit
+            return self._allocate_and_return(region_id=str(uuid.uuid4()),
+                                             col=c, row=r,
+                                             cols_needed=cols_needed, rows_needed=rows_needed)
         return None # No space found with flow strategy
 
+    async def reserve_packed(self, width: int, height: int,
+                             heuristic: PackHeuristic = "best-short-side") -> Tuple[int, int, int, int, str] | None:
+        """Place *width* × *height* px at the best spot among the free rectangles.
+
+        Returns ``(x, y, width, height, region_id)`` with the requested size
+        (not rounded to cells), or ``None`` if no free rectangle can hold it.
+        """
+        w, h = max(1, math.ceil(width)), max(1, math.ceil(height))
+        board_w, board_h = self.cols * self.cell_w, self.rows * self.cell_h
+        maxrects = self._pack_free()
+        spot = maxrects.find(w + _PACK_GUTTER, h + _PACK_GUTTER, heuristic) or maxrects.find(w, h, heuristic)
+        if spot is None and not maxrects.exact:
+            # Released space may only fit once merged with its surroundings
+            self._maxrects = None
+            maxrects = self._pack_free()
+            spot = maxrects.find(w + _PACK_GUTTER, h + _PACK_GUTTER, heuristic) or maxrects.find(w, h, heuristic)
+        if spot is None:
+            return None
+        x, y = spot
+        used = (x, y, min(w + _PACK_GUTTER, board_w - x), min(h + _PACK_GUTTER, board_h - y))
+        maxrects.split(used)
+
+        region_id = str(uuid.uuid4())
+        col, row = x // self.cell_w, y // self.cell_h
+        block = (col, row, math.ceil((x + w) / self.cell_w) - col, math.ceil((y + h) / self.cell_h) - row)
+        self._mark_block(*block)
+        self._regions[region_id] = block
+        self._packed[region_id] = used
+        self._index(region_id)
+        return (x, y, w, h, region_id)
+
+    async def reserve_stack(self, sizes: List[Tuple[int, int]]) -> List[Tuple[int, int, int, int, str]] | None:
+        """Flow-place *sizes* (px) as one column, top to bottom, in the first
+        block of free cells that holds them all.
+
+        Each object still gets its own region, so members can be released one
+        by one.  Returns one ``(x, y, alloc_w, alloc_h, region_id)`` per size,
+        or ``None`` if no such block is free.
+        """
+        spans = [(max(1, math.ceil(w / self.cell_w)), max(1, math.ceil(h / self.cell_h))) for w, h in sizes]
+        cols_needed = max(cols for cols, _ in spans)
+        rows_needed = sum(rows for _, rows in spans)
+        if cols_needed > self.cols or rows_needed > self.rows:
+            return None
+        fit = self._first_fit(cols_needed, rows_needed)
+        if fit is None:
+            return None
+        col, row = fit
+        placed = []
+        for cols, rows in spans:
+            placed.append(self._allocate_and_return(region_id=str(uuid.uuid4()), col=col, row=row,
+                                                    cols_needed=cols, rows_needed=rows))
+            row += rows
+        return placed
+
     def _allocate_and_return(self, region_id: str, col: int, row: int, cols_needed: int, rows_needed: int):
         self._occupy_block(region_id, col, row, cols_needed, rows_needed)
         x_px = col * self.cell_w
@@ -139,113 +351,576 @@ class _GridAllocator:
         return (x_px, y_px, alloc_w, alloc_h, region_id)
 
     async def release(self, region_id: str) -> None:
-        """Free all cells belonging to *region_id*."""
-        cells = self._regions.pop(region_id, [])
-        for r, c in cells:
-            self._grid[r][c] = None
+        """Free all cells belonging to *region_id*.
+
+        Touches only the region's own cells: a cell stays taken while another
+        (packed) region still claims it.
+        """
+        block = self._regions.get(region_id)
+        if block is None:
+            return
+        rect = self._region_rect(region_id)
+        neighbours: set = set()
+        for cell in self._cells_of(rect):
+            owners = self._owners.get(cell)
+            if owners is None:
+                continue
+            owners.discard(region_id)
+            if owners:
+                neighbours |= owners
+            else:
+                del self._owners[cell]
+            if self._claims(region_id, cell) and not any(self._claims(other, cell) for other in owners):
+                self._clear_block(cell[0], cell[1], 1, 1)
+        del self._regions[region_id]
+        self._packed.pop(region_id, None)
+        self._top = min(self._top, block[1])
+        if self._maxrects is not None:
+            self._maxrects.free_rect(rect, [self._region_rect(other) for other in neighbours])
+
+    def reset(self) -> None:
+        """Forget every region, as after the board was cleared."""
+        self._rows = [0] * len(self._rows)
+        self._top = 0
+        self._regions.clear()
+        self._packed.clear()
+        self._owners.clear()
+        self._maxrects = None
+
+    # ------------------------------------------------------------------ #
+    #  Serialisation (used by the Redis store)
+    # ------------------------------------------------------------------ #
+
+    def dumps(self) -> bytes:
+        """Compact JSON of the board: geometry, regions and free rectangles.
+
+        Occupancy is the union of the regions' blocks, so the bitmap is not
+        stored; :meth:`loads` rebuilds it in O(cells taken).  The "pack" free
+        list is stored once built: rebuilding it splits the whole board by
+        every region, which would otherwise be paid on each store round trip.
+        """
+        state = {
+            "v": 1,
+            "mode": self.mode,
+            "cols": self.cols,
+            "rows": self.rows if self.mode == "dense" else None,
+            "cell": [self.cell_w, self.cell_h],
+            "regions": self._regions,
+            "packed": self._packed,
+        }
+        if self._maxrects is not None and self._regions:
+            state["free"] = self._maxrects.free
+            state["exact"] = self._maxrects.exact
+        return json.dumps(state, separators=(",", ":")).encode()
+
+    @staticmethod
+    def loads(blob: bytes) -> "_GridAllocator":
+        state = json.loads(blob)
+        cell_w, cell_h = state["cell"]
+        if state["mode"] == "sparse":
+            allocator: _GridAllocator = _SparseGridAllocator(cols=state["cols"], cell_w=cell_w, cell_h=cell_h)
+        else:
+            allocator = _GridAllocator(cols=state["cols"], rows=state["rows"], cell_w=cell_w, cell_h=cell_h)
+        for region_id, block in state["regions"].items():
+            allocator._regions[region_id] = tuple(block)
+            allocator._mark_block(*block)
+        allocator._packed = {region_id: tuple(rect) for region_id, rect in state["packed"].items()}
+        for region_id in allocator._regions:
+            allocator._index(region_id)
+        if "free" in state:
+            maxrects = _MaxRects(0, 0)
+            maxrects.free = [tuple(rect) for rect in state["free"]]
+            maxrects.exact = state["exact"]
+            allocator._maxrects = maxrects
+        return allocator
 
     # ------------------------------------------------------------------ #
     #  Internal helpers
     # ------------------------------------------------------------------ #
 
+    @staticmethod
+    def _row_mask(start_col: int, cols_needed: int) -> int:
+        return ((1 << cols_needed) - 1) << start_col
+
+    @staticmethod
+    def _runs(free: int, length: int) -> int:
+        """Bit *c* of the result is set iff bits ``c .. c+length-1`` of *free* all are."""
+        have = 1
+        while have < length:
+            step = min(have, length - have)
+            free &= free >> step
+            have += step
+        return free
+
+    def _first_fit(self, cols_needed: int, rows_needed: int) -> Optional[Tuple[int, int]]:
+        """Top-most, then left-most ``(col, row)`` of a free block, or None.
+
+        Each candidate row costs a handful of big-int operations on the
+        occupancy bitmap (OR of the rows the block spans, then a shift-and
+        run search), independent of the board width.
+        """
+        rows, full = self._rows, self._full
+        while self._top < self.rows and rows[self._top] == full:
+            self._top += 1
+        for r in range(self._top, self.rows - rows_needed + 1):
+            taken = 0
+            for rr in range(r, r + rows_needed):
+                taken |= rows[rr]
+            fits = self._runs(~taken & full, cols_needed)
+            if fits:
+                return ((fits & -fits).bit_length() - 1, r)
+        return None
+
     def _block_free(self, start_col: int, start_row: int, cols_needed: int, rows_needed: int) -> bool:
+        mask = self._row_mask(start_col, cols_needed)
+        rows = self._rows
         for r in range(start_row, start_row + rows_needed):
-            for c in range(start_col, start_col + cols_needed):
-                if self._grid[r][c] is not None:
-                    return False
+            if rows[r] & mask:
+                return False
         return True
 
+    def _mark_block(self, start_col: int, start_row: int, cols_needed: int, rows_needed: int) -> None:
+        mask = self._row_mask(start_col, cols_needed)
+        for r in range(start_row, start_row + rows_needed):
+            self._rows[r] |= mask
+
+    def _clear_block(self, start_col: int, start_row: int, cols_needed: int, rows_needed: int) -> None:
+        keep = ~self._row_mask(start_col, cols_needed)
+        for r in range(start_row, start_row + rows_needed):
+            self._rows[r] &= keep
+
     def _occupy_block(self, region_id: str, start_col: int, start_row: int, cols_needed: int, rows_needed: int) -> None:
-        cells: List[Tuple[int, int]] = []
+        self._mark_block(start_col, start_row, cols_needed, rows_needed)
+        self._regions[region_id] = (start_col, start_row, cols_needed, rows_needed)
+        self._index(region_id)
+        if self._maxrects is not None:
+            self._maxrects.split(self._block_rect(start_col, start_row, cols_needed, rows_needed))
+
+    def _block_rect(self, col: int, row: int, cols: int, rows: int) -> _Rect:
+        return (col * self.cell_w, row * self.cell_h, cols * self.cell_w, rows * self.cell_h)
+
+    def _region_rect(self, region_id: str) -> _Rect:
+        """Px rect *region_id* keeps clear: its packed rect or its whole block."""
+        return self._packed.get(region_id) or self._block_rect(*self._regions[region_id])
+
+    def _cells_of(self, rect: _Rect) -> Iterable[Tuple[int, int]]:
+        x, y, w, h = rect
+        for r in range(y // self.cell_h, (y + h - 1) // self.cell_h + 1):
+            for c in range(x // self.cell_w, (x + w - 1) // self.cell_w + 1):
+                yield (c, r)
+
+    def _claims(self, region_id: str, cell: Tuple[int, int]) -> bool:
+        """Whether *cell* is part of *region_id*'s marked block (not just its gutter)."""
+        col, row, cols, rows = self._regions[region_id]
+        return col <= cell[0] < col + cols and row <= cell[1] < row + rows
+
+    def _index(self, region_id: str) -> None:
+        for cell in self._cells_of(self._region_rect(region_id)):
+            self._owners.setdefault(cell, set()).add(region_id)
+
+    def _pack_free(self) -> _MaxRects:
+        if self._maxrects is None:
+            used = (
+                self._packed[rid] if rid in self._packed else self._block_rect(*block)
+                for rid, block in self._regions.items()
+            )
+            self._maxrects = _MaxRects(self.cols * self.cell_w, self.rows * self.cell_h, used)
+        return self._maxrects
+
+
+class _SparseGridAllocator(_GridAllocator):
+    """Allocator for an infinite board: fixed width, rows grow on demand.
+
+    Occupancy lives in ``_CHUNK`` × ``_CHUNK`` cell tiles keyed by tile
+    coordinates, each a list of row bitmasks.  A tile exists only while one
+    of its cells is taken, so memory follows the occupied area rather than
+    the board's extent, and releasing a region touches only its own cells.
+    Strategies and results are the same as :class:`_GridAllocator`'s; the
+    board simply never runs out of rows.
+    """
+
+    mode = "sparse"
+
+    # Stands in for "no bottom edge": larger than any block or anchor row
+    _UNBOUNDED_ROWS = sys.maxsize
+
+    def __init__(self, cols: int = _GRID_COLS, rows: Optional[int] = None,
+                 cell_w: int = _CELL_WIDTH, cell_h: int = _CELL_HEIGHT):
+        super().__init__(cols=cols, rows=0, cell_w=cell_w, cell_h=cell_h)
+        self.rows = self._UNBOUNDED_ROWS
+        # (tile_col, tile_row) -> _CHUNK row bitmasks of that tile
+        self._chunks: Dict[Tuple[int, int], List[int]] = {}
+
+    def _spans(self, start_col: int, cols_needed: int) -> Iterable[Tuple[int, int, int, int]]:
+        """``(tile_col, col_in_tile, width, offset)`` pieces of a run of columns."""
+        col, end = start_col, start_col + cols_needed
+        while col < end:
+            tile_col, in_tile = divmod(col, _CHUNK)
+            width = min(_CHUNK - in_tile, end - col)
+            yield tile_col, in_tile, width, col - start_col
+            col += width
+
+    def _row_bits(self, row: int, start_col: int, cols_needed: int) -> int:
+        """Occupancy of *cols_needed* cells of *row* from *start_col*, as bits 0..cols_needed-1."""
+        tile_row, in_tile_row = divmod(row, _CHUNK)
+        bits = 0
+        for tile_col, in_tile, width, offset in self._spans(start_col, cols_needed):
+            chunk = self._chunks.get((tile_col, tile_row))
+            if chunk is not None:
+                bits |= ((chunk[in_tile_row] >> in_tile) & ((1 << width) - 1)) << offset
+        return bits
+
+    def _first_fit(self, cols_needed: int, rows_needed: int) -> Optional[Tuple[int, int]]:
+        full = self._full
+        while self._row_bits(self._top, 0, self.cols) == full:
+            self._top += 1
+        # Terminates: past the lowest taken cell every row is free
+        r = self._top
+        while True:
+            taken = 0
+            for rr in range(r, r + rows_needed):
+                taken |= self._row_bits(rr, 0, self.cols)
+            fits = self._runs(~taken & full, cols_needed)
+            if fits:
+                return ((fits & -fits).bit_length() - 1, r)
+            r += 1
+
+    def _block_free(self, start_col: int, start_row: int, cols_needed: int, rows_needed: int) -> bool:
+        for r in range(start_row, start_row + rows_needed):
+            if self._row_bits(r, start_col, cols_needed):
+                return False
+        return True
+
+    def _mark_block(self, start_col: int, start_row: int, cols_needed: int, rows_needed: int) -> None:
+        chunks = self._chunks
+        for r in range(start_row, start_row + rows_needed):
+            tile_row, in_tile_row = divmod(r, _CHUNK)
+            for tile_col, in_tile, width, _ in self._spans(start_col, cols_needed):
+                chunk = chunks.get((tile_col, tile_row))
+                if chunk is None:
+                    chunk = chunks[(tile_col, tile_row)] = [0] * _CHUNK
+                chunk[in_tile_row] |= ((1 << width) - 1) << in_tile
+
+    def reset(self) -> None:
+        super().reset()
+        self._chunks.clear()
+
+    def _clear_block(self, start_col: int, start_row: int, cols_needed: int, rows_needed: int) -> None:
+        chunks = self._chunks
+        touched = set()
         for r in range(start_row, start_row + rows_needed):
-            for c in range(start_col, start_col + cols_needed):
-                self._grid[r][c] = region_id
-                cells.append((r, c))
-        self._regions[region_id] = cells
+            tile_row, in_tile_row = divmod(r, _CHUNK)
+            for tile_col, in_tile, width, _ in self._spans(start_col, cols_needed):
+                chunk = chunks.get((tile_col, tile_row))
+                if chunk is not None:
+                    chunk[in_tile_row] &= ~(((1 << width) - 1) << in_tile)
+                    touched.add((tile_col, tile_row))
+        for key in touched:
+            if not any(chunks[key]):
+                del chunks[key]
 
 
 # --------------------------------------------------------------------------- #
-#  Module-level registry – session_id -> allocator
+#  Allocator stores – where each session's board lives between calls
 # --------------------------------------------------------------------------- #
 
+def _new_allocator() -> _GridAllocator:
+    # Pass current module-level (potentially monkeypatched) constants to constructor
+    if _ALLOCATOR_MODE == "sparse":
+        return _SparseGridAllocator(
+            cols=_GRID_COLS,
+            cell_w=_CELL_WIDTH,
+            cell_h=_CELL_HEIGHT
+        )
+    return _GridAllocator(
+        cols=_GRID_COLS, 
+        rows=_GRID_ROWS, 
+        cell_w=_CELL_WIDTH, 
+        cell_h=_CELL_HEIGHT
+    )
+
+
+# session_id -> allocator, for MemoryAllocatorStore
 _allocators: Dict[str, _GridAllocator] = {}
 
 
 async def _get_allocator(session_id: str) -> _GridAllocator:
-    """Return the allocator for *session_id*, creating one if needed."""
+    """Return the in-process allocator for *session_id*, creating one if needed."""
     if session_id not in _allocators:
-        # Pass current module-level (potentially monkeypatched) constants to constructor
-        _allocators[session_id] = _GridAllocator(
-            cols=_GRID_COLS, 
-            rows=_GRID_ROWS, 
-            cell_w=_CELL_WIDTH, 
-            cell_h=_CELL_HEIGHT
-        )
-        log.debug("[LayoutAllocator] Created new allocator for session %s", session_id)
+        _allocators[session_id] = _new_allocator()
+        log.debug("[LayoutAllocator] Created new %s allocator for session %s", _ALLOCATOR_MODE, session_id)
     return _allocators[session_id]
 
 
+class AllocatorConflictError(RuntimeError):
+    """A reservation kept losing the race for the session's board."""
+
+
+class AllocatorStore:
+    """Runs allocator operations atomically against a session's board."""
+
+    async def run(self, session_id: str, op: Callable[[_GridAllocator], Awaitable[T]]) -> T:
+        raise NotImplementedError
+
+
+class MemoryAllocatorStore(AllocatorStore):
+    """Boards kept in this process (``_allocators``); lost on restart and not
+    shared between workers."""
+
+    async def run(self, session_id: str, op: Callable[[_GridAllocator], Awaitable[T]]) -> T:
+        allocator = await _get_allocator(session_id)
+        async with allocator._lock:
+            return await op(allocator)
+
+
+class RedisAllocatorStore(AllocatorStore):
+    """Boards kept in Redis under ``layout:allocator:{session}``.
+
+    Each operation WATCHes the session's key, loads the board, applies the
+    operation and writes the board back in a MULTI, retrying from a fresh
+    read if another worker changed the board meanwhile – no lock is held
+    across workers.  Every change refreshes the key's TTL, so boards of
+    sessions that went quiet expire on their own.
+    """
+
+    def __init__(self, redis: Redis, ttl_s: int = _STORE_TTL_S, max_attempts: int = _STORE_MAX_ATTEMPTS) -> None:
+        self.redis = redis
+        self.ttl_s = ttl_s
+        self.max_attempts = max_attempts
+
+    async def run(self, session_id: str, op: Callable[[_GridAllocator], Awaitable[T]]) -> T:
+        key = allocator_key(session_id)
+        for attempt in range(self.max_attempts):
+            async with self.redis.pipeline(transaction=True) as pipe:
+                try:
+                    await pipe.watch(key)
+                    blob = await pipe.get(key)
+                    allocator = _GridAllocator.loads(blob) if blob else _new_allocator()
+                    # A missing board compares as an empty one, so a no-op
+                    # (e.g. releasing on an unknown session) creates no key
+                    before = blob if blob else allocator.dumps()
+                    result = await op(allocator)
+                    new_blob = allocator.dumps()
+                    if new_blob == before:
+                        # Nothing changed (e.g. the board is full) – no write,
+                        # so concurrent updates are not forced to retry
+                        await pipe.unwatch()
+                        return result
+                    pipe.multi()
+                    pipe.set(key, new_blob, ex=self.ttl_s)
+                    await pipe.execute()
+                    return result
+                except WatchError:
+                    log.debug("[LayoutAllocator] Board of %s changed during an update – retrying", session_id)
+            # Jittered exponential back-off so competing workers spread out
+            await asyncio.sleep(random.uniform(0, min(_STORE_MAX_BACKOFF_S, 0.001 * 2 ** attempt)))
+        raise AllocatorConflictError(f"Layout update for session {session_id} conflicted {self.max_attempts} times")
+
+
+def allocator_key(session_id: str) -> str:
+    return f"{ALLOCATOR_KEY_PREFIX}{session_id}"
+
+
+_store: Optional[AllocatorStore] = None
+
+
+def configure_store(store: Optional[AllocatorStore]) -> None:
+    """Use *store* for all sessions (None restores the in-process default)."""
+    global _store
+    _store = store
+
+
+def store_from_env(redis: Optional[Redis]) -> AllocatorStore:
+    """The store selected by ``LAYOUT_ALLOCATOR_STORE`` ("memory" or "redis")."""
+    if _STORE_BACKEND == "redis":
+        if redis is not None:
+            return RedisAllocatorStore(redis)
+        log.warning("[LayoutAllocator] LAYOUT_ALLOCATOR_STORE=redis but Redis is unavailable – using memory")
+    return MemoryAllocatorStore()
+
+
+def get_store() -> AllocatorStore:
+    global _store
+    if _store is None:
+        _store = MemoryAllocatorStore()
+    return _store
+
+
 # --------------------------------------------------------------------------- #
 #  Public coroutine API – used by skills
 # --------------------------------------------------------------------------- #
 
-async def reserve_region(
-    session_id: str,
-    requested_width: int,
-    requested_height: int,
-    strategy: str = "flow",
-    anchor_object_id: str | None = None, # Retained for context, not directly used by allocator for now if bbox is primary
-    anchor_object_bbox: Optional[Dict[str, float]] = None, # e.g. {"x": float, "y": float, "width": float, "height": float}
-    anchor_placement: Optional[AnchorPlacement] = None, # "right-of", "below"
-    group_id: str | None = None,
-):
-    """Reserve space on the canvas and return placement information.
-
-    Supports "flow" and basic "anchor" (right-of, below) strategies.
-    For "anchor" strategy, anchor_object_bbox and anchor_placement must be provided.
-    """
+def _check_strategy(strategy: str, anchor_object_bbox: Optional[Dict[str, float]],
+                    anchor_placement: Optional[AnchorPlacement], pack_heuristic: PackHeuristic) -> None:
     if strategy == "anchor":
         if not anchor_object_bbox or not anchor_placement:
             raise ValueError("For 'anchor' strategy, 'anchor_object_bbox' and 'anchor_placement' must be provided.")
+    elif strategy == "pack":
+        if pack_heuristic not in _PACK_HEURISTICS:
+            raise ValueError(f"Unknown pack heuristic: {pack_heuristic}. Expected one of {_PACK_HEURISTICS}.")
     elif strategy != "flow": # Explicitly check for flow if not anchor
-        raise NotImplementedError(f"Unsupported layout strategy: {strategy}. Only 'flow' and 'anchor' are supported.")
+        raise NotImplementedError(f"Unsupported layout strategy: {strategy}. Only 'flow', 'anchor' and 'pack' are supported.")
 
-    allocator = await _get_allocator(session_id)
-    anchor_bbox_grid: Optional[Tuple[int, int, int, int]] = None
 
+async def _place(allocator: _GridAllocator, width: int, height: int, strategy: str = "flow",
+                 anchor_object_bbox: Optional[Dict[str, float]] = None,
+                 anchor_placement: Optional[AnchorPlacement] = None,
+                 pack_heuristic: PackHeuristic = "best-short-side") -> Tuple[int, int, int, int, str] | None:
+    """Place one object on *allocator* (the caller holds the board)."""
+    anchor_bbox_grid: Optional[Tuple[int, int, int, int]] = None
     if strategy == "anchor" and anchor_object_bbox:
         # Convert pixel bbox of anchor to grid cell bbox
         ax = anchor_object_bbox['x']
         ay = anchor_object_bbox['y']
         aw = anchor_object_bbox['width']
         ah = anchor_object_bbox['height']
-        
+
         anchor_col_start = math.floor(ax / allocator.cell_w)
         anchor_row_start = math.floor(ay / allocator.cell_h)
         anchor_cols_span = math.ceil(aw / allocator.cell_w)
         anchor_rows_span = math.ceil(ah / allocator.cell_h)
         anchor_bbox_grid = (anchor_col_start, anchor_row_start, anchor_cols_span, anchor_rows_span)
 
-    async with allocator._lock:
-        result = await allocator.reserve(requested_width, requested_height, 
-                                         anchor_bbox_grid=anchor_bbox_grid, 
-                                         anchor_placement=anchor_placement if strategy == "anchor" else None)
-        if result is None:
-            return None
-        x, y, w, h, region_id = result
-        return {
-            "x": x,
-            "y": y,
-            "width": w,
-            "height": h,
-            "regionId": region_id,
-            # Echo extra contextual keys so the caller can propagate them
-            **({"groupId": group_id} if group_id else {}),
-        }
+    if strategy == "pack":
+        return await allocator.reserve_packed(width, height, heuristic=pack_heuristic)
+    return await allocator.reserve(width, height,
+                                   anchor_bbox_grid=anchor_bbox_grid,
+                                   anchor_placement=anchor_placement if strategy == "anchor" else None)
+
+
+def _placement(result: Tuple[int, int, int, int, str], group_id: str | None) -> Dict[str, Any]:
+    x, y, w, h, region_id = result
+    return {
+        "x": x,
+        "y": y,
+        "width": w,
+        "height": h,
+        "regionId": region_id,
+        # Echo extra contextual keys so the caller can propagate them
+        **({"groupId": group_id} if group_id else {}),
+    }
+
+
+async def reserve_region(
+    session_id: str,
+    requested_width: int,
+    requested_height: int,
+    strategy: str = "flow",
+    anchor_object_id: str | None = None, # Retained for context, not directly used by allocator for now if bbox is primary
+    anchor_object_bbox: Optional[Dict[str, float]] = None, # e.g. {"x": float, "y": float, "width": float, "height": float}
+    anchor_placement: Optional[AnchorPlacement] = None, # "right-of", "below"
+    group_id: str | None = None,
+    pack_heuristic: PackHeuristic = "best-short-side", # Used by the "pack" strategy
+):
+    """Reserve space on the canvas and return placement information.
+
+    Supports "flow", basic "anchor" (right-of, below) and "pack" strategies.
+    For "anchor" strategy, anchor_object_bbox and anchor_placement must be provided.
+    "pack" returns the requested size at the spot chosen by *pack_heuristic*.
+    """
+    _check_strategy(strategy, anchor_object_bbox, anchor_placement, pack_heuristic)
+
+    async def _reserve(allocator: _GridAllocator):
+        return await _place(allocator, requested_width, requested_height, strategy,
+                            anchor_object_bbox, anchor_placement, pack_heuristic)
+
+    result = await get_store().run(session_id, _reserve)
+    if result is None:
+        return None
+    return _placement(result, group_id)
+
+
+async def reserve_regions(session_id: str, requests: List[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+    """Reserve space for several objects at once – all of them or none.
+
+    Each request is a dict of :func:`reserve_region`'s keyword arguments, with
+    ``width``/``height`` in place of ``requested_width``/``requested_height``.
+    Flow requests sharing a ``group_id`` are stacked top to bottom in one block
+    so the group stays together (placed one by one if no such block is free).
+
+    The batch is one store operation – one lock acquisition, or one Redis
+    transaction.  Requests are placed in the given order and, if that does not
+    fit, largest first; if neither places everything, whatever was placed is
+    released again and ``None`` is returned.  Otherwise the placements are
+    returned in request order.
+    """
+    for request in requests:
+        _check_strategy(request.get("strategy", "flow"), request.get("anchor_object_bbox"),
+                        request.get("anchor_placement"), request.get("pack_heuristic", "best-short-side"))
+    if not requests:
+        return []
+
+    # Units placed in one go: each flow group, and every other request alone
+    units: List[List[int]] = []
+    groups: Dict[str, List[int]] = {}
+    for i, request in enumerate(requests):
+        group_id = request.get("group_id")
+        if group_id and request.get("strategy", "flow") == "flow":
+            if group_id not in groups:
+                groups[group_id] = []
+                units.append(groups[group_id])
+            groups[group_id].append(i)
+        else:
+            units.append([i])
+
+    async def _place_unit(allocator: _GridAllocator, unit: List[int]):
+        if len(unit) > 1:
+            stacked = await allocator.reserve_stack([(requests[i]["width"], requests[i]["height"]) for i in unit])
+            if stacked is not None:
+                return stacked
+        placed = []
+        for i in unit:
+            request = requests[i]
+            result = await _place(allocator, request["width"], request["height"], request.get("strategy", "flow"),
+                                  request.get("anchor_object_bbox"), request.get("anchor_placement"),
+                                  request.get("pack_heuristic", "best-short-side"))
+            if result is None:
+                for done in placed:
+                    await allocator.release(done[4])
+                return None
+            placed.append(result)
+        return placed
+
+    def _area(unit: List[int]) -> int:
+        return sum(requests[i]["width"] * requests[i]["height"] for i in unit)
+
+    async def _reserve_all(allocator: _GridAllocator):
+        orders = [units]
+        largest_first = sorted(units, key=_area, reverse=True)
+        if largest_first != units:
+            orders.append(largest_first)
+        for order in orders:
+            results: List[Optional[Tuple[int, int, int, int, str]]] = [None] * len(requests)
+            for unit in order:
+                placed = await _place_unit(allocator, unit)
+                if placed is None:
+                    break
+                for i, result in zip(unit, placed):
+                    results[i] = result
+            else:
+                return results
+            for result in results:
+                if result is not None:
+                    await allocator.release(result[4])
+        return None
+
+    results = await get_store().run(session_id, _reserve_all)
+    if results is None:
+        return None
+    return [_placement(result, request.get("group_id")) for request, result in zip(requests, results)]
 
 
 async def release_region(session_id: str, region_id: str):
     """Release a previously-reserved region back to the allocator."""
-    allocator = await _get_allocator(session_id)
-    async with allocator._lock:
-        await allocator.release(region_id) 
\ No newline at end of file
+    async def _release(allocator: _GridAllocator) -> None:
+        await allocator.release(region_id)
+
+    await get_store().run(session_id, _release)
+
+
+async def reset_board(session_id: str) -> None:
+    """Release every region of *session_id* (its whiteboard was cleared)."""
+    async def _reset(allocator: _GridAllocator) -> None:
+        allocator.reset()
+
+    await get_store().run(session_id, _reset)
@@ -0,0 +1,153 @@
+"""ai_tutor/services/metadata_index.py
+
+Inverted indexes over the metadata fields ``find_object_on_board`` filters on.
+
+Each session's index lives on its board view
+(`ai_tutor.services.whiteboard_view.BoardView.meta`) and is updated object by
+object as deltas are applied, next to the spatial index.  A ``meta_query`` is
+answered by intersecting the posting lists of its indexed terms (smallest
+first), so the cost follows the number of matches rather than the board size;
+terms on other fields are left for the caller to check on the candidates.
+
+Indexed fields (all under ``metadata``): ``role``, ``source``, ``groupId``,
+``concept`` and ``question_id`` by equality, and ``semantic_tags`` by tag – a
+query value that is a single tag matches objects carrying that tag, a list
+matches objects carrying all of them.
+"""
+
+from typing import Any, Dict, Hashable, List, Optional, Set, Tuple
+
+SCALAR_FIELDS = ("role", "source", "groupId", "concept", "question_id")
+TAG_FIELDS = ("semantic_tags",)
+INDEXED_FIELDS = SCALAR_FIELDS + TAG_FIELDS
+
+_Term = Tuple[str, Hashable]
+
+
+def _hashable(value: Any) -> bool:
+    try:
+        hash(value)
+    except TypeError:
+        return False
+    return True
+
+
+def tag_values(value: Any) -> List[Any]:
+    """Tags held by a tag field's *value* (a bare value counts as one tag)."""
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple, set)):
+        return list(value)
+    return [value]
+
+
+def metadata_field(query_key: str) -> Optional[str]:
+    """Metadata field addressed by a ``meta_query`` key, if any.
+
+    ``role``, ``meta.role`` and ``metadata.role`` all address ``metadata.role``;
+    other dotted keys address top-level spec fields.
+    """
+    if "." not in query_key:
+        return query_key
+    first, second = query_key.split(".", 1)
+    return second if first in ("meta", "metadata") else None
+
+
+def _terms_of(spec: Dict[str, Any]) -> List[_Term]:
+    md = spec.get("metadata")
+    if not isinstance(md, dict):
+        return []
+    terms: List[_Term] = []
+    for field in SCALAR_FIELDS:
+        value = md.get(field)
+        if value is not None and _hashable(value):
+            terms.append((field, value))
+    for field in TAG_FIELDS:
+        for tag in tag_values(md.get(field)):
+            if _hashable(tag):
+                terms.append((field, tag))
+    return terms
+
+
+def _query_terms(field: str, value: Any) -> Optional[List[_Term]]:
+    """Posting keys a query term needs, or None if the index can't answer it."""
+    if field in TAG_FIELDS:
+        tags = tag_values(value)
+        if not tags or not all(_hashable(t) for t in tags):
+            return None
+        return [(field, t) for t in tags]
+    if field in SCALAR_FIELDS and value is not None and _hashable(value):
+        return [(field, value)]
+    return None
+
+
+class MetadataIndex:
+    """Posting lists ``(field, value) -> object keys`` for one board."""
+
+    def __init__(self) -> None:
+        self._postings: Dict[_Term, Set[str]] = {}
+        # object key -> the terms it is posted under, for removal
+        self._terms: Dict[str, Tuple[_Term, ...]] = {}
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+    def update(self, key: str, spec: Optional[Dict[str, Any]]) -> None:
+        """(Re-)index *key* from *spec*; None removes it."""
+        new = tuple(_terms_of(spec)) if spec is not None else ()
+        old = self._terms.get(key, ())
+        if new == old:
+            return
+        postings = self._postings
+        for term in old:
+            keys = postings.get(term)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del postings[term]
+        for term in new:
+            postings.setdefault(term, set()).add(key)
+        if new:
+            self._terms[key] = new
+        else:
+            self._terms.pop(key, None)
+
+    def remove(self, key: str) -> None:
+        self.update(key, None)
+
+    def lookup(self, field: str, value: Any) -> Set[str]:
+        """Keys whose ``metadata[field]`` equals (or, for tags, contains) *value*."""
+        terms = _query_terms(field, value)
+        if terms is None:
+            raise ValueError(f"metadata field {field!r} with value {value!r} is not indexed")
+        return self._intersect([self._postings.get(term, set()) for term in terms])
+
+    def candidates(self, query: Dict[str, Any]) -> Tuple[Optional[Set[str]], Dict[str, Any]]:
+        """Split a ``meta_query`` into indexed matches and the terms left over.
+
+        Returns ``(keys, residual)``: *keys* satisfy every indexed term of
+        *query* (None when no term is indexed, i.e. every object is a
+        candidate) and *residual* holds the terms callers still have to check.
+        """
+        postings: List[Set[str]] = []
+        residual: Dict[str, Any] = {}
+        for query_key, value in query.items():
+            field = metadata_field(query_key)
+            terms = _query_terms(field, value) if field is not None else None
+            if terms is None:
+                residual[query_key] = value
+                continue
+            postings.extend(self._postings.get(term, set()) for term in terms)
+        if not postings:
+            return None, residual
+        return self._intersect(postings), residual
+
+    @staticmethod
+    def _intersect(postings: List[Set[str]]) -> Set[str]:
+        postings.sort(key=len)
+        result = set(postings[0])
+        for keys in postings[1:]:
+            if not result:
+                break
+            result &= keys
+        return result
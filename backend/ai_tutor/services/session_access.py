@@ -0,0 +1,129 @@
+"""ai_tutor/services/session_access.py
+
+Cached "does this user own this session?" checks.
+
+The whiteboard socket, the tutor socket and ``GET /sessions/{id}/board_summary``
+all have to confirm session ownership before serving anything.  Reconnect
+storms and summary polling used to turn each of those into a ``sessions``
+select; :func:`user_owns_session` answers from a small per-process TTL cache
+instead and only hits Postgres on a miss.
+
+Denials are cached too, but for a much shorter time, so that a session that
+is created right after a rejected poll becomes reachable quickly.  Code that
+learns about ownership calls :func:`remember` (session created, row fetched by
+owner) or :func:`invalidate` (an owner-scoped read or update found no row, so
+the session was deleted or moved) so the cache never has to wait for a TTL to
+be correct on this worker.
+
+Tunables (environment):
+
+``SESSION_ACCESS_TTL_S``           – lifetime of an "allowed" entry (default 300)
+``SESSION_ACCESS_NEGATIVE_TTL_S``  – lifetime of a "denied" entry (default 15)
+``SESSION_ACCESS_MAX_ENTRIES``     – cache size before LRU eviction (default 10000)
+"""
+
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+import os
+import time
+
+from ai_tutor.metrics import SESSION_ACCESS_CHECKS
+
+_ALLOW_TTL_S = float(os.getenv("SESSION_ACCESS_TTL_S", "300"))
+_DENY_TTL_S = float(os.getenv("SESSION_ACCESS_NEGATIVE_TTL_S", "15"))
+_MAX_ENTRIES = int(os.getenv("SESSION_ACCESS_MAX_ENTRIES", "10000"))
+
+_Key = Tuple[str, str]
+
+
+class SessionAccessCache:
+    """TTL + LRU cache of ``(user_id, session_id) -> allowed``."""
+
+    def __init__(
+        self,
+        allow_ttl_s: float = _ALLOW_TTL_S,
+        deny_ttl_s: float = _DENY_TTL_S,
+        max_entries: int = _MAX_ENTRIES,
+        clock=time.monotonic,
+    ) -> None:
+        self.allow_ttl_s = allow_ttl_s
+        self.deny_ttl_s = deny_ttl_s
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries: "OrderedDict[_Key, Tuple[bool, float]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, user_id: Any, session_id: Any) -> Optional[bool]:
+        """Cached verdict, or None when unknown / expired."""
+        key = (str(user_id), str(session_id))
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        allowed, expires_at = entry
+        if expires_at <= self._clock():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return allowed
+
+    def put(self, user_id: Any, session_id: Any, allowed: bool) -> None:
+        ttl = self.allow_ttl_s if allowed else self.deny_ttl_s
+        if ttl <= 0:
+            return
+        key = (str(user_id), str(session_id))
+        self._entries[key] = (allowed, self._clock() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, session_id: Any, user_id: Any = None) -> None:
+        """Forget *session_id* for *user_id*, or for every user when omitted."""
+        sid = str(session_id)
+        if user_id is not None:
+            self._entries.pop((str(user_id), sid), None)
+            return
+        for key in [k for k in self._entries if k[1] == sid]:
+            del self._entries[key]
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+_cache = SessionAccessCache()
+
+
+def user_owns_session(supabase, user_id: Any, session_id: Any) -> bool:
+    """Return True when *user_id* owns *session_id*.
+
+    Lookup errors propagate and are not cached, so callers keep their existing
+    error handling and a transient DB failure is retried on the next call.
+    """
+    cached = _cache.get(user_id, session_id)
+    if cached is not None:
+        SESSION_ACCESS_CHECKS.labels(result="hit").inc()
+        return cached
+
+    SESSION_ACCESS_CHECKS.labels(result="miss").inc()
+    resp = (
+        supabase.table("sessions")
+        .select("id")
+        .eq("id", str(session_id))
+        .eq("user_id", str(user_id))
+        .maybe_single()
+        .execute()
+    )
+    allowed = bool(resp is not None and resp.data)
+    _cache.put(user_id, session_id, allowed)
+    return allowed
+
+
+def remember(user_id: Any, session_id: Any, allowed: bool = True) -> None:
+    """Record a verdict learned elsewhere (session created, row already fetched)."""
+    _cache.put(user_id, session_id, allowed)
+
+
+def invalidate(session_id: Any, user_id: Any = None) -> None:
+    """Drop cached verdicts after ownership of *session_id* changed."""
+    _cache.invalidate(session_id, user_id)
@@ -1,10 +1,17 @@
 """ai_tutor/services/spatial_index.py
 
 Provides a 2D R-tree index for fast spatial querying of whiteboard objects.
+
+Each session's index lives on its materialised board view
+(`ai_tutor.services.whiteboard_view.BoardView.spatial`) and is kept in sync
+as whiteboard deltas are applied, so queries never rebuild it.
 """
-from typing import List, Tuple, Any, Dict, Iterator, Optional
+from typing import List, Tuple, Any, Dict, Iterable, Optional, Sequence, Set
 
+import itertools
 import logging
+import math
+import os
 
 log = logging.getLogger(__name__)
 
@@ -14,7 +21,7 @@ try:
 except ImportError:  # pragma: no cover – missing native lib in some envs
     _HAS_RTREE = False
     _rtree_index = None  # type: ignore
-    log.warning("rtree package not available – falling back to in-memory bbox list.\n"  # noqa: W291
+    log.warning("rtree package not available – falling back to a uniform-grid index.\n"  # noqa: W291
                 "Install via `pip install rtree` and ensure libspatialindex is present "
                 "for faster spatial queries.")
 
@@ -22,24 +29,205 @@ except ImportError:  # pragma: no cover – missing native lib in some envs
 # Typically (minx, miny, maxx, maxy)
 BoundingBox = Tuple[float, float, float, float]
 
+# Edge of a fallback grid cell in board units (boards are a few thousand wide)
+_GRID_CELL = float(os.getenv("SPATIAL_GRID_CELL", "256"))
+# Objects covering more cells than this go to a short list every query scans
+_GRID_MAX_CELLS = 64
+
+# Query predicates: the object box intersects / lies within / contains the query rect
+INTERSECTS = "intersects"
+WITHIN = "within"
+CONTAINS = "contains"
+PREDICATES = (INTERSECTS, WITHIN, CONTAINS)
+
+Rect = Tuple[float, float, float, float]  # (x, y, width, height)
+
+
+def spec_rect(spec: Dict[str, Any]) -> Optional[Rect]:
+    """Absolute ``(x, y, width, height)`` of a CanvasObjectSpec, or None.
+
+    ``metadata.bbox`` wins over the top-level ``x``/``y``/``width``/``height``;
+    percentage-only specs have no absolute box and are not indexed.
+    """
+    md = spec.get("metadata") or {}
+    bbox = md.get("bbox") if isinstance(md, dict) else None
+    if isinstance(bbox, (list, tuple)) and len(bbox) == 4:
+        values = tuple(bbox)
+    elif all(k in spec for k in ("x", "y", "width", "height")):
+        values = (spec["x"], spec["y"], spec["width"], spec["height"])
+    else:
+        return None
+    if not all(isinstance(v, (int, float)) and not isinstance(v, bool) and math.isfinite(v) for v in values):
+        return None
+    return tuple(float(v) for v in values)  # type: ignore[return-value]
+
+
+def _within(box: BoundingBox, q: BoundingBox) -> bool:
+    return q[0] <= box[0] and box[2] <= q[2] and q[1] <= box[1] and box[3] <= q[3]
+
+
+def _point_distance(box: BoundingBox, x: float, y: float) -> float:
+    dx = max(box[0] - x, 0.0, x - box[2])
+    dy = max(box[1] - y, 0.0, y - box[3])
+    return math.hypot(dx, dy)
+
+
+class _GridIndex:
+    """Uniform-grid hash used when *rtree* is not available.
+
+    Every object is registered in each cell its box overlaps and its box is
+    kept by id, so inserts and deletes only touch that object's cells and
+    queries only visit the cells under the query rectangle.  Intersection is
+    inclusive (touching edges match), like the rtree backend.
+    """
+
+    def __init__(self, cell: float = _GRID_CELL, max_cells: int = _GRID_MAX_CELLS) -> None:
+        self.cell = cell
+        self.max_cells = max_cells
+        self._boxes: Dict[str, BoundingBox] = {}
+        self._cells: Dict[Tuple[int, int], Set[str]] = {}
+        self._large: Set[str] = set()
+
+    def __len__(self) -> int:
+        return len(self._boxes)
+
+    def _span(self, bbox: BoundingBox) -> Optional[Tuple[int, int, int, int]]:
+        """Cell range ``(cx0, cy0, cx1, cy1)`` under *bbox*; None if unbounded/invalid."""
+        if not all(math.isfinite(v) for v in bbox) or bbox[0] > bbox[2] or bbox[1] > bbox[3]:
+            return None
+        c = self.cell
+        return (
+            math.floor(bbox[0] / c),
+            math.floor(bbox[1] / c),
+            math.floor(bbox[2] / c),
+            math.floor(bbox[3] / c),
+        )
+
+    @staticmethod
+    def _cell_count(span: Tuple[int, int, int, int]) -> int:
+        return (span[2] - span[0] + 1) * (span[3] - span[1] + 1)
+
+    def insert(self, object_id: str, bbox: BoundingBox) -> None:
+        if object_id in self._boxes:
+            self.delete(object_id)
+        self._boxes[object_id] = bbox
+        span = self._span(bbox)
+        if span is None or self._cell_count(span) > self.max_cells:
+            self._large.add(object_id)
+            return
+        cells = self._cells
+        for cx in range(span[0], span[2] + 1):
+            for cy in range(span[1], span[3] + 1):
+                bucket = cells.get((cx, cy))
+                if bucket is None:
+                    cells[(cx, cy)] = {object_id}
+                else:
+                    bucket.add(object_id)
+
+    def delete(self, object_id: str) -> None:
+        bbox = self._boxes.pop(object_id, None)
+        if bbox is None:
+            return
+        if object_id in self._large:
+            self._large.discard(object_id)
+            return
+        span = self._span(bbox)
+        cells = self._cells
+        for cx in range(span[0], span[2] + 1):  # type: ignore[index]
+            for cy in range(span[1], span[3] + 1):  # type: ignore[index]
+                bucket = cells.get((cx, cy))
+                if bucket is not None:
+                    bucket.discard(object_id)
+                    if not bucket:
+                        del cells[(cx, cy)]
+
+    def intersection(self, qbbox: BoundingBox) -> List[str]:
+        span = self._span(qbbox)
+        if span is None or self._cell_count(span) >= len(self._cells):
+            # Visiting that many cells costs more than checking every box
+            candidates: Any = self._boxes
+        else:
+            candidates = set(self._large)
+            cells = self._cells
+            for cx in range(span[0], span[2] + 1):
+                for cy in range(span[1], span[3] + 1):
+                    bucket = cells.get((cx, cy))
+                    if bucket:
+                        candidates.update(bucket)
+        qminx, qminy, qmaxx, qmaxy = qbbox
+        boxes = self._boxes
+        hits: List[str] = []
+        for oid in candidates:
+            minx, miny, maxx, maxy = boxes[oid]
+            if minx <= qmaxx and maxx >= qminx and miny <= qmaxy and maxy >= qminy:
+                hits.append(oid)
+        return hits
+
+    def within(self, qbbox: BoundingBox) -> List[str]:
+        boxes = self._boxes
+        return [oid for oid in self.intersection(qbbox) if _within(boxes[oid], qbbox)]
+
+    def nearest(self, x: float, y: float, k: int) -> List[str]:
+        """*k* ids closest to the point, searching squares of doubling radius.
+
+        Anything outside a square of radius *r* is farther than *r*, so once
+        the k-th best candidate is within *r* the answer is final.
+        """
+        if k <= 0 or not self._boxes:
+            return []
+        boxes = self._boxes
+        r = self.cell
+        while True:
+            candidates = self.intersection((x - r, y - r, x + r, y + r))
+            exhaustive = len(candidates) == len(boxes)
+            if len(candidates) >= k or exhaustive:
+                ranked = sorted(candidates, key=lambda oid: _point_distance(boxes[oid], x, y))[:k]
+                if exhaustive or _point_distance(boxes[ranked[-1]], x, y) <= r:
+                    return ranked
+            r *= 2
+
+    def clear(self) -> None:
+        self._boxes.clear()
+        self._cells.clear()
+        self._large.clear()
+
+
 class RTreeIndex:
     """Session-scoped 2D spatial index.
 
     The implementation uses the *rtree* package when available.  If the package
     cannot be imported (e.g. missing native libspatialindex), the class falls
-    back to an O(*N*) naïve list walk – still functional but slower.
+    back to a pure-Python uniform grid (:class:`_GridIndex`) that returns the
+    same results.  Pass ``use_rtree=False`` to force the fallback.
+
+    The index keeps each object's box by id, so updates and deletes never need
+    the caller to remember the previous box.  On the rtree backend objects are
+    stored under small integer ids (stable for the object's lifetime) rather
+    than pickled payloads.  Query results are unordered except for
+    :meth:`nearest`.
     """
 
-    def __init__(self) -> None:
-        if _HAS_RTREE:
-            # Properties can be tuned later (dimensions=2 by default)
-            p = _rtree_index.Property()
-            p.dimension = 2
-            self._rtree = _rtree_index.Index(properties=p)
+    def __init__(self, use_rtree: Optional[bool] = None) -> None:
+        if use_rtree and not _HAS_RTREE:
+            raise RuntimeError("rtree package is not available")
+        self._use_rtree = _HAS_RTREE if use_rtree is None else use_rtree
+        if self._use_rtree:
+            self._rtree = self._new_rtree()
+            self._boxes: Dict[str, BoundingBox] = {}
+            self._ids: Dict[str, int] = {}
+            self._names: Dict[int, str] = {}
+            self._next_id = 0
         else:
             self._rtree = None  # type: ignore
-            self._bbox_records: list[tuple[str, BoundingBox]] = []  # Fallback store
-        log.debug("RTreeIndex initialised (use_rtree=%s)", _HAS_RTREE)
+            self._grid = _GridIndex()
+            self._boxes = self._grid._boxes
+        log.debug("RTreeIndex initialised (use_rtree=%s)", self._use_rtree)
+
+    def __len__(self) -> int:
+        return len(self._boxes)
+
+    def __contains__(self, object_id: str) -> bool:
+        return object_id in self._boxes
 
     # ------------------------------------------------------------------ #
     # Helper
@@ -47,7 +235,25 @@ class RTreeIndex:
 
     @staticmethod
     def _to_bbox(x: float, y: float, width: float, height: float) -> BoundingBox:
-        return (x, y, x + width, y + height)
+        # Negative sizes (boxes drawn up/left) span backwards from (x, y)
+        x2, y2 = x + width, y + height
+        return (min(x, x2), min(y, y2), max(x, x2), max(y, y2))
+
+    @staticmethod
+    def _new_rtree(stream: Optional[Iterable[Tuple[int, BoundingBox, None]]] = None):
+        # Properties can be tuned later (dimensions=2 by default)
+        p = _rtree_index.Property()
+        p.dimension = 2
+        if stream is None:
+            return _rtree_index.Index(properties=p)
+        return _rtree_index.Index(stream, properties=p)
+
+    def _assign_id(self, object_id: str) -> int:
+        rid = self._next_id
+        self._next_id += 1
+        self._ids[object_id] = rid
+        self._names[rid] = object_id
+        return rid
 
     # ------------------------------------------------------------------ #
     # Public API
@@ -63,36 +269,92 @@ class RTreeIndex:
     ) -> None:
         """Insert or update *object_id* with its current bounding box."""
         bbox = self._to_bbox(x, y, width, height)
-        if _HAS_RTREE:
-            # R-tree cannot update – delete then insert
-            hash_id = hash(object_id)
-            try:
-                self._rtree.delete(hash_id, bbox)  # type: ignore[attr-defined]
-            except Exception:
-                # ignore – might not exist
-                pass
-            self._rtree.insert(hash_id, bbox, obj=object_id)  # type: ignore[attr-defined]
+        if not self._use_rtree:
+            self._grid.insert(object_id, bbox)
+            return
+        rid = self._ids.get(object_id)
+        if rid is None:
+            rid = self._assign_id(object_id)
         else:
-            # Remove any previous record with same id
-            self._bbox_records = [(oid, bb) for (oid, bb) in self._bbox_records if oid != object_id]
-            self._bbox_records.append((object_id, bbox))
+            # R-tree cannot update – delete then insert
+            self._rtree.delete(rid, self._boxes[object_id])  # type: ignore[attr-defined]
+        self._rtree.insert(rid, bbox)  # type: ignore[attr-defined]
+        self._boxes[object_id] = bbox
+
+    def remove_object(self, object_id: str, *_bbox: float) -> None:
+        """Remove *object_id* (no-op when absent).
+
+        Extra positional arguments (the object's old ``x, y, width, height``)
+        are accepted for older callers and ignored.
+        """
+        if not self._use_rtree:
+            self._grid.delete(object_id)
+            return
+        rid = self._ids.pop(object_id, None)
+        if rid is None:
+            return
+        del self._names[rid]
+        self._rtree.delete(rid, self._boxes.pop(object_id))  # type: ignore[attr-defined]
+
+    def bulk_load(self, items: Iterable[Tuple[str, float, float, float, float]]) -> None:
+        """Replace the contents with *items* ``(object_id, x, y, width, height)``.
+
+        On the rtree backend the tree is built with the stream (STR bulk
+        loading) constructor, which is much faster than one insert per object
+        and yields a better-packed tree.  Later duplicates of an id win.
+        """
+        boxes = {oid: self._to_bbox(x, y, w, h) for oid, x, y, w, h in items}
+        if not self._use_rtree:
+            self._grid.clear()
+            for oid, bbox in boxes.items():
+                self._grid.insert(oid, bbox)
+            return
+        self._boxes, self._ids, self._names, self._next_id = {}, {}, {}, 0
+        for oid in boxes:
+            self._assign_id(oid)
+        self._boxes = boxes
+        if not boxes:
+            self._rtree = self._new_rtree()  # The stream loader rejects empty input
+            return
+        ids = self._ids
+        self._rtree = self._new_rtree((ids[oid], bbox, None) for oid, bbox in boxes.items())
 
-    def remove_object(
+    def bbox_of(self, object_id: str) -> Optional[BoundingBox]:
+        """Indexed ``(minx, miny, maxx, maxy)`` of *object_id*, or None."""
+        return self._boxes.get(object_id)
+
+    def query(
         self,
-        object_id: str,
-        x: float,
-        y: float,
-        width: float,
-        height: float,
-    ) -> None:
-        bbox = self._to_bbox(x, y, width, height)
-        if _HAS_RTREE:
-            try:
-                self._rtree.delete(hash(object_id), bbox)  # type: ignore[attr-defined]
-            except Exception:
-                pass
-        else:
-            self._bbox_records = [(oid, bb) for (oid, bb) in self._bbox_records if oid != object_id]
+        query_x: float,
+        query_y: float,
+        query_width: float,
+        query_height: float,
+        predicate: str = INTERSECTS,
+    ) -> List[str]:
+        """Ids whose box *predicate*s the query rect (x, y, w, h).
+
+        ``intersects`` – boxes overlap or touch; ``within`` – the object lies
+        entirely inside the rect; ``contains`` – the object's box covers the
+        whole rect (use a zero-sized rect for "what is under this point").
+        """
+        qbbox = self._to_bbox(query_x, query_y, query_width, query_height)
+        if predicate == INTERSECTS:
+            if not self._use_rtree:
+                return self._grid.intersection(qbbox)
+            names = self._names
+            return [names[rid] for rid in self._rtree.intersection(qbbox)]  # type: ignore[attr-defined]
+        if predicate == WITHIN:
+            if not self._use_rtree:
+                return self._grid.within(qbbox)
+            names = self._names
+            return [names[rid] for rid in self._rtree.contains(qbbox)]  # type: ignore[attr-defined]
+        if predicate == CONTAINS:
+            boxes = self._boxes
+            return [
+                oid for oid in self.query(query_x, query_y, query_width, query_height)
+                if _within(qbbox, boxes[oid])
+            ]
+        raise ValueError(f"Unknown spatial predicate {predicate!r}; expected one of {PREDICATES}")
 
     def query_intersecting_objects(
         self,
@@ -102,43 +364,39 @@ class RTreeIndex:
         query_height: float,
     ) -> List[str]:
         """Return *ids* whose bbox intersects the query rect (x, y, w, h)."""
-        qbbox = self._to_bbox(query_x, query_y, query_width, query_height)
-        if _HAS_RTREE:
-            hits = self._rtree.intersection(qbbox, objects=True)  # type: ignore[attr-defined]
-            return [hit.object for hit in hits]
-        else:
-            qminx, qminy, qmaxx, qmaxy = qbbox
-            hits: list[str] = []
-            for oid, (minx, miny, maxx, maxy) in self._bbox_records:
-                if (minx < qmaxx and maxx > qminx and miny < qmaxy and maxy > qminy):
-                    hits.append(oid)
-            return hits
+        return self.query(query_x, query_y, query_width, query_height, INTERSECTS)
 
-    def clear(self) -> None:
-        if _HAS_RTREE:
-            # Re-initialise index
-            p = _rtree_index.Property()
-            p.dimension = 2
-            self._rtree = _rtree_index.Index(properties=p)
-        else:
-            self._bbox_records.clear()
+    def query_within(self, query_x: float, query_y: float, query_width: float, query_height: float) -> List[str]:
+        """Return *ids* whose bbox lies entirely inside the query rect."""
+        return self.query(query_x, query_y, query_width, query_height, WITHIN)
 
+    def query_containing(self, query_x: float, query_y: float, query_width: float, query_height: float) -> List[str]:
+        """Return *ids* whose bbox covers the whole query rect."""
+        return self.query(query_x, query_y, query_width, query_height, CONTAINS)
 
-# Convenience singleton per process (sufficient for Phase-2 prototypes)
-_DEFAULT_INDEX: Optional[RTreeIndex] = None
+    def query_batch(self, rects: Sequence[Rect], predicate: str = INTERSECTS) -> List[List[str]]:
+        """Answer many ``(x, y, w, h)`` rects at once; one id list per rect, in order."""
+        if predicate not in PREDICATES:
+            raise ValueError(f"Unknown spatial predicate {predicate!r}; expected one of {PREDICATES}")
+        return [self.query(x, y, w, h, predicate) for x, y, w, h in rects]
 
-def get_index() -> RTreeIndex:
-    global _DEFAULT_INDEX
-    if _DEFAULT_INDEX is None:
-        _DEFAULT_INDEX = RTreeIndex()
-    return _DEFAULT_INDEX
+    def nearest(self, x: float, y: float, k: int = 1) -> List[str]:
+        """Up to *k* ids ordered by distance from the point (0 when inside a box).
 
-# It might be beneficial to have a global or session-specific instance of RTreeIndex.
-# For now, this class definition is the focus.
-# Consider how this index will be populated and kept in sync with the Yjs whiteboard state.
-# Typically, a service or manager would listen to whiteboard updates (ADD, UPDATE, DELETE)
-# and call the RTreeIndex methods accordingly.
+        Ties are broken arbitrarily; exactly ``min(k, len(self))`` ids are returned.
+        """
+        if k <= 0:
+            return []
+        if not self._use_rtree:
+            return self._grid.nearest(x, y, k)
+        names = self._names
+        hits = self._rtree.nearest((x, y, x, y), k)  # type: ignore[attr-defined]
+        return [names[rid] for rid in itertools.islice(hits, k)]
 
-# Add logging
-import logging
-log = logging.getLogger(__name__) 
\ No newline at end of file
+    def clear(self) -> None:
+        if self._use_rtree:
+            # Re-initialise index
+            self._rtree = self._new_rtree()
+            self._boxes, self._ids, self._names, self._next_id = {}, {}, {}, 0
+        else:
+            self._grid.clear()
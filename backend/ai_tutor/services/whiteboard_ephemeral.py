@@ -0,0 +1,135 @@
+"""ai_tutor/services/whiteboard_ephemeral.py
+
+Short-lived whiteboard state – pointer pings, highlight strokes, question
+tags – kept *outside* the persisted YDoc.
+
+Clients on the sync protocol send these entries as ephemeral messages (see
+`ai_tutor.services.whiteboard_protocol`).  ``routers/whiteboard_ws`` stores
+them in the session's :class:`EphemeralStore`, fans them out to the other
+sockets and workers, and deletes them when their ``metadata.expiresAt``
+passes.  Nothing here is written to Redis, so high-frequency pointer traffic
+no longer bloats snapshots or the Yjs history.
+
+Entries that legacy clients still write into the YDoc's ``ephemeral`` map
+are mirrored into the same store and fanned out on the channel, so readers
+(``ephemeralSummary``, sync-protocol clients) have a single place to look;
+compaction drops them from the persisted base.  The store only exists on workers hosting the session;
+elsewhere :func:`entries` is empty and the board digest falls back to the
+persisted ``ephemeral`` map of a snapshot view.
+"""
+
+from typing import Any, Dict, Iterator, List, Optional
+import os
+
+# Entries without a usable expiresAt (e.g. question tags) live this long.
+DEFAULT_TTL_MS = float(os.getenv("WHITEBOARD_EPHEMERAL_DEFAULT_TTL_S", "300")) * 1000
+# Upper bound on any client-supplied lifetime.
+MAX_TTL_MS = float(os.getenv("WHITEBOARD_EPHEMERAL_MAX_TTL_S", "600")) * 1000
+# Per-session cap; writes of new ids beyond it are rejected.
+MAX_ENTRIES = int(os.getenv("WHITEBOARD_EPHEMERAL_MAX_ENTRIES", "512"))
+
+
+def expires_at_of(spec: Any) -> float:
+    """``metadata.expiresAt`` of *spec* in ms, or 0 if missing / not a number."""
+    md = (spec.get("metadata") if isinstance(spec, dict) else None) or {}
+    expires_at = md.get("expiresAt", 0)
+    if isinstance(expires_at, bool) or not isinstance(expires_at, (int, float)):
+        return 0
+    return float(expires_at)
+
+
+class EphemeralStore:
+    """TTL'd ephemeral entries of one session, keyed by spec id."""
+
+    def __init__(self, session_id: str, max_entries: int = MAX_ENTRIES) -> None:
+        self.session_id = session_id
+        self.max_entries = max_entries
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        # Bumped on every change so callers can cache derived data
+        self.version = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.entries
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self.entries.get(key)
+
+    def values(self) -> Iterator[Dict[str, Any]]:
+        return iter(self.entries.values())
+
+    def put(self, spec: Any, now_ms: float) -> Optional[Dict[str, Any]]:
+        """Store a channel-written *spec*, normalising its expiry.
+
+        Returns the stored spec (with ``metadata.expiresAt`` clamped to
+        ``[now, now + MAX_TTL_MS]``, defaulting to ``now + DEFAULT_TTL_MS``),
+        or None if the spec has no id or the session is full.
+        """
+        if not isinstance(spec, dict):
+            return None
+        key = spec.get("id")
+        if not isinstance(key, str) or not key:
+            return None
+        if key not in self.entries and len(self.entries) >= self.max_entries:
+            return None
+        expires_at = expires_at_of(spec) or now_ms + DEFAULT_TTL_MS
+        md = spec.get("metadata")
+        md = dict(md) if isinstance(md, dict) else {}
+        md["expiresAt"] = min(expires_at, now_ms + MAX_TTL_MS)
+        stored = {**spec, "metadata": md}
+        self.entries[key] = stored
+        self.version += 1
+        return stored
+
+    def remove(self, key: str) -> bool:
+        if self.entries.pop(key, None) is None:
+            return False
+        self.version += 1
+        return True
+
+    def expire(self, keys, now_ms: float) -> List[str]:
+        """Remove the *keys* whose current expiry has passed; returns them."""
+        removed = []
+        for key in keys:
+            spec = self.entries.get(key)
+            if spec is not None and expires_at_of(spec) <= now_ms:
+                del self.entries[key]
+                removed.append(key)
+        if removed:
+            self.version += 1
+        return removed
+
+    def apply_event(self, keys: Dict[str, Dict[str, Any]]) -> None:
+        """Mirror one event of the YDoc ``ephemeral`` map (legacy clients)."""
+        for key, change in keys.items():
+            value = change.get("newValue")
+            if change.get("action") == "delete" or not isinstance(value, dict):
+                self.entries.pop(key, None)
+            else:
+                self.entries[key] = value
+        self.version += 1
+
+
+# session_id -> store of a session hosted by this process
+_stores: Dict[str, EphemeralStore] = {}
+
+
+def register(store: EphemeralStore) -> None:
+    _stores[store.session_id] = store
+
+
+def unregister(store: EphemeralStore) -> None:
+    if _stores.get(store.session_id) is store:
+        del _stores[store.session_id]
+
+
+def hosted_store(session_id: str) -> Optional[EphemeralStore]:
+    return _stores.get(session_id)
+
+
+def entries(session_id: str) -> List[Dict[str, Any]]:
+    """Current ephemeral specs of *session_id* (empty when not hosted here)."""
+    store = _stores.get(session_id)
+    return list(store.values()) if store is not None else []
@@ -0,0 +1,107 @@
+"""ai_tutor/services/whiteboard_protocol.py
+
+Message framing for whiteboard sockets that opt into the sync protocol by
+connecting with ``?proto=2``.  The layout follows y-protocols' sync messages
+(lib0 variable-length unsigned integers), so clients can use the standard Yjs
+encoders::
+
+    [varUint messageType=0][varUint syncType][varUint8Array payload]
+
+``syncType`` is :data:`SYNC_STEP1` (payload = state vector),
+:data:`SYNC_STEP2` (payload = the update the receiver is missing) or
+:data:`SYNC_UPDATE` (payload = incremental update).
+
+Handshake: the client sends step 1 with its state vector and the server
+answers step 2 with only the diff; the server also sends its own step 1 so the
+client can push back edits made while offline.  Legacy sockets (no ``proto``)
+keep exchanging raw Yjs updates and receive the full state on connect.
+
+Ephemeral entries (pointer pings, highlight strokes, question tags) travel on
+a separate, awareness-style message that never touches the YDoc::
+
+    [varUint messageType=1][varUint8Array payload]
+
+where ``payload`` is UTF-8 JSON ``{"set": [spec, ...], "remove": [id, ...]}``.
+"""
+
+from typing import Tuple
+
+PROTOCOL_VERSION = "2"
+
+MESSAGE_SYNC = 0
+MESSAGE_EPHEMERAL = 1
+
+SYNC_STEP1 = 0
+SYNC_STEP2 = 1
+SYNC_UPDATE = 2
+
+
+def write_var_uint(value: int) -> bytes:
+    """Encode *value* as a lib0 varUint (7 bits per byte, little-endian)."""
+    if value < 0:
+        raise ValueError("varUint must be non-negative")
+    out = bytearray()
+    while value > 0x7F:
+        out.append(0x80 | (value & 0x7F))
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def read_var_uint(data: bytes, pos: int) -> Tuple[int, int]:
+    """Decode a varUint at *pos*; returns ``(value, next_pos)``."""
+    value = shift = 0
+    while True:
+        if pos >= len(data):
+            raise ValueError("truncated varUint")
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+        if shift > 63:
+            raise ValueError("varUint too long")
+
+
+def encode_sync(sync_type: int, payload: bytes) -> bytes:
+    return write_var_uint(MESSAGE_SYNC) + write_var_uint(sync_type) + write_var_uint(len(payload)) + payload
+
+
+def encode_update(update: bytes) -> bytes:
+    return encode_sync(SYNC_UPDATE, update)
+
+
+def encode_ephemeral(payload: bytes) -> bytes:
+    return write_var_uint(MESSAGE_EPHEMERAL) + write_var_uint(len(payload)) + payload
+
+
+def message_type(data: bytes) -> int:
+    """Return the leading message type of *data* (raises ValueError if truncated)."""
+    return read_var_uint(data, 0)[0]
+
+
+def decode_ephemeral(data: bytes) -> bytes:
+    """Return the JSON payload of an ephemeral message (ValueError if malformed)."""
+    message_type, pos = read_var_uint(data, 0)
+    if message_type != MESSAGE_EPHEMERAL:
+        raise ValueError(f"not an ephemeral message (type {message_type})")
+    length, pos = read_var_uint(data, pos)
+    if pos + length > len(data):
+        raise ValueError("truncated payload")
+    return data[pos:pos + length]
+
+
+def decode_message(data: bytes) -> Tuple[int, int, bytes]:
+    """Split a framed message into ``(message_type, sync_type, payload)``.
+
+    Raises ValueError on malformed input or non-sync message types.
+    """
+    message_type, pos = read_var_uint(data, 0)
+    if message_type != MESSAGE_SYNC:
+        raise ValueError(f"unsupported message type {message_type}")
+    sync_type, pos = read_var_uint(data, pos)
+    length, pos = read_var_uint(data, pos)
+    if pos + length > len(data):
+        raise ValueError("truncated payload")
+    return message_type, sync_type, data[pos:pos + length]
@@ -0,0 +1,203 @@
+"""ai_tutor/services/whiteboard_relay.py
+
+Cross-worker fan-out for the collaborative whiteboard.
+
+Every uvicorn worker keeps its own in-memory YDoc per hosted session.  To let
+clients of the same session connect to *different* workers (or nodes), each
+worker publishes the updates it applied locally on the Redis pub/sub channel
+``yjs:relay:{session}`` and applies whatever its peers publish there.
+
+Frame layout (binary)::
+
+    [1 byte kind][16 bytes worker id][payload]
+
+``kind`` is :data:`KIND_UPDATE` (payload = Yjs update),
+:data:`KIND_SYNC_REQUEST` (payload = Yjs state vector) or
+:data:`KIND_EPHEMERAL` (payload = JSON ephemeral change, never persisted).  A worker that starts
+hosting a session publishes a sync request after hydrating from Redis; workers
+already hosting it reply with the diff so updates that are still waiting in
+another worker's write-behind buffer are not missed.  Frames carrying our own
+worker id are dropped (echo suppression).
+
+Publications are serialised per process: the receiving side applies updates
+as they arrive, and y-py drops an update whose predecessors it has not seen
+yet, so one worker's frames must reach the channel in the order they were
+emitted even when several tasks publish at once over a connection pool.
+"""
+
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Tuple
+import asyncio
+import logging
+import uuid
+
+from redis.asyncio import Redis  # type: ignore
+
+log = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = "yjs:relay:"
+
+KIND_UPDATE = b"u"
+KIND_SYNC_REQUEST = b"q"
+KIND_EPHEMERAL = b"e"
+
+_WORKER_ID_LEN = 16
+
+UpdateHandler = Callable[[bytes], Awaitable[None]]
+SyncHandler = Callable[[bytes], Optional[bytes]]
+EphemeralHandler = Callable[[bytes], Awaitable[None]]
+
+
+def channel_for(session_id: str) -> str:
+    return f"{CHANNEL_PREFIX}{session_id}"
+
+
+def encode_frame(kind: bytes, worker_id: bytes, payload: bytes) -> bytes:
+    return kind + worker_id + payload
+
+
+def decode_frame(frame: bytes) -> Tuple[bytes, bytes, bytes]:
+    """Split *frame* into ``(kind, worker_id, payload)``."""
+    header = 1 + _WORKER_ID_LEN
+    if len(frame) < header:
+        raise ValueError("relay frame too short")
+    return frame[:1], frame[1:header], frame[header:]
+
+
+class WhiteboardRelay:
+    """One Redis pub/sub connection per process, multiplexing all hosted sessions."""
+
+    def __init__(self, redis: Redis, worker_id: Optional[bytes] = None) -> None:
+        self.redis = redis
+        self.worker_id = worker_id or uuid.uuid4().bytes
+        self._pubsub = None
+        self._handlers: Dict[str, Tuple[UpdateHandler, SyncHandler, Optional[EphemeralHandler]]] = {}
+        self._reader: Optional[asyncio.Task] = None
+        # FIFO, so frames reach the channel in emission order
+        self._publish_lock = asyncio.Lock()
+
+    # ------------------------------------------------------------------ #
+    # Subscription management
+    # ------------------------------------------------------------------ #
+
+    async def subscribe(
+        self,
+        session_id: str,
+        on_update: UpdateHandler,
+        on_sync_request: SyncHandler,
+        on_ephemeral: Optional[EphemeralHandler] = None,
+    ) -> None:
+        """Start receiving remote frames for *session_id*."""
+        if self._pubsub is None:
+            self._pubsub = self.redis.pubsub()
+        self._handlers[session_id] = (on_update, on_sync_request, on_ephemeral)
+        await self._pubsub.subscribe(channel_for(session_id))
+        if self._reader is None or self._reader.done():
+            self._reader = asyncio.create_task(self._read_loop())
+
+    async def unsubscribe(self, session_id: str) -> None:
+        if self._handlers.pop(session_id, None) is None or self._pubsub is None:
+            return
+        try:
+            await self._pubsub.unsubscribe(channel_for(session_id))
+        except Exception as exc:  # pragma: no cover
+            log.warning("[whiteboard_relay] Unsubscribe failed for %s: %s", session_id, exc)
+
+    async def close(self) -> None:
+        if self._reader is not None:
+            self._reader.cancel()
+            try:
+                await self._reader
+            except asyncio.CancelledError:
+                pass
+            self._reader = None
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+            self._pubsub = None
+        self._handlers.clear()
+
+    # ------------------------------------------------------------------ #
+    # Publishing
+    # ------------------------------------------------------------------ #
+
+    async def publish_updates(self, session_id: str, updates: Iterable[bytes]) -> None:
+        """Publish locally applied *updates* to the other workers."""
+        frames = [encode_frame(KIND_UPDATE, self.worker_id, u) for u in updates]
+        if not frames:
+            return
+        channel = channel_for(session_id)
+        async with self._publish_lock:
+            if len(frames) == 1:
+                await self.redis.publish(channel, frames[0])
+                return
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for frame in frames:
+                    pipe.publish(channel, frame)
+                await pipe.execute()
+
+    async def publish_ephemeral(self, session_id: str, payload: bytes) -> None:
+        """Publish an ephemeral change (pointer, highlight, ...) to the other workers."""
+        async with self._publish_lock:
+            await self.redis.publish(channel_for(session_id), encode_frame(KIND_EPHEMERAL, self.worker_id, payload))
+
+    async def request_sync(self, session_id: str, state_vector: bytes) -> None:
+        """Ask workers already hosting *session_id* for anything we are missing."""
+        async with self._publish_lock:
+            await self.redis.publish(channel_for(session_id), encode_frame(KIND_SYNC_REQUEST, self.worker_id, state_vector))
+
+    # ------------------------------------------------------------------ #
+    # Receiving
+    # ------------------------------------------------------------------ #
+
+    async def _read_loop(self) -> None:
+        while self._handlers:
+            try:
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:  # pragma: no cover
+                log.error("[whiteboard_relay] Pub/sub read failed: %s", exc, exc_info=True)
+                await asyncio.sleep(1.0)
+                continue
+            if message is None or message.get("type") != "message":
+                continue
+            await self.handle_message(message["channel"], message["data"])
+
+    async def handle_message(self, channel, frame: bytes) -> None:
+        """Dispatch one pub/sub message to the session's handlers."""
+        if isinstance(channel, bytes):
+            channel = channel.decode()
+        session_id = channel[len(CHANNEL_PREFIX):]
+        handlers = self._handlers.get(session_id)
+        if handlers is None:
+            return
+        try:
+            kind, sender, payload = decode_frame(frame)
+        except ValueError:
+            log.warning("[whiteboard_relay] Dropping malformed frame on %s", channel)
+            return
+        if sender == self.worker_id:
+            return  # Our own publication echoed back
+
+        on_update, on_sync_request, on_ephemeral = handlers
+        try:
+            if kind == KIND_UPDATE:
+                await on_update(payload)
+            elif kind == KIND_SYNC_REQUEST:
+                diff = on_sync_request(payload)
+                if diff:
+                    await self.publish_updates(session_id, [diff])
+            elif kind == KIND_EPHEMERAL and on_ephemeral is not None:
+                await on_ephemeral(payload)
+        except Exception as exc:  # pragma: no cover
+            log.error("[whiteboard_relay] Handler failed for %s: %s", session_id, exc, exc_info=True)
+
+
+# Process-wide relay, bound to the shared Redis client on first use
+_RELAY: Optional[WhiteboardRelay] = None
+
+
+def get_relay(redis: Redis) -> WhiteboardRelay:
+    global _RELAY
+    if _RELAY is None:
+        _RELAY = WhiteboardRelay(redis)
+    return _RELAY
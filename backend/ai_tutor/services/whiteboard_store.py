@@ -0,0 +1,261 @@
+"""ai_tutor/services/whiteboard_store.py
+
+Redis persistence for the collaborative whiteboard's Yjs documents.
+
+A document is stored as two keys:
+
+* ``yjs:snapshot:{session}`` – a compacted *base* snapshot
+  (``encode_state_as_update`` of the whole document).
+* ``yjs:updates:{session}`` – an append-only list of binary Yjs updates
+  applied after the base was written.
+
+Writers only ``RPUSH`` the updates they applied, so each write costs
+O(update size) instead of O(document size).  Readers rebuild the document from
+base + tail.  Once the tail grows past a count or byte threshold,
+:func:`compact` folds it into a new base.  Yjs updates are idempotent, so
+replaying an update that is already part of the base is harmless – the only
+invariant compaction must keep is that no update leaves the tail before it is
+part of the base.  Compaction also deletes whatever legacy clients left in the
+``ephemeral`` map, so short-lived entries only ever reach the tail.
+
+Base snapshots are written in a small container (see :func:`encode_snapshot`)::
+
+    [4 bytes magic b"\xffYWB"][1 byte version][1 byte codec id]
+    [4 bytes raw length, big-endian][4 bytes CRC-32 of the raw update][body]
+
+Snapshots of at least ``SNAPSHOT_COMPRESS_MIN_BYTES`` are compressed with the
+configured codec (zlib built in; zstd when the ``zstandard`` package is
+installed; more via :func:`register_codec`).  Blobs without the magic are
+legacy raw updates and are read as-is.
+"""
+
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+import logging
+import os
+import struct
+import zlib
+
+from y_py import YDoc, apply_update, encode_state_as_update  # type: ignore
+from redis.asyncio import Redis  # type: ignore
+from redis.exceptions import WatchError  # type: ignore
+
+from ai_tutor.metrics import WHITEBOARD_SNAPSHOT_RATIO
+
+log = logging.getLogger(__name__)
+
+SNAPSHOT_KEY_PREFIX = "yjs:snapshot:"
+UPDATE_LOG_KEY_PREFIX = "yjs:updates:"
+
+# YMap legacy clients write short-lived entries into (see _strip_ephemeral)
+EPHEMERAL_MAP = "ephemeral"
+
+# Compact once the tail holds this many updates or bytes (whichever first).
+COMPACT_MAX_UPDATES = int(os.environ.get("WHITEBOARD_COMPACT_MAX_UPDATES", "500"))
+COMPACT_MAX_BYTES = int(os.environ.get("WHITEBOARD_COMPACT_MAX_BYTES", str(1024 * 1024)))
+
+
+# --------------------------------------------------------------------------- #
+#  Snapshot container
+# --------------------------------------------------------------------------- #
+
+SNAPSHOT_MAGIC = b"\xffYWB"
+SNAPSHOT_VERSION = 1
+_HEADER = struct.Struct(">4sBBII")
+
+CODEC_NONE = 0
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+
+# Smaller snapshots are stored uncompressed; the header costs 14 bytes.
+SNAPSHOT_COMPRESS_MIN_BYTES = int(os.environ.get("WHITEBOARD_SNAPSHOT_COMPRESS_MIN_BYTES", "1024"))
+SNAPSHOT_CODEC = os.environ.get("WHITEBOARD_SNAPSHOT_CODEC", "zlib")
+
+
+class SnapshotCodec(NamedTuple):
+    name: str
+    compress: Callable[[bytes], bytes]
+    decompress: Callable[[bytes], bytes]
+
+
+_CODECS: Dict[int, SnapshotCodec] = {
+    CODEC_NONE: SnapshotCodec("none", bytes, bytes),
+    CODEC_ZLIB: SnapshotCodec("zlib", lambda data: zlib.compress(data, 6), zlib.decompress),
+}
+
+
+def register_codec(codec_id: int, name: str, compress: Callable[[bytes], bytes], decompress: Callable[[bytes], bytes]) -> None:
+    """Make an extra compression codec available for reading and writing."""
+    if not 0 <= codec_id <= 255:
+        raise ValueError("codec id must fit in one byte")
+    _CODECS[codec_id] = SnapshotCodec(name, compress, decompress)
+
+
+try:
+    import zstandard as _zstd  # type: ignore
+
+    register_codec(
+        CODEC_ZSTD,
+        "zstd",
+        lambda data: _zstd.ZstdCompressor(level=3).compress(data),
+        lambda data: _zstd.ZstdDecompressor().decompress(data),
+    )
+except ImportError:  # pragma: no cover – optional faster codec
+    pass
+
+
+def _codec_by_name(name: str) -> int:
+    for codec_id, codec in _CODECS.items():
+        if codec.name == name:
+            return codec_id
+    log.warning("[whiteboard_store] Unknown snapshot codec %r – using zlib", name)
+    return CODEC_ZLIB
+
+
+def encode_snapshot(raw: bytes, codec: Optional[str] = None) -> bytes:
+    """Wrap the Yjs update *raw* in the versioned snapshot container."""
+    codec_id = CODEC_NONE
+    body = raw
+    if len(raw) >= SNAPSHOT_COMPRESS_MIN_BYTES:
+        candidate = _codec_by_name(codec or SNAPSHOT_CODEC)
+        compressed = _CODECS[candidate].compress(raw)
+        if len(compressed) < len(raw):  # Incompressible data is stored as-is
+            codec_id, body = candidate, compressed
+    blob = _HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, codec_id, len(raw), zlib.crc32(raw)) + body
+    if raw:
+        WHITEBOARD_SNAPSHOT_RATIO.observe(len(blob) / len(raw))
+    return blob
+
+
+def decode_snapshot(blob: bytes) -> bytes:
+    """Return the raw Yjs update stored in *blob* (container or legacy raw).
+
+    Raises ValueError for unknown versions/codecs, truncation or a checksum
+    mismatch.
+    """
+    if not blob.startswith(SNAPSHOT_MAGIC) or len(blob) < _HEADER.size:
+        return blob  # Legacy: raw encode_state_as_update bytes
+    _, version, codec_id, raw_len, crc = _HEADER.unpack_from(blob)
+    if version != SNAPSHOT_VERSION:
+        raise ValueError(f"unsupported snapshot version {version}")
+    codec = _CODECS.get(codec_id)
+    if codec is None:
+        raise ValueError(f"unsupported snapshot codec {codec_id}")
+    try:
+        raw = codec.decompress(blob[_HEADER.size:])
+    except Exception as exc:
+        raise ValueError(f"corrupt {codec.name} snapshot body: {exc}") from exc
+    if len(raw) != raw_len or zlib.crc32(raw) != crc:
+        raise ValueError("snapshot checksum mismatch")
+    return raw
+
+
+# --------------------------------------------------------------------------- #
+#  Keys / update log
+# --------------------------------------------------------------------------- #
+
+def snapshot_key(session_id: str) -> str:
+    return f"{SNAPSHOT_KEY_PREFIX}{session_id}"
+
+
+def update_log_key(session_id: str) -> str:
+    return f"{UPDATE_LOG_KEY_PREFIX}{session_id}"
+
+
+def needs_compaction(tail_length: int, tail_bytes: int) -> bool:
+    """Return True once the update log passed either compaction threshold."""
+    return tail_length >= COMPACT_MAX_UPDATES or tail_bytes >= COMPACT_MAX_BYTES
+
+
+async def append_updates(redis: Redis, session_id: str, updates: Sequence[bytes]) -> int:
+    """Append *updates* to the session's log and return the new log length."""
+    if not updates:
+        return 0
+    return await redis.rpush(update_log_key(session_id), *updates)
+
+
+async def load_parts(redis: Redis, session_id: str) -> Tuple[Optional[bytes], List[bytes]]:
+    """Return ``(base, tail)`` as one consistent read."""
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.get(snapshot_key(session_id))
+        pipe.lrange(update_log_key(session_id), 0, -1)
+        base, tail = await pipe.execute()
+    return base, list(tail or [])
+
+
+def apply_parts(ydoc: YDoc, base: Optional[bytes], tail: Sequence[bytes]) -> int:
+    """Apply *base* followed by *tail* to *ydoc*; returns the bytes applied."""
+    applied = 0
+    if base:
+        raw = decode_snapshot(base)
+        apply_update(ydoc, raw)
+        applied += len(raw)
+    for update in tail:
+        apply_update(ydoc, update)
+        applied += len(update)
+    return applied
+
+
+async def load_document(redis: Redis, session_id: str) -> Optional[YDoc]:
+    """Rebuild the session's YDoc from Redis, or ``None`` if nothing is stored."""
+    base, tail = await load_parts(redis, session_id)
+    if not base and not tail:
+        return None
+    ydoc = YDoc()
+    apply_parts(ydoc, base, tail)
+    return ydoc
+
+
+def _strip_ephemeral(ydoc: YDoc) -> None:
+    """Delete what legacy clients wrote into the ``ephemeral`` map.
+
+    Those entries live in the hosting worker's ephemeral store and expire
+    within minutes; keeping them in the base would only bloat it.  Deletes
+    add to the delete set without new items, and their content is garbage
+    collected, so the base keeps a small tombstone per key.
+    """
+    ephemeral = ydoc.get_map(EPHEMERAL_MAP)
+    keys = list(ephemeral.keys())
+    if keys:
+        with ydoc.begin_transaction() as txn:
+            for key in keys:
+                ephemeral.pop(txn, key)
+
+
+async def compact(redis: Redis, session_id: str) -> bool:
+    """Fold the update log into a new base snapshot.
+
+    The base key is WATCHed so two concurrent compactions cannot trim updates
+    the other has not folded in; appends only touch the log and never abort a
+    compaction.  Returns True if a new base was written.
+    """
+    skey = snapshot_key(session_id)
+    lkey = update_log_key(session_id)
+    async with redis.pipeline(transaction=True) as pipe:
+        try:
+            await pipe.watch(skey)
+            base = await pipe.get(skey)
+            tail = await pipe.lrange(lkey, 0, -1)
+            if not tail:
+                await pipe.unwatch()
+                return False
+
+            ydoc = YDoc()
+            apply_parts(ydoc, base, tail)
+            _strip_ephemeral(ydoc)
+            new_base = encode_snapshot(encode_state_as_update(ydoc))
+
+            pipe.multi()
+            pipe.set(skey, new_base)
+            pipe.ltrim(lkey, len(tail), -1)
+            await pipe.execute()
+        except WatchError:
+            log.info("[whiteboard_store] Compaction for %s raced with another compactor – skipped", session_id)
+            return False
+
+    log.debug(
+        "[whiteboard_store] Compacted %d update(s) for %s into %d-byte base",
+        len(tail),
+        session_id,
+        len(new_base),
+    )
+    return True
@@ -0,0 +1,183 @@
+"""ai_tutor/services/whiteboard_view.py
+
+Materialised, read-only view of a session's whiteboard.
+
+Every worker that hosts a session in ``routers/whiteboard_ws`` keeps a
+:class:`BoardView` next to its YDoc.  The view is fed from the YMap observers
+as deltas are applied (client updates, sanitiser patches, relayed frames,
+hydration), so it always holds the *decoded* object specs and readers never
+have to rebuild a YDoc or decode the whole ``objects`` map.  The same
+deltas keep the session's spatial index (:attr:`BoardView.spatial`) and
+metadata index (:attr:`BoardView.meta`) in sync, so lookups never rebuild
+them either.  Ephemeral entries live in
+`ai_tutor.services.whiteboard_ephemeral` instead; only snapshot views carry
+the persisted document's ``ephemeral`` map, for workers without that store.
+
+Readers (board summary, find/anchor lookups) call :func:`get_view`: it returns
+the live view when the session is hosted by this process and otherwise falls
+back to decoding the persisted document once (base snapshot + update log).
+
+The specs stored in the view are shared; callers must copy before mutating.
+"""
+
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+import logging
+
+from redis.asyncio import Redis  # type: ignore
+
+from ai_tutor.services import metadata_index, spatial_index, whiteboard_store
+
+log = logging.getLogger(__name__)
+
+OBJECTS = "objects"
+EPHEMERAL = "ephemeral"
+
+# How many change batches a live view remembers for incremental readers.
+_JOURNAL_LEN = 256
+
+
+class BoardView:
+    """Decoded ``objects`` entries of one session."""
+
+    def __init__(self, session_id: str, live: bool = True) -> None:
+        self.session_id = session_id
+        # False for one-off snapshot decodes that no delta will ever update
+        self.live = live
+        self.objects: Dict[str, Dict[str, Any]] = {}
+        # key -> position in ``objects`` (assigned on first insert), so index
+        # hits can be put back in board order without walking the board
+        self._seq: Dict[str, int] = {}
+        self._next_seq = 0
+        # Snapshot views only: entries legacy clients wrote into the YDoc's
+        # ``ephemeral`` map (live views read the hosted ephemeral store)
+        self.ephemeral: Dict[str, Dict[str, Any]] = {}
+        # Objects with an absolute box (see spatial_index.spec_rect), by key
+        self.spatial = spatial_index.RTreeIndex()
+        # Posting lists over the metadata fields find_object_on_board filters on
+        self.meta = metadata_index.MetadataIndex()
+        # Bumped on every change so callers can cache derived data
+        self.version = 0
+        # (version, keys changed by that version) – see changed_since()
+        self._journal: Deque[Tuple[int, Tuple[str, ...]]] = deque(maxlen=_JOURNAL_LEN)
+
+    def __len__(self) -> int:
+        return len(self.objects)
+
+    # ------------------------------------------------------------------ #
+    # Writes (called from the YMap observers)
+    # ------------------------------------------------------------------ #
+
+    def apply_event(self, map_name: str, keys: Dict[str, Dict[str, Any]]) -> None:
+        """Fold one YMap event's ``keys`` (key -> {action, newValue, ...}) into the view."""
+        if map_name != OBJECTS:
+            return
+        target = self.objects
+        for key, change in keys.items():
+            old = target.get(key)
+            new = change.get("newValue")
+            if change.get("action") == "delete" or not isinstance(new, dict):
+                new = None
+                target.pop(key, None)  # Non-spec values: readers skip them anyway
+                self._seq.pop(key, None)
+            else:
+                target[key] = new
+                self._number(key)
+            self._reindex(key, old, new)
+        self.version += 1
+        self._journal.append((self.version, tuple(keys)))
+
+    def _number(self, key: str) -> None:
+        if key not in self._seq:
+            self._seq[key] = self._next_seq
+            self._next_seq += 1
+
+    def _reindex(self, key: str, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> None:
+        self.meta.update(key, new)
+        old_rect = spatial_index.spec_rect(old) if old is not None else None
+        new_rect = spatial_index.spec_rect(new) if new is not None else None
+        if old_rect == new_rect:
+            return
+        if new_rect is None:
+            self.spatial.remove_object(key)
+        else:
+            self.spatial.add_object(key, *new_rect)
+
+    def changed_since(self, version: int) -> Optional[Set[str]]:
+        """Keys changed after *version*, or None if the journal no longer reaches back."""
+        if version == self.version:
+            return set()
+        if version > self.version or not self._journal or self._journal[0][0] > version + 1:
+            return None
+        changed: Set[str] = set()
+        for batch_version, keys in self._journal:
+            if batch_version > version:
+                changed.update(keys)
+        return changed
+
+    # ------------------------------------------------------------------ #
+    # Reads
+    # ------------------------------------------------------------------ #
+
+    def get(self, object_id: str) -> Optional[Dict[str, Any]]:
+        return self.objects.get(object_id)
+
+    def items(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        return iter(self.objects.items())
+
+    def in_board_order(self, keys: Iterable[str]) -> List[str]:
+        """Sort the present *keys* as :meth:`items` would yield them."""
+        seq = self._seq
+        return sorted((key for key in keys if key in seq), key=seq.__getitem__)
+
+    @classmethod
+    def from_ydoc(cls, session_id: str, ydoc) -> "BoardView":
+        """Decode a complete (non-hosted) document into a detached view."""
+        view = cls(session_id, live=False)
+        ymap = ydoc.get_map(OBJECTS)
+        for key in list(ymap.keys()):
+            value = ymap.get(key)
+            if isinstance(value, dict):
+                view.objects[key] = value
+                view._number(key)
+                view.meta.update(key, value)
+        ephemeral = ydoc.get_map(EPHEMERAL)
+        for key in list(ephemeral.keys()):
+            value = ephemeral.get(key)
+            if isinstance(value, dict):
+                view.ephemeral[key] = value
+        rects = ((key, spatial_index.spec_rect(spec)) for key, spec in view.objects.items())
+        view.spatial.bulk_load((key, *rect) for key, rect in rects if rect is not None)
+        return view
+
+
+# session_id -> live view of a session hosted by this process
+_views: Dict[str, BoardView] = {}
+
+
+def register(view: BoardView) -> None:
+    _views[view.session_id] = view
+
+
+def unregister(view: BoardView) -> None:
+    if _views.get(view.session_id) is view:
+        del _views[view.session_id]
+
+
+def hosted_view(session_id: str) -> Optional[BoardView]:
+    return _views.get(session_id)
+
+
+async def get_view(redis: Redis, session_id: str) -> Optional[BoardView]:
+    """Return the view of *session_id*, or None if it has no whiteboard yet.
+
+    Uses the live view when the session is hosted here; otherwise decodes the
+    persisted document (raises whatever the Redis load raises).
+    """
+    view = _views.get(session_id)
+    if view is not None:
+        return view
+    ydoc = await whiteboard_store.load_document(redis, session_id)
+    if ydoc is None:
+        return None
+    return BoardView.from_ydoc(session_id, ydoc)
@@ -11,6 +11,7 @@ from uuid import UUID # Import UUID
 import structlog # Add structlog
 
 from ai_tutor.context import TutorContext, UserModelState # Import UserModelState
+from ai_tutor.services import session_access
 from pydantic import ValidationError # Import ValidationError
 
 # Models might still be needed if SessionManager directly interacts with them.
@@ -117,6 +118,8 @@ class SessionManager:
 
             if response.data:
                 print(f"Created session {session_id} for user {user_id} in Supabase.")
+                # Overrides a denial cached by a poll that raced the insert
+                session_access.remember(user_id, session_id)
                 return session_id
             else:
                 print(f"Error creating session {session_id} in Supabase: {response.error}")
@@ -136,6 +139,8 @@ class SessionManager:
 
             if not response.data:
                 log.info("No session found or context_data is null", session_id=str(session_id), user_id=str(user_id))
+                # Deleted or no longer owned: don't keep letting the sockets in
+                session_access.invalidate(session_id, user_id)
                 return None # No session found for this user/id
 
             context_data = response.data.get("context_data")
@@ -213,6 +218,11 @@ class SessionManager:
             #    log.warning("Supabase update command executed but reported no data change.", session_id=str(session_id))
             #    # Consider this a soft failure?
             #    # return False
+            if not response.data:
+                # No row matched (id, user): the session was deleted or changed
+                # owner.  Dropping a verdict that was still right only costs
+                # one extra lookup.
+                session_access.invalidate(session_id, user_id)
 
             log.info("Session context updated successfully in DB", session_id=str(session_id))
             return True
@@ -1,14 +1,24 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+import logging
 
 from ai_tutor.skills import skill
+from ai_tutor.services import layout_allocator as _alloc
+
+log = logging.getLogger(__name__)
 
 
 @skill
-async def clear_whiteboard() -> List[Dict[str, Any]]:
+async def clear_whiteboard(ctx: Optional[Any] = None) -> List[Dict[str, Any]]:
     """Returns a whiteboard action list containing only a 'CLEAR_CANVAS' action.
 
     This signals the frontend to clear all existing elements drawn by the assistant.
     """
+    if ctx is not None:
+        try:
+            await _alloc.reset_board(str(ctx.session_id))
+        except _alloc.AllocatorConflictError as exc:
+            # The cleared objects still release their regions as they are deleted
+            log.warning(f"clear_whiteboard: {exc}; allocator not reset")
     return [
         {
             "id": "global-clear-0", # Changed ID to reflect new type
@@ -15,13 +15,17 @@ async def draw_axis_actions(ctx: Any, **kwargs) -> List[Dict[str, Any]]:
 
     # Reserve space – include some padding
     PADDING = 40
-    placement = await _alloc.reserve_region(
-        session_id=str(ctx.session_id),
-        requested_width=width + PADDING,
-        requested_height=height + PADDING,
-        strategy="flow",
-        group_id=axis_id,
-    )
+    try:
+        placement = await _alloc.reserve_region(
+            session_id=str(ctx.session_id),
+            requested_width=width + PADDING,
+            requested_height=height + PADDING,
+            strategy="flow",
+            group_id=axis_id,
+        )
+    except _alloc.AllocatorConflictError as exc:
+        # Other workers kept changing the board; report it like a full one
+        raise RuntimeError("draw_axis_actions: allocator busy, no space reserved") from exc
     if placement is None:
         raise RuntimeError("draw_axis_actions: allocator returned no space")
 
@@ -21,13 +21,17 @@ async def draw_diagram_actions(ctx: Any, **kwargs) -> List[Dict[str, Any]]:
     DIAG_WIDTH = 260
     DIAG_HEIGHT = 260
 
-    placement = await _alloc.reserve_region(
-        session_id=str(ctx.session_id),
-        requested_width=DIAG_WIDTH,
-        requested_height=DIAG_HEIGHT,
-        strategy="flow",
-        group_id=f"diagram-{topic}",
-    )
+    try:
+        placement = await _alloc.reserve_region(
+            session_id=str(ctx.session_id),
+            requested_width=DIAG_WIDTH,
+            requested_height=DIAG_HEIGHT,
+            strategy="flow",
+            group_id=f"diagram-{topic}",
+        )
+    except _alloc.AllocatorConflictError as exc:
+        # Other workers kept changing the board; report it like a full one
+        raise RuntimeError("draw_diagram_actions: allocator busy, no space reserved") from exc
     if placement is None:
         raise RuntimeError("draw_diagram_actions: allocator returned no space")
 
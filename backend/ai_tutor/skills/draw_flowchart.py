@@ -25,13 +25,17 @@ async def draw_flowchart_actions(ctx: Any, **kwargs) -> List[Dict[str, Any]]:
     total_width = len(steps) * box_width + (len(steps) - 1) * h_gap
     total_height = box_height + 40  # arrow space
 
-    placement = await _alloc.reserve_region(
-        session_id=str(ctx.session_id),
-        requested_width=total_width,
-        requested_height=total_height,
-        strategy="flow",
-        group_id=chart_id,
-    )
+    try:
+        placement = await _alloc.reserve_region(
+            session_id=str(ctx.session_id),
+            requested_width=total_width,
+            requested_height=total_height,
+            strategy="flow",
+            group_id=chart_id,
+        )
+    except _alloc.AllocatorConflictError as exc:
+        # Other workers kept changing the board; report it like a full one
+        raise RuntimeError("draw_flowchart_actions: allocator busy, no space reserved") from exc
     if placement is None:
         raise RuntimeError("draw_flowchart_actions: allocator returned no space")
 
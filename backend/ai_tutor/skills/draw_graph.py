@@ -59,7 +59,7 @@ async def draw_graph(
             # Assuming clear_board() returns the action list directly, not a tuple
             # If clear_board itself returns (MessageResponse, List[Actions]), we only need the actions.
             # Based on drawing_tools.py, clear_board returns List[Dict[str,Any]]
-            clear_board_result = await original_clear_board_func()
+            clear_board_result = await original_clear_board_func(ctx)
             if isinstance(clear_board_result, tuple) and len(clear_board_result) == 2 and isinstance(clear_board_result[1], list):
                 clear_action_list = clear_board_result[1]
             elif isinstance(clear_board_result, list): # If it somehow returns just the list
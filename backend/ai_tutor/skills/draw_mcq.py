@@ -115,13 +115,17 @@ async def draw_mcq_actions(ctx: Any, **kwargs) -> List[Dict[str, Any]]:
 
     block_height = 100 + len(question.options) * OPTION_SPACING + V_PADDING
 
-    placement = await _alloc.reserve_region(
-        session_id=str(ctx.session_id),
-        requested_width=QUESTION_WIDTH,
-        requested_height=block_height,
-        strategy="flow",
-        group_id=question_id,
-    )
+    try:
+        placement = await _alloc.reserve_region(
+            session_id=str(ctx.session_id),
+            requested_width=QUESTION_WIDTH,
+            requested_height=block_height,
+            strategy="flow",
+            group_id=question_id,
+        )
+    except _alloc.AllocatorConflictError as exc:
+        # Other workers kept changing the board; report it like a full one
+        raise RuntimeError("draw_mcq_actions: allocator busy, no space reserved") from exc
     if placement is None:
         raise RuntimeError("draw_mcq_actions: allocator returned no space")
 
@@ -24,13 +24,17 @@ async def draw_table_actions(ctx: Any, **kwargs) -> List[Dict[str, Any]]:
     total_width = n_cols * cell_width + (n_cols - 1) * col_gap
     total_height = n_rows * cell_height + (n_rows - 1) * row_gap
 
-    placement = await _alloc.reserve_region(
-        session_id=str(ctx.session_id),
-        requested_width=total_width,
-        requested_height=total_height,
-        strategy="flow",
-        group_id=table_id,
-    )
+    try:
+        placement = await _alloc.reserve_region(
+            session_id=str(ctx.session_id),
+            requested_width=total_width,
+            requested_height=total_height,
+            strategy="flow",
+            group_id=table_id,
+        )
+    except _alloc.AllocatorConflictError as exc:
+        # Other workers kept changing the board; report it like a full one
+        raise RuntimeError("draw_table_actions: allocator busy, no space reserved") from exc
     if placement is None:
         raise RuntimeError("draw_table_actions: allocator returned no space")
 
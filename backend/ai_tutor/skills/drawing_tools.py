@@ -25,6 +25,7 @@ from ai_tutor.skills import skill  # Re-exported decorator
 from ai_tutor.exceptions import ToolInputError
 from pydantic import BaseModel, Field, ValidationError
 from ai_tutor.api_models import MessageResponse, WhiteboardObjectCustomMetadata
+from ai_tutor.services import layout_allocator as _alloc
 
 # --- Import for the new 'draw' skill ---
 # from .draw_diagram import draw_diagram_actions
@@ -585,8 +586,15 @@ from ai_tutor.skills.clear_whiteboard import clear_whiteboard as _clear_whiteboa
 
 
 @skill(name_override="clear_board")
-async def clear_board() -> Tuple[MessageResponse, List[Dict[str, Any]]]:  # noqa: D401 – simple verb
+async def clear_board(ctx: Optional[Any] = None) -> Tuple[MessageResponse, List[Dict[str, Any]]]:  # noqa: D401 – simple verb
     """Return a CLEAR_BOARD whiteboard action to erase all content."""
+    if ctx is not None:
+        # Everything reserved on the board goes with its objects
+        try:
+            await _alloc.reset_board(str(ctx.session_id))
+        except _alloc.AllocatorConflictError as exc:
+            # The cleared objects still release their regions as they are deleted
+            logger.warning(f"clear_board: {exc}; allocator not reset")
     action = {"type": "CLEAR_BOARD"}  # Type matches frontend enum
     payload = MessageResponse(message_text="Whiteboard cleared.", message_type="status_update")
     return payload, [action] 
\ No newline at end of file
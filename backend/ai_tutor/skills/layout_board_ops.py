@@ -6,7 +6,7 @@ Core Phase-2 whiteboard manipulation skills that leverage the layout allocator
 implemented in :pymod:`ai_tutor.services.layout_allocator`.
 """
 
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Set
 import logging
 from enum import Enum
 
@@ -17,10 +17,9 @@ from ai_tutor.exceptions import ToolInputError
 from ai_tutor.api_models import MessageResponse
 from ai_tutor.services import layout_allocator as _alloc
 from ai_tutor.services import layout_templates as _template_resolver
-from services.whiteboard_metadata import Metadata  # Changed import
 from ai_tutor.dependencies import get_redis_client
-from ai_tutor.services import spatial_index as _spatial_idx
-from y_py import YDoc, apply_update  # type: ignore
+from ai_tutor.services import metadata_index as _metadata_index
+from ai_tutor.services import whiteboard_view
 from redis.asyncio import Redis  # type: ignore
 
 log = logging.getLogger(__name__)
@@ -30,8 +29,8 @@ log = logging.getLogger(__name__)
 # For now, using a string forward reference.
 CanvasObjectSpec = "CanvasObjectSpec"
 
-# Re-export for easy access
-__all__ = ["Metadata", "add_objects_to_board", "update_object_on_board", "delete_object_on_board", "find_object_on_board", "highlight_object_on_board"]
+# Skills exported by this module
+__all__ = ["add_objects_to_board", "update_object_on_board", "delete_object_on_board", "find_object_on_board", "highlight_object_on_board"]
 
 # --------------------------------------------------------------------------- #
 #  Anchor Enum Definitions
@@ -84,7 +83,7 @@ class AddObjectsArgs(BaseModel):
     # "explicit": objects define their own xPct/yPct or abs x/y. This is the new default.
     # "anchor": objects are placed relative to 'anchor_object_id'.
     # "zone": objects are placed within 'zone' of 'template'. 'template' & 'zone' must be top-level args.
-    # "flow": use layout_allocator to find space (old default, now used if no other info).
+    # "flow": use layout_allocator to find space for objects without coordinates (one batch, all or nothing).
     strategy: str = Field(default="explicit", pattern="^(flow|anchor|explicit|zone)$")
     
     # Anchor strategy args (used if strategy is "anchor")
@@ -133,11 +132,20 @@ _DEFAULT_HEIGHT = 120
 def _matches_meta(spec: Dict[str, Any], query: Dict[str, Any]) -> bool:
     """Return True iff *spec*'s metadata satisfies *query* (shallow match).
 
-    Supports dotted keys like ``meta.role`` to traverse one level deep.
+    Supports dotted keys like ``meta.role`` to traverse one level deep.  Tag
+    fields (``semantic_tags``) match by containment, as in the per-session
+    metadata index: the object must carry every queried tag, so
+    ``["physics"]`` matches ``["physics", "optics"]``.  (They used to be
+    compared for list equality, which a tag query practically never met.)
     """
     meta = spec.get("metadata") or {}
     for k, v in query.items():
-        if "." in k:
+        field = _metadata_index.metadata_field(k)
+        if field in _metadata_index.TAG_FIELDS and v is not None:
+            held = _metadata_index.tag_values(meta.get(field))
+            if not all(tag in held for tag in _metadata_index.tag_values(v)):
+                return False
+        elif "." in k:
             first, second = k.split(".", 1)
             target = spec.get(first) if first != "meta" else meta
             if isinstance(target, dict):
@@ -158,68 +166,106 @@ def _augment_metadata_source_group(spec: Dict[str, Any], group_id: Optional[str]
         meta["groupId"] = group_id
     spec["metadata"] = meta
 
+def _has_position(spec: Dict[str, Any]) -> bool:
+    """True if *spec* carries any coordinate (absolute or percentage)."""
+    return any(spec.get(key) is not None for key in ("x", "y", "xPct", "yPct"))
+
+
+async def _reserve_flow_positions(session_id: str, specs: List[Dict[str, Any]]) -> None:
+    """Place every spec without any coordinate with one batch reservation.
+
+    Objects sharing ``metadata.groupId`` are kept together.  Each placed spec
+    records its ``metadata.regionId`` so the region is released when the
+    object is deleted.  If the board cannot hold all of them, nothing is
+    reserved and the specs pass through unplaced for the client's own flow
+    layout.
+    """
+    pending = [spec for spec in specs if not _has_position(spec)]
+    if not pending:
+        return
+    requests = [
+        {
+            "width": spec.get("width") or _DEFAULT_WIDTH,
+            "height": spec.get("height") or _DEFAULT_HEIGHT,
+            "group_id": (spec.get("metadata") or {}).get("groupId"),
+        }
+        for spec in pending
+    ]
+    try:
+        placements = await _alloc.reserve_regions(session_id, requests)
+    except _alloc.AllocatorConflictError as exc:
+        log.warning(f"add_objects_to_board: {exc}; passing {len(pending)} object(s) through unplaced")
+        return
+    if placements is None:
+        log.warning(
+            f"add_objects_to_board: allocator has no room for {len(pending)} object(s) in session {session_id}; "
+            "passing them through unplaced"
+        )
+        return
+    for spec, request, placement in zip(pending, requests, placements):
+        spec["x"] = placement["x"]
+        spec["y"] = placement["y"]
+        spec["width"] = request["width"]
+        spec["height"] = request["height"]
+        spec["metadata"] = {**(spec.get("metadata") or {}), "regionId": placement["regionId"]}
+
 # --------------------------------------------------------------------------- #
 #  Skill implementations
 # --------------------------------------------------------------------------- #
 
-_REDIS_KEY_PREFIX = "yjs:snapshot:"
-
-
 async def _get_object_bbox_from_yjs(session_id: str, object_id: str) -> Optional[Dict[str, float]]:
-    """Helper to fetch an object's metadata.bbox from Yjs snapshot."""
+    """Helper to fetch an object's metadata.bbox from the session's board view."""
     redis_client: Redis = await get_redis_client()
-    redis_key = f"{_REDIS_KEY_PREFIX}{session_id}"
-    yjs_snapshot_bytes: Optional[bytes] = await redis_client.get(redis_key)
+    try:
+        view = await whiteboard_view.get_view(redis_client, session_id)
+    except Exception as exc:
+        log.error(f"_get_object_bbox_from_yjs: Failed to load Yjs for session {session_id} – {exc}", exc_info=True)
+        return None
 
-    if not yjs_snapshot_bytes:
+    if view is None:
         log.warning(f"_get_object_bbox_from_yjs: No Yjs snapshot for session {session_id}")
         return None
 
-    ydoc = YDoc()
     try:
-        apply_update(ydoc, yjs_snapshot_bytes)
-        with ydoc.begin_transaction() as txn:
-            canvas_map = ydoc.get_map("objects")
-            raw_objects = canvas_map.to_json(txn) # type: ignore
-            
-            anchor_object_data = raw_objects.get(object_id)
-            if not anchor_object_data or not isinstance(anchor_object_data, dict):
-                log.warning(f"_get_object_bbox_from_yjs: Anchor object {object_id} not found in Yjs map for session {session_id}.")
-                return None
-            
-            metadata = anchor_object_data.get("metadata")
-            if not metadata or not isinstance(metadata, dict):
-                log.warning(f"_get_object_bbox_from_yjs: Anchor object {object_id} has no metadata.")
-                return None
-            
-            # Prefer pctCoords if available, then bbox, then absolute x,y,width,height
-            # This function's primary goal is to provide an *absolute* bbox for the allocator if needed
-            # The new anchor strategy for relative placement will happen on frontend.
-            # This YJS fetch is mostly for the 'flow' allocator if it were to use its own anchor.
-
-            if "pctCoords" in metadata and isinstance(metadata["pctCoords"], dict):
-                 # Cannot resolve pctCoords to absolute bbox without canvas dimensions here.
-                 # This path is problematic if the goal is an absolute bbox.
-                 # For now, if only pctCoords, we cannot give an absolute bbox to the old allocator.
-                 log.debug(f"Anchor object {object_id} has pctCoords. Absolute bbox cannot be determined server-side without canvas dims.")
-                 # If we need to support allocator's anchor mode with Pct objects, this needs canvas dims.
-
-            bbox_tuple = metadata.get("bbox") # Assume this is absolute, stored by frontend/allocator
-            if bbox_tuple and isinstance(bbox_tuple, (list, tuple)) and len(bbox_tuple) == 4 and all(isinstance(n, (int, float)) for n in bbox_tuple):
-                log.debug(f"Found absolute bbox for anchor {object_id} in metadata.bbox: {bbox_tuple}")
-                return {"x": float(bbox_tuple[0]), "y": float(bbox_tuple[1]), "width": float(bbox_tuple[2]), "height": float(bbox_tuple[3])}
-
-            # Fallback to direct absolute properties if bbox not present
-            abs_x = metadata.get("x")
-            abs_y = metadata.get("y")
-            abs_w = metadata.get("width")
-            abs_h = metadata.get("height")
-            if all(isinstance(v, (int, float)) for v in [abs_x, abs_y, abs_w, abs_h]):
-                log.debug(f"Found absolute x,y,width,height for anchor {object_id}: x={abs_x}, y={abs_y}, w={abs_w}, h={abs_h}")
-                return {"x": float(abs_x), "y": float(abs_y), "width": float(abs_w), "height": float(abs_h)} # type: ignore
-
-            log.warning(f"_get_object_bbox_from_yjs: Anchor object {object_id} metadata.bbox or abs coords missing/invalid.")
+        # O(1) lookup in the materialised view
+        anchor_object_data = view.get(object_id)
+        if not anchor_object_data or not isinstance(anchor_object_data, dict):
+            log.warning(f"_get_object_bbox_from_yjs: Anchor object {object_id} not found in Yjs map for session {session_id}.")
+            return None
+        
+        metadata = anchor_object_data.get("metadata")
+        if not metadata or not isinstance(metadata, dict):
+            log.warning(f"_get_object_bbox_from_yjs: Anchor object {object_id} has no metadata.")
             return None
+        
+        # Prefer pctCoords if available, then bbox, then absolute x,y,width,height
+        # This function's primary goal is to provide an *absolute* bbox for the allocator if needed
+        # The new anchor strategy for relative placement will happen on frontend.
+        # This YJS fetch is mostly for the 'flow' allocator if it were to use its own anchor.
+
+        if "pctCoords" in metadata and isinstance(metadata["pctCoords"], dict):
+             # Cannot resolve pctCoords to absolute bbox without canvas dimensions here.
+             # This path is problematic if the goal is an absolute bbox.
+             # For now, if only pctCoords, we cannot give an absolute bbox to the old allocator.
+             log.debug(f"Anchor object {object_id} has pctCoords. Absolute bbox cannot be determined server-side without canvas dims.")
+             # If we need to support allocator's anchor mode with Pct objects, this needs canvas dims.
+
+        bbox_tuple = metadata.get("bbox") # Assume this is absolute, stored by frontend/allocator
+        if bbox_tuple and isinstance(bbox_tuple, (list, tuple)) and len(bbox_tuple) == 4 and all(isinstance(n, (int, float)) for n in bbox_tuple):
+            log.debug(f"Found absolute bbox for anchor {object_id} in metadata.bbox: {bbox_tuple}")
+            return {"x": float(bbox_tuple[0]), "y": float(bbox_tuple[1]), "width": float(bbox_tuple[2]), "height": float(bbox_tuple[3])}
+
+        # Fallback to direct absolute properties if bbox not present
+        abs_x = metadata.get("x")
+        abs_y = metadata.get("y")
+        abs_w = metadata.get("width")
+        abs_h = metadata.get("height")
+        if all(isinstance(v, (int, float)) for v in [abs_x, abs_y, abs_w, abs_h]):
+            log.debug(f"Found absolute x,y,width,height for anchor {object_id}: x={abs_x}, y={abs_y}, w={abs_w}, h={abs_h}")
+            return {"x": float(abs_x), "y": float(abs_y), "width": float(abs_w), "height": float(abs_h)} # type: ignore
+
+        log.warning(f"_get_object_bbox_from_yjs: Anchor object {object_id} metadata.bbox or abs coords missing/invalid.")
+        return None
 
     except Exception as exc:
         log.error(f"_get_object_bbox_from_yjs: Failed to process Yjs for object {object_id} in session {session_id} – {exc}", exc_info=True)
@@ -288,11 +334,14 @@ async def add_objects_to_board(ctx: Any, **kwargs):  # noqa: D401 – simple ver
             else:
                 log.warning(f"Could not resolve zone '{current_zone}' in template '{current_template}'. Object {out_spec.get('id')} may not be placed as intended.")
 
-        # TODO: Handle 'flow' strategy by calling layout_allocator if necessary
-        # For now, 'flow', 'explicit', or unhandled 'zone' will pass through whatever coords are in out_spec
+        # 'explicit' or unhandled 'zone' pass through whatever coords are in out_spec;
+        # 'flow' positions are reserved below, for all objects at once
 
         processed_object_specs.append(out_spec)
 
+    if args.strategy == "flow":
+        await _reserve_flow_positions(str(ctx.session_id), processed_object_specs)
+
     if not processed_object_specs:
         return MessageResponse(message_text="No objects were processed or specified.", message_type="status_update"), []
 
@@ -450,7 +499,12 @@ async def highlight_object_on_board(ctx: Any, **kwargs):  # noqa: D401 – simpl
 async def find_object_on_board(ctx: Any, **kwargs):  # noqa: D401 – simple verb
     """Find objects on the whiteboard by metadata and/or spatial query.
 
-    Returns a list of CanvasObjectSpec matching the criteria within the MessageResponse.
+    ``meta_query`` values are compared for equality, except ``semantic_tags``:
+    a single tag matches objects carrying it, a list matches objects carrying
+    all of the listed tags (among possibly others).
+
+    Returns a list of CanvasObjectSpec matching the criteria within the
+    MessageResponse, in board order.
     """
     try:
         args = FindObjectArgs(**kwargs)
@@ -461,93 +515,53 @@ async def find_object_on_board(ctx: Any, **kwargs):  # noqa: D401 – simple ver
         raise ToolInputError("At least one of meta_query or spatial_query must be provided for find_object_on_board.")
 
     redis_client: Redis = await get_redis_client()
-    redis_key = f"{_REDIS_KEY_PREFIX}{ctx.session_id}"
-    yjs_snapshot_bytes: Optional[bytes] = await redis_client.get(redis_key)
-
-    if not yjs_snapshot_bytes:
-        log.info(f"No Yjs snapshot found for session {ctx.session_id} to find objects.")
-        return MessageResponse(message_text="Whiteboard is empty or snapshot not found.", data=[]), []
-
-    ydoc = YDoc()
-    objects_data: List[Dict[str, Any]] = []
     try:
-        apply_update(ydoc, yjs_snapshot_bytes) 
-        with ydoc.begin_transaction() as txn:
-            canvas_map = ydoc.get_map("objects") 
-            raw_objects = canvas_map.to_json(txn) # type: ignore
-            
-            for obj_id, obj_content in raw_objects.items():
-                if isinstance(obj_content, dict):
-                    obj_data_with_id = dict(obj_content)
-                    obj_data_with_id['id'] = obj_id 
-                    objects_data.append(obj_data_with_id)
-                else:
-                    log.warning(f"Skipping non-dict object content for ID {obj_id} from Yjs map.")
-
+        view = await whiteboard_view.get_view(redis_client, str(ctx.session_id))
     except Exception as exc:
         log.error(f"find_object_on_board: Failed to decode Yjs snapshot or read map – {exc}", exc_info=True)
         return MessageResponse(message_text="Error processing whiteboard state.", data=[]), []
-
-    if not objects_data:
+    if view is None:
+        log.info(f"No Yjs snapshot found for session {ctx.session_id} to find objects.")
+        return MessageResponse(message_text="Whiteboard is empty or snapshot not found.", data=[]), []
+    if not len(view):
         log.info(f"No objects found in Yjs snapshot for session {ctx.session_id}.")
         return MessageResponse(message_text="Whiteboard is empty.", data=[]), []
-        
-    rtree = _spatial_idx.RTreeIndex()
-    valid_spatial_objects = 0
-    for obj in objects_data:
-        try:
-            # Try to get absolute coords; this is tricky if only Pct are stored and no canvas dims here
-            obj_x, obj_y, obj_w, obj_h = None, None, None, None
-            if "bbox" in obj.get("metadata", {}) and len(obj["metadata"]["bbox"]) == 4:
-                bbox = obj["metadata"]["bbox"]
-                obj_x, obj_y, obj_w, obj_h = bbox[0], bbox[1], bbox[2], bbox[3]
-            elif all(k in obj for k in ["x", "y", "width", "height"]):
-                obj_x, obj_y, obj_w, obj_h = obj["x"], obj["y"], obj["width"], obj["height"]
-            
-            if all(isinstance(v, (int, float)) for v in [obj_x, obj_y, obj_w, obj_h]):
-                rtree.add_object(obj['id'], float(obj_x), float(obj_y), float(obj_w), float(obj_h)) # type: ignore
-                valid_spatial_objects +=1
-            # else: log.debug(f"Object {obj.get('id')} lacks absolute bbox for spatial indexing by find_object_on_board.")
-        except (TypeError, ValueError, KeyError) as e:
-            log.debug(f"Skipping object {obj.get('id')} for spatial index due to missing/invalid coords: {e}")
-            continue
-    log.debug(f"Built R-tree with {valid_spatial_objects} objects for find_object_on_board.")
-
-
-    spatial_id_set = None
-    if args.spatial_query:
-        if valid_spatial_objects > 0:
-            qx, qy, qw, qh = args.spatial_query
-            spatial_ids = rtree.query_intersecting_objects(qx, qy, qw, qh)
-            spatial_id_set = set(spatial_ids)
-            log.debug(f"Spatial query found IDs: {spatial_id_set}")
-        else: # No objects in R-tree, so spatial query yields nothing
-            spatial_id_set = set()
-
 
+    # The view keeps the session's metadata and spatial indexes in sync with
+    # the board: indexed meta terms and the spatial query each narrow the
+    # candidates, and only the remaining meta terms are checked per object.
+    candidate_ids: Optional[Set[str]] = None
+    residual_meta: Dict[str, Any] = {}
+    if args.meta_query:
+        candidate_ids, residual_meta = view.meta.candidates(args.meta_query)
+    if args.spatial_query and candidate_ids != set():
+        qx, qy, qw, qh = args.spatial_query
+        spatial_ids = view.spatial.query_intersecting_objects(qx, qy, qw, qh)
+        log.debug(f"Spatial query found IDs: {spatial_ids}")
+        candidate_ids = set(spatial_ids) if candidate_ids is None else candidate_ids.intersection(spatial_ids)
+
+    # Only the indexed candidates get the per-object checks, put back in board
+    # order rather than set order; a full walk is needed only when no term
+    # was indexed.
+    if candidate_ids is None:
+        hits = view.items()
+    else:
+        hits = ((obj_id, view.objects[obj_id]) for obj_id in view.in_board_order(candidate_ids))
     matches: List[Dict[str, Any]] = []
-    for spec_dict in objects_data:
-        passes_meta_filter = True
-        if args.meta_query:
-            if not _matches_meta(spec_dict, args.meta_query):
-                passes_meta_filter = False
-        
-        if not passes_meta_filter:
-            continue
-
-        # If spatial_query was performed, check if current object is in the results
-        if spatial_id_set is not None and spec_dict.get('id') not in spatial_id_set:
+    for obj_id, obj_content in hits:
+        if residual_meta and not _matches_meta(obj_content, residual_meta):
             continue
 
-        # If all filters passed
+        # The view holds shared specs; copy so the id stamp stays local.
+        spec_dict = dict(obj_content)
+        spec_dict['id'] = obj_id
         if args.fields:
             projected_spec = {field: spec_dict.get(field) for field in args.fields if field in spec_dict}
-            if 'id' in spec_dict and 'id' not in projected_spec: # Always include ID if original had it
-                 projected_spec['id'] = spec_dict['id']
+            projected_spec['id'] = obj_id  # Always include the ID
             matches.append(projected_spec)
         else:
             matches.append(spec_dict)
-            
+
     log.info(f"find_object_on_board completed. Found {len(matches)} objects for session {ctx.session_id} matching query.")
     payload = MessageResponse(
         message_text=f"Found {len(matches)} objects matching criteria.",
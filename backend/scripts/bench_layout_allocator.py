@@ -0,0 +1,227 @@
+"""
+Benchmark layout-allocator reservations.
+
+1. Large grid: fills a board with a fixed, seeded mix of object sizes until it
+   reports full and prints per-reservation latency.  "cell scan" is the
+   previous implementation (a list-of-lists grid scanned cell by cell with a
+   nested block check), kept here only for comparison; "bitmap" is the
+   current ``_GridAllocator`` flow strategy.
+2. Lesson: replays a scripted lesson (pixel sizes of typical tutor objects)
+   on the default board and reports how many objects each strategy places
+   before the first reservation fails.
+3. Sparse: fills the same mix on a sparse (infinite) board, releases all but
+   a few regions scattered down it and reports tile counts – memory should
+   follow the occupied area, not the board's extent.
+4. Release: fills a large board with packed and flow objects, then alternates
+   releasing a random region with a packed reservation.  "rebuild" drops the
+   free rectangles on every release (the previous behaviour), "patched"
+   returns the released space to them in place.
+5. Store round trip: the same board, but every release / packed reservation
+   goes through ``loads`` → op → ``dumps`` as under ``RedisAllocatorStore``
+   (without the network).  "rebuild" drops the stored free rectangles from
+   the blob, so each op rebuilds them from all regions; "stored" keeps them.
+
+    PYTHONPATH=. python scripts/bench_layout_allocator.py [--cols 64] [--rows 256]
+"""
+
+import argparse
+import asyncio
+import math
+import random
+import statistics
+import time
+from typing import List, Optional, Tuple
+
+from ai_tutor.services import layout_allocator
+from ai_tutor.services.layout_allocator import _GridAllocator, _SparseGridAllocator
+
+CELL = 100
+SIZES = [(1, 1)] * 6 + [(2, 1)] * 3 + [(3, 2)] * 2 + [(4, 3), (8, 2), (2, 6)]
+# Title, prose, equation, MCQ, label, diagram, table, check mark (px)
+LESSON_SIZES = [(600, 60), (400, 80), (300, 70), (420, 260), (150, 40), (500, 320), (440, 200), (40, 40)]
+LESSON_WEIGHTS = [1, 6, 4, 2, 6, 1, 1, 3]
+
+
+class _CellScanAllocator:
+    """The pre-bitmap flow strategy: per-cell grid, nested block check."""
+
+    def __init__(self, cols: int, rows: int) -> None:
+        self.cols, self.rows = cols, rows
+        self._grid: List[List[Optional[str]]] = [[None] * cols for _ in range(rows)]
+
+    def _block_free(self, c0: int, r0: int, w: int, h: int) -> bool:
+        for r in range(r0, r0 + h):
+            for c in range(c0, c0 + w):
+                if self._grid[r][c] is not None:
+                    return False
+        return True
+
+    async def reserve(self, width: int, height: int) -> Optional[Tuple[int, int]]:
+        w, h = max(1, math.ceil(width / CELL)), max(1, math.ceil(height / CELL))
+        for r in range(self.rows - h + 1):
+            for c in range(self.cols - w + 1):
+                if self._block_free(c, r, w, h):
+                    for rr in range(r, r + h):
+                        for cc in range(c, c + w):
+                            self._grid[rr][cc] = "x"
+                    return (c, r)
+        return None
+
+
+async def _fill(alloc, seed: int = 1) -> List[float]:
+    rng = random.Random(seed)
+    latencies: List[float] = []
+    misses = 0
+    while misses < 20:  # Stop after a run of failed reservations
+        w, h = rng.choice(SIZES)
+        start = time.perf_counter()
+        placed = await alloc.reserve(w * CELL, h * CELL)
+        latencies.append(time.perf_counter() - start)
+        misses = 0 if placed is not None else misses + 1
+    return latencies
+
+
+def _report(name: str, latencies: List[float]) -> None:
+    ms = sorted(lat * 1000 for lat in latencies)
+    p99 = ms[min(len(ms) - 1, int(len(ms) * 0.99))]
+    print(f"{name:>10} {len(ms):>8} {statistics.median(ms):>8.3f} {p99:>8.3f} {ms[-1]:>8.3f} {sum(ms):>9.1f}")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cols", type=int, default=64)
+    parser.add_argument("--rows", type=int, default=256)
+    args = parser.parse_args()
+
+    print(f"grid {args.cols}x{args.rows}")
+    print(f"{'allocator':>10} {'reserves':>8} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'total ms':>9}")
+    _report("cell scan", await _fill(_CellScanAllocator(args.cols, args.rows)))
+    _report("bitmap", await _fill(_GridAllocator(cols=args.cols, rows=args.rows, cell_w=CELL, cell_h=CELL)))
+
+    print()
+    print(f"lesson on the default {layout_allocator._GRID_COLS}x{layout_allocator._GRID_ROWS} board "
+          f"({layout_allocator._GRID_COLS * layout_allocator._CELL_WIDTH}x"
+          f"{layout_allocator._GRID_ROWS * layout_allocator._CELL_HEIGHT} px), 20 seeds")
+    print(f"{'strategy':>22} {'placed':>7} {'p50 ms':>8} {'max ms':>8}")
+    for label, kwargs in (
+        ("flow", {}),
+        ("pack best-short-side", {"heuristic": "best-short-side"}),
+        ("pack best-area", {"heuristic": "best-area"}),
+    ):
+        placed, latencies = [], []
+        for seed in range(20):
+            alloc = _GridAllocator()
+            rng = random.Random(seed)
+            count = 0
+            while True:
+                w, h = rng.choices(LESSON_SIZES, LESSON_WEIGHTS)[0]
+                start = time.perf_counter()
+                if kwargs:
+                    result = await alloc.reserve_packed(w, h, **kwargs)
+                else:
+                    result = await alloc.reserve(w, h)
+                latencies.append(time.perf_counter() - start)
+                if result is None:
+                    break
+                count += 1
+            placed.append(count)
+        ms = sorted(lat * 1000 for lat in latencies)
+        print(f"{label:>22} {statistics.mean(placed):>7.1f} {statistics.median(ms):>8.3f} {ms[-1]:>8.3f}")
+
+    print()
+    print(f"sparse board, {args.cols} columns")
+    sparse = _SparseGridAllocator(cols=args.cols, cell_w=CELL, cell_h=CELL)
+    rng = random.Random(1)
+    region_ids, latencies = [], []
+    for _ in range(args.cols * args.rows // 4):  # about as many cells as the dense board
+        w, h = rng.choice(SIZES)
+        start = time.perf_counter()
+        region_ids.append((await sparse.reserve(w * CELL, h * CELL))[4])
+        latencies.append(time.perf_counter() - start)
+    depth = max(row + rows for _, row, _, rows in sparse._regions.values())
+    print(f"{'filled':>10}: {len(region_ids)} regions, {depth} rows deep, {len(sparse._chunks)} tiles")
+    _report("reserve", latencies)
+    start = time.perf_counter()
+    for rid in region_ids[:-10]:
+        await sparse.release(rid)
+    per_release_us = (time.perf_counter() - start) / max(len(region_ids) - 10, 1) * 1e6
+    print(f"{'released':>10}: all but 10 regions, {len(sparse._chunks)} tiles left, {per_release_us:.1f} us/release")
+
+    print()
+    print(f"release with packed regions, {args.cols}x{args.rows} grid")
+    print(f"{'mode':>10} {'regions':>8} {'release us':>11} {'pack us':>9} {'rebuilds':>9}")
+    for label in ("rebuild", "patched"):
+        board = _GridAllocator(cols=args.cols, rows=args.rows, cell_w=CELL, cell_h=CELL)
+        rng = random.Random(2)
+        live = []
+        for i in range(args.cols * args.rows // 3):
+            if i % 2:
+                placed = await board.reserve_packed(rng.randint(30, 250), rng.randint(20, 180))
+            else:
+                placed = await board.reserve(*(d * CELL for d in rng.choice(SIZES)))
+            if placed is not None:
+                live.append(placed[4])
+        regions = len(live)
+        release_s = pack_s = 0.0
+        rebuilds = 0
+        for _ in range(min(200, len(live))):
+            region_id = live.pop(rng.randrange(len(live)))
+            start = time.perf_counter()
+            await board.release(region_id)
+            if label == "rebuild":
+                board._maxrects = None
+            release_s += time.perf_counter() - start
+            before = board._maxrects
+            start = time.perf_counter()
+            placed = await board.reserve_packed(rng.randint(30, 250), rng.randint(20, 180))
+            pack_s += time.perf_counter() - start
+            rebuilds += board._maxrects is not before
+            if placed is not None:
+                live.append(placed[4])
+        n = min(200, regions)
+        print(f"{label:>10} {regions:>8} {release_s / n * 1e6:>11.1f} {pack_s / n * 1e6:>9.1f} {rebuilds:>9}")
+
+    print()
+    print(f"store round trip (loads + op + dumps), {args.cols}x{args.rows} grid")
+    print(f"{'mode':>10} {'regions':>8} {'blob KB':>8} {'release us':>11} {'pack us':>9}")
+    for label in ("rebuild", "stored"):
+        board = _GridAllocator(cols=args.cols, rows=args.rows, cell_w=CELL, cell_h=CELL)
+        rng = random.Random(3)
+        live = []
+        for i in range(args.cols * args.rows // 3):
+            if i % 2:
+                placed = await board.reserve_packed(rng.randint(30, 250), rng.randint(20, 180))
+            else:
+                placed = await board.reserve(*(d * CELL for d in rng.choice(SIZES)))
+            if placed is not None:
+                live.append(placed[4])
+        regions = len(live)
+
+        def _dumps(alloc) -> bytes:
+            if label == "rebuild":
+                alloc._maxrects = None
+            return alloc.dumps()
+
+        blob = _dumps(board)
+        blob_kb = len(blob) / 1024
+        release_s = pack_s = 0.0
+        n = min(100, len(live))
+        for _ in range(n):
+            region_id = live.pop(rng.randrange(len(live)))
+            start = time.perf_counter()
+            alloc = _GridAllocator.loads(blob)
+            await alloc.release(region_id)
+            blob = _dumps(alloc)
+            release_s += time.perf_counter() - start
+            start = time.perf_counter()
+            alloc = _GridAllocator.loads(blob)
+            placed = await alloc.reserve_packed(rng.randint(30, 250), rng.randint(20, 180))
+            blob = _dumps(alloc)
+            pack_s += time.perf_counter() - start
+            if placed is not None:
+                live.append(placed[4])
+        print(f"{label:>10} {regions:>8} {blob_kb:>8.1f} {release_s / n * 1e6:>11.1f} {pack_s / n * 1e6:>9.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
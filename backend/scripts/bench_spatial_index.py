@@ -0,0 +1,92 @@
+"""
+Benchmark the two RTreeIndex backends: libspatialindex (rtree) and the
+pure-Python uniform-grid fallback.
+
+For each board size it times a build by single inserts (as deltas arrive),
+a batch of moves (remove + re-insert) and a batch of viewport-sized
+intersection queries.  Before timing, it checks that both backends return
+the same ids for every query.
+
+    PYTHONPATH=. python scripts/bench_spatial_index.py [--sizes 1000,10000,100000] [--queries 1000]
+
+The board edge grows with sqrt(N), so object density stays roughly constant.
+"""
+
+import argparse
+import math
+import random
+import time
+
+from ai_tutor.services import spatial_index
+from ai_tutor.services.spatial_index import RTreeIndex
+
+
+def _workload(n: int, n_queries: int, seed: int = 1):
+    rng = random.Random(seed)
+    extent = 100.0 * math.sqrt(n)
+    boxes = [
+        (f"o{i}", rng.uniform(0, extent), rng.uniform(0, extent), rng.uniform(10, 200), rng.uniform(10, 200))
+        for i in range(n)
+    ]
+    moves = [
+        (boxes[i], (boxes[i][0], rng.uniform(0, extent), rng.uniform(0, extent), boxes[i][3], boxes[i][4]))
+        for i in rng.sample(range(n), min(n, 1000))
+    ]
+    queries = [(rng.uniform(0, extent), rng.uniform(0, extent), 400.0, 300.0) for _ in range(n_queries)]
+    return boxes, moves, queries
+
+
+def _run(use_rtree: bool, boxes, moves, queries) -> dict:
+    idx = RTreeIndex(use_rtree=use_rtree)
+    start = time.perf_counter()
+    for box in boxes:
+        idx.add_object(*box)
+    build_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for old, new in moves:
+        idx.remove_object(*old)
+        idx.add_object(*new)
+    move_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    hits = 0
+    for q in queries:
+        hits += len(idx.query_intersecting_objects(*q))
+    query_s = time.perf_counter() - start
+    return {
+        "build_ms": build_s * 1000,
+        "move_us": move_s / max(len(moves), 1) * 1e6,
+        "query_us": query_s / max(len(queries), 1) * 1e6,
+        "hits": hits / max(len(queries), 1),
+        "index": idx,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,100000", help="comma-separated object counts")
+    parser.add_argument("--queries", type=int, default=1000)
+    args = parser.parse_args()
+
+    backends = [("grid", False)]
+    if spatial_index._HAS_RTREE:
+        backends.insert(0, ("rtree", True))
+    else:
+        print("rtree not installed – benchmarking the grid fallback only")
+
+    print(f"{'objects':>8} {'backend':>8} {'build ms':>9} {'move us':>8} {'query us':>9} {'hits/query':>11}")
+    for n in (int(s) for s in args.sizes.split(",")):
+        boxes, moves, queries = _workload(n, args.queries)
+        results = {name: _run(use_rtree, boxes, moves, queries) for name, use_rtree in backends}
+        if len(results) == 2:
+            tree, grid = results["rtree"]["index"], results["grid"]["index"]
+            for q in queries:
+                if sorted(tree.query_intersecting_objects(*q)) != sorted(grid.query_intersecting_objects(*q)):
+                    raise SystemExit(f"backends disagree on query {q} at {n} objects")
+        for name, r in results.items():
+            print(f"{n:>8} {name:>8} {r['build_ms']:>9.1f} {r['move_us']:>8.1f} {r['query_us']:>9.1f} {r['hits']:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Benchmark frame-window coalescing in the whiteboard WebSocket router.
+
+Simulates one drawing client streaming small Yjs updates into a session
+watched by several peers, and reports per-peer message count, bytes and
+delivery latency with coalescing disabled and enabled.  With a window, each
+window should reach a peer as one merged frame.  Two workloads:
+
+* ``stroke`` – a freehand stroke grows by one point per update;
+* ``erase``  – on a board with a fragmented delete set, edits alternate with
+  deletions of other objects.  Bytes out must not exceed bytes in.
+
+    PYTHONPATH=. python scripts/bench_whiteboard_coalescing.py [--seconds 5] [--peers 3] [--windows 0,16,50]
+
+No Redis is needed: the write-behind persister never fires within the run
+and the cross-worker relay is disabled.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "bench")  # ai_tutor imports expect it
+
+from y_py import YDoc, apply_update, encode_state_as_update  # type: ignore
+
+from ai_tutor.routers import whiteboard_ws
+
+RATES = (10, 50, 200)  # client updates per second
+WORKLOADS = ("stroke", "erase")
+
+
+class _PeerSocket:
+    """Counts frames and measures how long sent updates took to arrive."""
+
+    def __init__(self, sent_at: list):
+        self._sent_at = sent_at
+        self._delivered = 0
+        self.frames = 0
+        self.bytes = 0
+        self.latencies: list = []
+
+    async def send_bytes(self, data: bytes) -> None:
+        now = time.perf_counter()
+        self.frames += 1
+        self.bytes += len(data)
+        # A merged frame carries every update committed before it; unmerged
+        # windows are flushed as one burst, so the same holds within a few µs.
+        for sent_at in self._sent_at[self._delivered :]:
+            self.latencies.append(now - sent_at)
+        self._delivered = len(self._sent_at)
+
+    async def close(self, code: int = 1000, reason: str = "") -> None:
+        pass
+
+
+def _seed_fragmented(doc, client, n_objects: int = 2000) -> None:
+    """Give server and client the same board with every other object deleted."""
+    objects = client.get_map("objects")
+    with client.begin_transaction() as txn:
+        for i in range(n_objects):
+            objects.set(txn, f"obj-{i}", {"id": f"obj-{i}", "kind": "rect", "metadata": {"source": "user"}})
+    with client.begin_transaction() as txn:
+        for i in range(0, n_objects, 2):
+            objects.pop(txn, f"obj-{i}")
+    with doc.foreign_updates():
+        apply_update(doc.ydoc, encode_state_as_update(client))
+
+
+async def _run(workload: str, rate: int, window_ms: float, seconds: float, n_peers: int) -> dict:
+    doc = whiteboard_ws._SessionDoc(
+        "bench", None, persist_interval_s=3600.0, persist_max_bytes=1 << 40, coalesce_window_s=window_ms / 1000.0
+    )
+    sent_at: list = []
+    peers = [_PeerSocket(sent_at) for _ in range(n_peers)]
+    for peer in peers:
+        doc.attach(peer)
+
+    client = YDoc()
+    objects = client.get_map("objects")
+    if workload == "erase":
+        _seed_fragmented(doc, client)
+    # A browser sends each transaction's own update, not a state-vector diff.
+    outgoing: list = []
+    client.observe_after_transaction(lambda event: outgoing.append(event.get_update()))
+    bytes_in = 0
+    points: list = []
+    interval = 1.0 / rate
+    start = time.perf_counter()
+    for i in range(int(rate * seconds)):
+        with client.begin_transaction() as txn:
+            if workload == "stroke":
+                points.extend([i, i * 0.5])
+                objects.set(txn, "stroke", {"id": "stroke", "kind": "line", "points": list(points), "metadata": {"source": "user"}})
+            elif i % 2:
+                objects.pop(txn, f"obj-{(2 * i + 1) % 2000}")
+            else:
+                key = f"obj-{(2 * i + 3) % 2000}"
+                objects.set(txn, key, {"id": key, "x": i, "metadata": {"source": "user"}})
+        update = outgoing.pop()
+        bytes_in += len(update)
+        sent_at.append(time.perf_counter())
+        await whiteboard_ws._handle_client_update(doc, update, None)
+        await asyncio.sleep(max(0.0, start + (i + 1) * interval - time.perf_counter()))
+
+    await doc.close_window()
+    await asyncio.sleep(0.05)
+    persisted = len(doc.persister._pending)
+    for peer in peers:
+        await doc.detach(peer)
+
+    latencies = [lat for peer in peers for lat in peer.latencies]
+    return {
+        "updates": len(sent_at),
+        "bytes_in": bytes_in,
+        "frames": peers[0].frames,
+        "bytes": peers[0].bytes,
+        "persisted": persisted,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else 0.0,
+        "max_ms": max(latencies) * 1000 if latencies else 0.0,
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--peers", type=int, default=3)
+    parser.add_argument("--windows", default="0,16,50", help="comma-separated coalescing windows in ms (0 = off)")
+    args = parser.parse_args()
+    whiteboard_ws._RELAY_ENABLED = False
+
+    windows = [float(w) for w in args.windows.split(",")]
+    print(
+        f"{'workload':>8} {'rate/s':>7} {'window':>7} {'updates':>8} {'bytes in':>9} {'frames/peer':>12} "
+        f"{'bytes/peer':>11} {'log appends':>12} {'p50 ms':>7} {'max ms':>7}"
+    )
+    for workload in WORKLOADS:
+        for rate in RATES:
+            for window_ms in windows:
+                r = await _run(workload, rate, window_ms, args.seconds, args.peers)
+                print(
+                    f"{workload:>8} {rate:>7} {window_ms:>5.0f}ms {r['updates']:>8} {r['bytes_in']:>9} {r['frames']:>12} "
+                    f"{r['bytes']:>11} {r['persisted']:>12} {r['p50_ms']:>7.1f} {r['max_ms']:>7.1f}"
+                )
+                if r["bytes"] > r["bytes_in"]:
+                    print("         ^ window emitted more bytes than it received")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,418 @@
+"""
+Load-generation harness for the whiteboard WebSocket (`routers/whiteboard_ws`).
+
+Starts the whiteboard router in-process under uvicorn (own thread and event
+loop) with a fake Redis, stubbed JWT auth and a stub Supabase client, then
+connects N sessions x M y-py clients over real sockets (``?proto=2``).  Every
+client streams a realistic mix of edits:
+
+* freehand strokes growing by one point per update (most of the traffic),
+* moves of objects it created, new text/rect objects,
+* pointer pings on the ephemeral channel.
+
+Each written value carries the sender's ``perf_counter`` timestamp, so peers
+measure apply-to-peer-receive latency directly (same process, same clock).
+When several edits to one key are coalesced into a single frame only the
+newest is measured.
+
+Reported: p50/p95/p99/max latency for document updates and pointer pings,
+update and delivery throughput, bytes on the wire, whether every session
+converged, server-thread CPU time and process peak RSS.
+
+    PYTHONPATH=. python scripts/load_whiteboard_ws.py [--sessions 4] [--clients 5] [--seconds 10] [--rate 20]
+
+``tests/whiteboard/test_whiteboard_load.py`` runs a small configuration of the
+same harness and fails when the latency percentiles exceed their budgets.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import statistics
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass, field
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+os.environ.setdefault("OPENAI_API_KEY", "bench")  # ai_tutor imports expect it
+
+import uvicorn
+from fastapi import FastAPI
+from websockets.asyncio.client import connect
+from y_py import YDoc, apply_update, encode_state_as_update, encode_state_vector  # type: ignore
+
+from ai_tutor.dependencies import get_redis_client, get_supabase_client
+from ai_tutor.routers import whiteboard_ws
+from ai_tutor.services import whiteboard_protocol as proto
+from ai_tutor.services import whiteboard_relay
+from tests.fake_redis import FakeRedis
+
+STROKE_MAX_POINTS = 200
+# Share of each client's updates per kind of edit (the rest are stroke points)
+MOVE_SHARE = 0.15
+CREATE_SHARE = 0.10
+POINTER_SHARE = 0.05
+
+
+@dataclass
+class LoadConfig:
+    sessions: int = 4
+    clients_per_session: int = 5
+    seconds: float = 10.0
+    rate: float = 20.0  # updates per second per client
+    seed: int = 0
+
+
+@dataclass
+class LoadReport:
+    config: LoadConfig
+    updates_sent: int = 0
+    pointers_sent: int = 0
+    deliveries: int = 0
+    bytes_sent: int = 0
+    bytes_received: int = 0
+    update_latency_ms: Dict[str, float] = field(default_factory=dict)
+    pointer_latency_ms: Dict[str, float] = field(default_factory=dict)
+    updates_per_s: float = 0.0
+    deliveries_per_s: float = 0.0
+    converged: bool = False
+    server_cpu_s: float = 0.0
+    server_cpu_pct: float = 0.0
+    peak_rss_mb: float = 0.0
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """p50/p95/p99/max of *samples* (seconds) in milliseconds."""
+    if not samples:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0, "n": 0}
+    ordered = sorted(samples)
+    cuts = statistics.quantiles(ordered, n=100, method="inclusive") if len(ordered) > 1 else ordered * 99
+    return {
+        "p50": cuts[49] * 1000,
+        "p95": cuts[94] * 1000,
+        "p99": cuts[98] * 1000,
+        "max": ordered[-1] * 1000,
+        "n": len(ordered),
+    }
+
+
+# --------------------------------------------------------------------------- #
+#  In-process server
+# --------------------------------------------------------------------------- #
+
+
+class _StubSupabase:
+    """Answers the ownership select with "owned" for every session."""
+
+    def table(self, _name):
+        return self
+
+    def select(self, *_args, **_kwargs):
+        return self
+
+    def eq(self, *_args):
+        return self
+
+    def maybe_single(self):
+        return self
+
+    def execute(self):
+        return SimpleNamespace(data={"id": "owned"})
+
+
+async def _stub_authenticate(ws, _supabase):
+    return SimpleNamespace(id=ws.query_params.get("user", "load"))
+
+
+def _build_app(redis) -> FastAPI:
+    @asynccontextmanager
+    async def lifespan(_app):
+        whiteboard_ws.start_ephemeral_gc()
+        yield
+        await whiteboard_ws.shutdown_whiteboard()
+
+    app = FastAPI(lifespan=lifespan)
+    app.include_router(whiteboard_ws.router)
+    app.dependency_overrides[get_redis_client] = lambda: redis
+    app.dependency_overrides[get_supabase_client] = lambda: _StubSupabase()
+    return app
+
+
+class InProcessServer:
+    """Runs the whiteboard router under uvicorn in a dedicated thread.
+
+    Process-wide whiteboard state (resident docs, expiry heap, memory budget,
+    relay) is replaced for the run and restored by :meth:`stop`.
+    """
+
+    def __init__(self) -> None:
+        self.port: Optional[int] = None
+        self._server: Optional[uvicorn.Server] = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._thread_main, name="whiteboard-load-server", daemon=True)
+        self._saved: Dict[str, object] = {}
+
+    def start(self) -> "InProcessServer":
+        for name in ("_authenticate_ws", "_docs", "_expiry", "_budget"):
+            self._saved[name] = getattr(whiteboard_ws, name)
+        whiteboard_ws._authenticate_ws = _stub_authenticate
+        whiteboard_ws._docs = {}
+        whiteboard_ws._expiry = whiteboard_ws._ExpiryScheduler()
+        whiteboard_ws._budget = whiteboard_ws._MemoryBudget()
+        self._saved["relay"] = whiteboard_relay._RELAY
+        whiteboard_relay._RELAY = None
+
+        self._thread.start()
+        if not self._ready.wait(timeout=10):
+            raise RuntimeError("whiteboard load server did not start")
+        return self
+
+    def _thread_main(self) -> None:
+        asyncio.run(self._serve())
+
+    async def _serve(self) -> None:
+        app = _build_app(FakeRedis())
+        config = uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning", ws_max_size=16 * 1024 * 1024)
+        self._server = uvicorn.Server(config)
+        serving = asyncio.create_task(self._server.serve())
+        while not self._server.started:
+            if serving.done():
+                break
+            await asyncio.sleep(0.01)
+        if self._server.started:
+            self.port = self._server.servers[0].sockets[0].getsockname()[1]
+        self._ready.set()
+        await serving
+
+    def url(self, session_id: str, user: str) -> str:
+        return f"ws://127.0.0.1:{self.port}/ws/v2/session/{session_id}/whiteboard?proto=2&user={user}"
+
+    def cpu_seconds(self) -> float:
+        """CPU time consumed by the server thread so far."""
+        return time.clock_gettime(time.pthread_getcpuclockid(self._thread.ident))
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.should_exit = True
+        self._thread.join(timeout=15)
+        for name in ("_authenticate_ws", "_docs", "_expiry", "_budget"):
+            setattr(whiteboard_ws, name, self._saved[name])
+        whiteboard_relay._RELAY = self._saved["relay"]
+
+
+# --------------------------------------------------------------------------- #
+#  Clients
+# --------------------------------------------------------------------------- #
+
+
+class _LoadClient:
+    """One y-py client: writes its own objects and times everyone else's."""
+
+    def __init__(self, client_id: str, rng: random.Random, report: LoadReport) -> None:
+        self.client_id = client_id
+        self.rng = rng
+        self.report = report
+        self.doc = YDoc()
+        self.objects = self.doc.get_map("objects")
+        self.latencies: List[float] = []
+        self.pointer_latencies: List[float] = []
+        self._remote = False
+        self._sub = self.objects.observe(self._on_change)
+        self._owned: List[str] = []
+        self._stroke_key: Optional[str] = None
+        self._stroke_points: List[float] = []
+        self._ws = None
+
+    def _on_change(self, event) -> None:
+        if not self._remote:
+            return
+        now = time.perf_counter()
+        for change in event.keys.values():
+            value = change.get("newValue")
+            if isinstance(value, dict) and value.get("by") != self.client_id and "t" in value:
+                self.latencies.append(now - value["t"])
+                self.report.deliveries += 1
+
+    async def _send(self, message: bytes) -> None:
+        self.report.bytes_sent += len(message)
+        await self._ws.send(message)
+
+    def _write(self, key: str, spec: dict) -> bytes:
+        before = encode_state_vector(self.doc)
+        with self.doc.begin_transaction() as txn:
+            self.objects.set(txn, key, spec)
+        return encode_state_as_update(self.doc, before)
+
+    def _next_edit(self) -> Optional[bytes]:
+        """Return the next framed message to send (document update or pointer ping)."""
+        roll = self.rng.random()
+        now = time.perf_counter()
+        base = {"by": self.client_id, "t": now, "metadata": {"source": "user"}}
+        if roll < POINTER_SHARE:
+            ping = {
+                "id": f"ptr-{self.client_id}",
+                "kind": "pointer_ping",
+                "x": self.rng.uniform(0, 1200),
+                "y": self.rng.uniform(0, 800),
+                "metadata": {"source": "user", "expiresAt": time.time() * 1000 + 3000, "t": now, "by": self.client_id},
+            }
+            self.report.pointers_sent += 1
+            return proto.encode_ephemeral(json.dumps({"set": [ping]}).encode())
+
+        self.report.updates_sent += 1
+        if roll < POINTER_SHARE + CREATE_SHARE or not self._owned:
+            key = f"{self.client_id}-{len(self._owned)}"
+            self._owned.append(key)
+            spec = {**base, "id": key, "kind": self.rng.choice(["text", "rect"]), "text": "load " * 8,
+                    "x": self.rng.uniform(0, 1200), "y": self.rng.uniform(0, 800), "width": 160, "height": 60}
+            return proto.encode_update(self._write(key, spec))
+        if roll < POINTER_SHARE + CREATE_SHARE + MOVE_SHARE:
+            key = self.rng.choice(self._owned)
+            spec = dict(self.objects.get(key) or {"id": key})
+            spec.update(base, x=self.rng.uniform(0, 1200), y=self.rng.uniform(0, 800))
+            return proto.encode_update(self._write(key, spec))
+
+        if self._stroke_key is None or len(self._stroke_points) >= 2 * STROKE_MAX_POINTS:
+            self._stroke_key = f"{self.client_id}-stroke-{uuid.uuid4().hex[:8]}"
+            self._stroke_points = []
+        self._stroke_points.extend([self.rng.uniform(0, 1200), self.rng.uniform(0, 800)])
+        spec = {**base, "id": self._stroke_key, "kind": "line", "points": list(self._stroke_points)}
+        return proto.encode_update(self._write(self._stroke_key, spec))
+
+    def _handle(self, data: bytes) -> Optional[bytes]:
+        self.report.bytes_received += len(data)
+        if proto.message_type(data) == proto.MESSAGE_EPHEMERAL:
+            now = time.perf_counter()
+            for spec in json.loads(proto.decode_ephemeral(data)).get("set", []):
+                md = spec.get("metadata") or {}
+                if md.get("by") not in (None, self.client_id) and "t" in md:
+                    self.pointer_latencies.append(now - md["t"])
+            return None
+        _, sync_type, payload = proto.decode_message(data)
+        if sync_type == proto.SYNC_STEP1:
+            return proto.encode_sync(proto.SYNC_STEP2, encode_state_as_update(self.doc, payload))
+        self._remote = True
+        try:
+            apply_update(self.doc, payload)
+        finally:
+            self._remote = False
+        return None
+
+    async def _receive(self) -> None:
+        async for data in self._ws:
+            reply = self._handle(data)
+            if reply is not None:
+                await self._send(reply)
+
+    async def run(self, url: str, seconds: float, rate: float, start_at: float, stop: asyncio.Event) -> None:
+        async with connect(url, max_size=None) as ws:
+            self._ws = ws
+            await self._send(proto.encode_sync(proto.SYNC_STEP1, encode_state_vector(self.doc)))
+            receiver = asyncio.create_task(self._receive())
+            await asyncio.sleep(max(0.0, start_at - time.perf_counter()))
+            # Spread clients over the first interval so they do not send in lockstep.
+            await asyncio.sleep(self.rng.uniform(0, 1.0 / rate))
+            begin = time.perf_counter()
+            for i in range(int(seconds * rate)):
+                await self._send(self._next_edit())
+                await asyncio.sleep(max(0.0, begin + (i + 1) / rate - time.perf_counter()))
+            await stop.wait()
+            receiver.cancel()
+            try:
+                await receiver
+            except (asyncio.CancelledError, Exception):
+                pass
+
+    def keys(self) -> set:
+        return set(self.objects.keys())
+
+
+async def _wait_converged(sessions: List[List[_LoadClient]], timeout: float) -> bool:
+    deadline = time.perf_counter() + timeout
+    while True:
+        if all(len({frozenset(c.keys()) for c in clients}) == 1 for clients in sessions):
+            return True
+        if time.perf_counter() > deadline:
+            return False
+        await asyncio.sleep(0.05)
+
+
+async def run_load(config: LoadConfig, server: Optional[InProcessServer] = None) -> LoadReport:
+    """Run one load round against *server* (a fresh in-process one by default)."""
+    own_server = server is None
+    server = server or InProcessServer().start()
+    report = LoadReport(config=config)
+    rng = random.Random(config.seed)
+    try:
+        sessions = [
+            [_LoadClient(f"s{s}c{c}", random.Random(rng.random()), report) for c in range(config.clients_per_session)]
+            for s in range(config.sessions)
+        ]
+        session_ids = [str(uuid.uuid4()) for _ in sessions]
+        stop = asyncio.Event()
+        start_at = time.perf_counter() + 0.5  # Let every client connect first
+        cpu_before = server.cpu_seconds()
+        tasks = [
+            asyncio.create_task(client.run(server.url(sid, client.client_id), config.seconds, config.rate, start_at, stop))
+            for sid, clients in zip(session_ids, sessions)
+            for client in clients
+        ]
+        await asyncio.sleep(max(0.0, start_at - time.perf_counter()) + config.seconds)
+        report.converged = await _wait_converged(sessions, timeout=max(5.0, config.seconds))
+        elapsed = time.perf_counter() - start_at
+        cpu_used = server.cpu_seconds() - cpu_before
+        stop.set()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        clients = [c for session in sessions for c in session]
+        report.update_latency_ms = percentiles([lat for c in clients for lat in c.latencies])
+        report.pointer_latency_ms = percentiles([lat for c in clients for lat in c.pointer_latencies])
+        report.updates_per_s = report.updates_sent / config.seconds
+        report.deliveries_per_s = report.deliveries / elapsed
+        report.server_cpu_s = cpu_used
+        report.server_cpu_pct = 100.0 * cpu_used / elapsed
+        report.peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    finally:
+        if own_server:
+            server.stop()
+    return report
+
+
+def format_report(report: LoadReport) -> str:
+    cfg = report.config
+    lat, ptr = report.update_latency_ms, report.pointer_latency_ms
+    return "\n".join([
+        f"{cfg.sessions} sessions x {cfg.clients_per_session} clients, {cfg.rate:g} updates/s each, {cfg.seconds:g} s",
+        f"  updates sent     {report.updates_sent:>9}  ({report.updates_per_s:,.0f}/s), pointer pings {report.pointers_sent}",
+        f"  peer deliveries  {report.deliveries:>9}  ({report.deliveries_per_s:,.0f}/s)",
+        f"  bytes out / in   {report.bytes_sent:>9} / {report.bytes_received}",
+        f"  update latency   p50 {lat['p50']:.1f} ms  p95 {lat['p95']:.1f} ms  p99 {lat['p99']:.1f} ms  max {lat['max']:.1f} ms",
+        f"  pointer latency  p50 {ptr['p50']:.1f} ms  p95 {ptr['p95']:.1f} ms  p99 {ptr['p99']:.1f} ms",
+        f"  converged        {report.converged}",
+        f"  server CPU       {report.server_cpu_s:.2f} s ({report.server_cpu_pct:.0f}% of one core), peak RSS {report.peak_rss_mb:.0f} MB",
+    ])
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=4)
+    parser.add_argument("--clients", type=int, default=5, help="clients per session")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--rate", type=float, default=20.0, help="updates per second per client")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    config = LoadConfig(args.sessions, args.clients, args.seconds, args.rate, args.seed)
+    report = await run_load(config)
+    print(json.dumps(asdict(report), indent=2) if args.json else format_report(report))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,8 @@
+import pytest
+
+from tests.fake_redis import FakeRedis
+
+
+@pytest.fixture
+def fake_redis():
+    return FakeRedis()
@@ -0,0 +1,176 @@
+"""In-memory stand-in for the subset of redis.asyncio the backend uses.
+
+Shared by the test suite (see the ``fake_redis`` fixture in tests/conftest.py)
+and scripts that run the whiteboard in-process.  Covers strings with TTLs,
+lists, WATCH/MULTI pipelines and pub/sub; clients that should see each other
+(e.g. two workers) share one instance.
+"""
+
+import asyncio
+import time
+
+from redis.exceptions import WatchError  # type: ignore
+
+
+class FakeRedis:
+    """In-memory stand-in for the subset of redis.asyncio used by the backend."""
+
+    def __init__(self):
+        self.store: dict = {}
+        self.versions: dict[str, int] = {}
+        self.calls: dict[str, int] = {}
+        # key -> monotonic deadline; not enforced, only reported by ttl()
+        self.expiry: dict[str, float] = {}
+        # channel -> subscribed _FakePubSub objects
+        self.channels: dict[str, set] = {}
+
+    def _touch(self, key):
+        self.versions[key] = self.versions.get(key, 0) + 1
+
+    def _count(self, name):
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    # --- strings --- #
+    async def get(self, key):
+        self._count("get")
+        return self.store.get(key)
+
+    async def set(self, key, value, ex=None):
+        self._count("set")
+        self.store[key] = value
+        if ex is not None:
+            self.expiry[key] = time.monotonic() + ex
+        else:
+            self.expiry.pop(key, None)
+        self._touch(key)
+        return True
+
+    async def delete(self, *keys):
+        removed = 0
+        for key in keys:
+            self.expiry.pop(key, None)
+            if self.store.pop(key, None) is not None:
+                removed += 1
+                self._touch(key)
+        return removed
+
+    async def exists(self, *keys):
+        return sum(key in self.store for key in keys)
+
+    async def ttl(self, key):
+        if key not in self.store:
+            return -2
+        if key not in self.expiry:
+            return -1
+        return max(0, round(self.expiry[key] - time.monotonic()))
+
+    # --- lists --- #
+    async def rpush(self, key, *values):
+        self._count("rpush")
+        lst = self.store.setdefault(key, [])
+        lst.extend(values)
+        self._touch(key)
+        return len(lst)
+
+    async def lrange(self, key, start, end):
+        lst = self.store.get(key, [])
+        end = len(lst) if end == -1 else end + 1
+        return list(lst[start:end])
+
+    async def ltrim(self, key, start, end):
+        lst = self.store.get(key, [])
+        end = len(lst) if end == -1 else end + 1
+        self.store[key] = lst[start:end]
+        self._touch(key)
+        return True
+
+    async def llen(self, key):
+        return len(self.store.get(key, []))
+
+    def pipeline(self, transaction=True):
+        return _FakePipeline(self)
+
+    # --- pub/sub --- #
+    async def publish(self, channel, message):
+        if isinstance(channel, bytes):
+            channel = channel.decode()
+        subscribers = self.channels.get(channel, ())
+        for pubsub in subscribers:
+            pubsub.messages.put_nowait({"type": "message", "channel": channel.encode(), "data": message})
+        return len(subscribers)
+
+    def pubsub(self):
+        return _FakePubSub(self)
+
+    async def aclose(self):
+        pass
+
+
+class _FakePubSub:
+    def __init__(self, redis: FakeRedis):
+        self._redis = redis
+        self.messages: asyncio.Queue = asyncio.Queue()
+
+    async def subscribe(self, *channels):
+        for channel in channels:
+            self._redis.channels.setdefault(channel, set()).add(self)
+
+    async def unsubscribe(self, *channels):
+        for channel in channels:
+            self._redis.channels.get(channel, set()).discard(self)
+
+    async def get_message(self, ignore_subscribe_messages=False, timeout=0.0):
+        try:
+            return await asyncio.wait_for(self.messages.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def aclose(self):
+        for subscribers in self._redis.channels.values():
+            subscribers.discard(self)
+
+
+class _FakePipeline:
+    def __init__(self, redis: FakeRedis):
+        self._redis = redis
+        self._queue: list = []
+        self._watched: dict[str, int] = {}
+        self._immediate = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def watch(self, *keys):
+        self._immediate = True
+        for key in keys:
+            self._watched[key] = self._redis.versions.get(key, 0)
+
+    async def unwatch(self):
+        self._watched.clear()
+
+    def multi(self):
+        self._immediate = False
+
+    def __getattr__(self, name):
+        target = getattr(self._redis, name)
+
+        def _call(*args, **kwargs):
+            if self._immediate:
+                return target(*args, **kwargs)
+            self._queue.append((target, args, kwargs))
+            return self
+
+        return _call
+
+    async def execute(self):
+        for key, version in self._watched.items():
+            if self._redis.versions.get(key, 0) != version:
+                self._queue.clear()
+                raise WatchError("watched key changed")
+        results = [await fn(*args, **kwargs) for fn, args, kwargs in self._queue]
+        self._queue.clear()
+        self._watched.clear()
+        return results
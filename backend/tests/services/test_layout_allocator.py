@@ -1,3 +1,5 @@
+import asyncio
+
 import pytest
 import math
 from unittest.mock import patch, MagicMock
@@ -199,4 +201,325 @@ async def test_release_region_makes_space_available(test_allocator):
     assert third_placement is not None
     assert third_placement["x"] == 0
     assert third_placement["y"] == 0
-    assert third_placement["regionId"] != region_to_release # Should be a new regionId 
\ No newline at end of file
+    assert third_placement["regionId"] != region_to_release # Should be a new regionId 
+
+def test_first_fit_matches_cell_scan():
+    import random
+
+    rng = random.Random(5)
+    alloc = _GridAllocator(cols=13, rows=9, cell_w=1, cell_h=1)
+    for i in range(25):
+        alloc._occupy_block(f"r{i}", rng.randrange(13), rng.randrange(9), 1, 1)
+
+    def brute(w, h):
+        for r in range(alloc.rows - h + 1):
+            for c in range(alloc.cols - w + 1):
+                if all(not (alloc._rows[rr] >> cc) & 1 for rr in range(r, r + h) for cc in range(c, c + w)):
+                    return (c, r)
+        return None
+
+    for w in range(1, 6):
+        for h in range(1, 5):
+            assert alloc._first_fit(w, h) == brute(w, h), (w, h)
+
+
+# Scripted lesson: title, prose, equations, an MCQ, a diagram with labels, a table
+LESSON = [(600, 60), (400, 80), (300, 70), (420, 260), (150, 40), (500, 320), (150, 40), (150, 40),
+          (400, 80), (300, 70), (440, 200), (40, 40), (40, 40), (400, 80), (420, 260), (300, 70)] * 4
+
+
+def _overlap(a, b):
+    return a[0] < b[0] + b[2] and b[0] < a[0] + a[2] and a[1] < b[1] + b[3] and b[1] < a[1] + a[3]
+
+
+async def _place_until_full(session_id, strategy, **kwargs):
+    placed = []
+    for width, height in LESSON:
+        placement = await reserve_region(session_id, width, height, strategy=strategy, **kwargs)
+        if placement is None:
+            break
+        placed.append((placement["x"], placement["y"], placement["width"], placement["height"]))
+    return placed
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("heuristic", ["best-short-side", "best-area"])
+async def test_pack_fits_more_of_a_lesson_than_flow(monkeypatch, heuristic):
+    monkeypatch.setattr(layout_allocator, "_allocators", {})
+    flow = await _place_until_full("flow-session", "flow")
+    packed = await _place_until_full("pack-session", "pack", pack_heuristic=heuristic)
+
+    assert len(packed) > len(flow) * 1.3
+    board_w = layout_allocator._GRID_COLS * layout_allocator._CELL_WIDTH
+    board_h = layout_allocator._GRID_ROWS * layout_allocator._CELL_HEIGHT
+    for i, rect in enumerate(packed):
+        assert rect[0] >= 0 and rect[1] >= 0 and rect[0] + rect[2] <= board_w and rect[1] + rect[3] <= board_h
+        assert (rect[2], rect[3]) == LESSON[i]
+        assert not any(_overlap(rect, other) for other in packed[:i])
+
+
+@pytest.mark.asyncio
+async def test_pack_and_flow_share_the_board(test_allocator):
+    alloc, session_id = await test_allocator
+    packed = await reserve_region(session_id, 130, 30, strategy="pack")
+    assert (packed["x"], packed["y"]) == (0, 0)
+    # Flow never lands on a cell a packed object touches
+    flow = await reserve_region(session_id, TEST_CELL_WIDTH, TEST_CELL_HEIGHT, strategy="flow")
+    assert (flow["x"], flow["y"]) == (2 * TEST_CELL_WIDTH, 0)
+    # ...and pack avoids the flow block, then reuses space once it is released
+    second = await reserve_region(session_id, 60, 20, strategy="pack")
+    assert not _overlap((second["x"], second["y"], 60, 20), (flow["x"], flow["y"], flow["width"], flow["height"]))
+    await release_region(session_id, packed["regionId"])
+    again = await reserve_region(session_id, 130, 30, strategy="pack")
+    assert (again["x"], again["y"]) == (0, 0)
+
+    with pytest.raises(ValueError):
+        await reserve_region(session_id, 10, 10, strategy="pack", pack_heuristic="worst-fit")
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("make", [
+    lambda: _GridAllocator(cols=8, rows=12, cell_w=100, cell_h=50),
+    lambda: layout_allocator._SparseGridAllocator(cols=8, cell_w=100, cell_h=50),
+])
+async def test_release_keeps_shared_cells_and_patches_free_rects(make):
+    import random
+
+    rng = random.Random(3)
+    board = make()
+    live = []
+    for step in range(400):
+        if live and rng.random() < 0.4:
+            await board.release(live.pop(rng.randrange(len(live))))
+        elif rng.random() < 0.6:
+            placed = await board.reserve_packed(rng.randint(20, 180), rng.randint(10, 90))
+            live += [placed[4]] if placed else []
+        else:
+            placed = await board.reserve(rng.randint(50, 250), rng.randint(30, 120))
+            live += [placed[4]] if placed else []
+
+        # Occupancy is exactly the union of the live regions' blocks
+        taken = {
+            (c, r) for col, row, cols, rows in board._regions.values()
+            for c in range(col, col + cols) for r in range(row, row + rows)
+        }
+        for r in range(12):
+            for c in range(8):
+                assert (not board._block_free(c, r, 1, 1)) == ((c, r) in taken), (step, c, r)
+        # Free rectangles never cover a live region
+        if board._maxrects is not None:
+            used = [board._region_rect(rid) for rid in board._regions]
+            assert not any(_overlap(f, u) for f in board._maxrects.free for u in used), step
+
+
+@pytest.mark.asyncio
+async def test_release_reuses_free_rects_without_a_rebuild():
+    board = _GridAllocator(cols=8, rows=6, cell_w=100, cell_h=50)
+    first = await board.reserve_packed(130, 30)
+    await board.reserve_packed(130, 30)
+    maxrects = board._maxrects
+    await board.release(first[4])
+    assert board._maxrects is maxrects and not maxrects.exact
+    assert (await board.reserve_packed(130, 30))[:2] == (0, 0)
+    assert board._maxrects is maxrects
+    # A request only the merged free space can hold triggers the rebuild
+    for region_id in list(board._packed):
+        await board.release(region_id)
+    assert (await board.reserve_packed(800, 300))[:2] == (0, 0)
+    assert board._maxrects is not maxrects
+
+
+# --------------------------------------------------------------------------- #
+#  Sparse (infinite) boards
+# --------------------------------------------------------------------------- #
+
+def test_sparse_first_fit_matches_dense():
+    import random
+
+    rng = random.Random(7)
+    dense = _GridAllocator(cols=70, rows=80, cell_w=1, cell_h=1)
+    sparse = layout_allocator._SparseGridAllocator(cols=70, cell_w=1, cell_h=1)
+    for i in range(400):
+        block = (f"r{i}", rng.randrange(68), rng.randrange(78), rng.randint(1, 3), rng.randint(1, 3))
+        dense._occupy_block(*block)
+        sparse._occupy_block(*block)
+
+    for w in (1, 2, 5, 33, 70):
+        for h in (1, 2, 4):
+            fit = dense._first_fit(w, h)
+            if fit is not None:
+                assert sparse._first_fit(w, h) == fit, (w, h)
+            else:
+                # The dense board is out of rows; the sparse one keeps going
+                assert sparse._first_fit(w, h)[1] + h > dense.rows
+    for r in range(80):
+        for c in range(0, 70, 7):
+            assert sparse._block_free(c, r, 7, 1) == dense._block_free(c, r, 7, 1)
+
+
+@pytest.mark.asyncio
+async def test_sparse_board_grows_and_frees_tiles(monkeypatch):
+    monkeypatch.setattr(layout_allocator, "_allocators", {})
+    monkeypatch.setattr(layout_allocator, "_ALLOCATOR_MODE", "sparse")
+    monkeypatch.setattr(layout_allocator, "_GRID_COLS", 2)
+    session_id = "sparse-session"
+    alloc = await _get_allocator(session_id)
+    assert isinstance(alloc, layout_allocator._SparseGridAllocator)
+
+    cell_w, cell_h = layout_allocator._CELL_WIDTH, layout_allocator._CELL_HEIGHT
+    placements = [await reserve_region(session_id, cell_w, cell_h) for _ in range(200)]
+    assert all(p is not None for p in placements)
+    assert placements[-1]["y"] == 99 * cell_h  # far past _GRID_ROWS
+    # 100 rows × 2 cols span four 32-row tiles
+    assert len(alloc._chunks) == 4
+
+    for p in placements[:-1]:
+        await release_region(session_id, p["regionId"])
+    assert list(alloc._chunks) == [(0, 99 // layout_allocator._CHUNK)]
+    again = await reserve_region(session_id, 2 * cell_w, 3 * cell_h)
+    assert (again["x"], again["y"]) == (0, 0)
+
+    async def below(row):
+        return await reserve_region(
+            session_id, cell_w, cell_h, strategy="anchor",
+            anchor_object_bbox={"x": cell_w, "y": row * cell_h, "width": cell_w, "height": cell_h},
+            anchor_placement="below",
+        )
+
+    assert await below(98) is None  # the surviving object sits right there
+    assert (await below(99))["y"] == 100 * cell_h
+    packed = await reserve_region(session_id, 50, 50, strategy="pack")
+    assert not _overlap((packed["x"], packed["y"], 50, 50), (0, 0, again["width"], again["height"]))
+
+
+# --------------------------------------------------------------------------- #
+#  Stores
+# --------------------------------------------------------------------------- #
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("make", [
+    lambda: _GridAllocator(cols=6, rows=20, cell_w=100, cell_h=50),
+    lambda: layout_allocator._SparseGridAllocator(cols=6, cell_w=100, cell_h=50),
+])
+async def test_board_round_trips_through_dumps(make):
+    board = make()
+    for w, h in [(100, 50), (250, 120), (60, 30), (600, 40)] * 3:
+        await board.reserve(w, h)
+        await board.reserve_packed(w // 2, h // 2)
+    await board.release(next(iter(board._regions)))
+
+    copy = _GridAllocator.loads(board.dumps())
+    assert type(copy) is type(board)
+    assert copy._regions == board._regions and copy._packed == board._packed
+    # The patched free list travels along instead of being rebuilt
+    assert copy._maxrects.free == board._maxrects.free and copy._maxrects.exact == board._maxrects.exact
+    for r in range(20):
+        for c in range(6):
+            assert copy._block_free(c, r, 1, 1) == board._block_free(c, r, 1, 1)
+    for w, h in [(100, 50), (300, 100), (70, 70)]:
+        assert (await copy.reserve(w, h))[:4] == (await board.reserve(w, h))[:4]
+        assert (await copy.reserve_packed(w, h))[:4] == (await board.reserve_packed(w, h))[:4]
+
+
+@pytest.mark.asyncio
+async def test_redis_store_is_consistent_across_workers(fake_redis, monkeypatch):
+    # Two workers, each with its own store on the shared Redis
+    workers = [layout_allocator.RedisAllocatorStore(fake_redis, ttl_s=60) for _ in range(2)]
+    session_id = "shared-session"
+
+    async def place(i):
+        return await workers[i % 2].run(session_id, lambda board: board.reserve(220, 140))
+
+    placed = [p for p in await asyncio.gather(*(place(i) for i in range(60))) if p is not None]
+    assert len(placed) == layout_allocator._GRID_COLS * layout_allocator._GRID_ROWS
+    assert len({(x, y) for x, y, *_ in placed}) == len(placed)
+
+    redis = workers[0].redis
+    assert 0 < await redis.ttl(layout_allocator.allocator_key(session_id)) <= 60
+
+    # A worker that just started (or took the session over) sees the same board
+    monkeypatch.setattr(layout_allocator, "_store", layout_allocator.RedisAllocatorStore(fake_redis))
+    assert await reserve_region(session_id, 220, 140) is None
+    await release_region(session_id, placed[5][4])
+    again = await reserve_region(session_id, 220, 140)
+    assert (again["x"], again["y"]) == placed[5][:2]
+
+
+@pytest.mark.asyncio
+async def test_redis_store_no_op_on_missing_board_writes_nothing(fake_redis):
+    redis = fake_redis
+    store = layout_allocator.RedisAllocatorStore(redis, ttl_s=60)
+
+    await store.run("quiet-session", lambda board: board.release("unknown-region"))
+    assert await redis.exists(layout_allocator.allocator_key("quiet-session")) == 0
+    await store.run("quiet-session", lambda board: board.reserve(220, 140))
+    assert await redis.exists(layout_allocator.allocator_key("quiet-session")) == 1
+
+
+# --------------------------------------------------------------------------- #
+#  Batch reservations
+# --------------------------------------------------------------------------- #
+
+@pytest.mark.asyncio
+async def test_reserve_regions_keeps_groups_together(test_allocator):
+    alloc, session_id = await test_allocator
+    W, H = TEST_CELL_WIDTH, TEST_CELL_HEIGHT
+    placements = await layout_allocator.reserve_regions(session_id, [
+        {"width": W, "height": H},
+        {"width": 3 * W, "height": H, "group_id": "q1"},
+        {"width": 2 * W, "height": 2 * H},
+        {"width": 2 * W, "height": H, "group_id": "q1"},
+        {"width": 2 * W, "height": H, "group_id": "q1"},
+    ])
+    assert [(p["x"], p["y"]) for p in placements] == [(0, 0), (W, 0), (4 * W, 0), (W, H), (W, 2 * H)]
+    assert [p.get("groupId") for p in placements] == [None, "q1", None, "q1", "q1"]
+    assert len({p["regionId"] for p in placements}) == 5
+    # Members stay individually releasable
+    await release_region(session_id, placements[3]["regionId"])
+    again = await reserve_region(session_id, 3 * W, H)
+    assert (again["x"], again["y"]) == (0, H)
+    assert await layout_allocator.reserve_regions(session_id, []) == []
+
+
+@pytest.mark.asyncio
+async def test_reserve_regions_is_all_or_nothing(test_allocator):
+    alloc, session_id = await test_allocator
+    W, H = TEST_CELL_WIDTH, TEST_CELL_HEIGHT
+    first = await reserve_region(session_id, 2 * W, H)
+    packed = await reserve_region(session_id, 30, 30, strategy="pack")
+    rows, regions = list(alloc._rows), dict(alloc._regions)
+
+    too_much = [{"width": W, "height": H}] * 10 + [{"width": TEST_GRID_COLS * W, "height": TEST_GRID_ROWS * H}]
+    assert await layout_allocator.reserve_regions(session_id, too_much) is None
+    assert alloc._rows == rows and alloc._regions == regions
+
+    with pytest.raises(ValueError):
+        await layout_allocator.reserve_regions(session_id, [{"width": W, "height": H}, {"width": W, "height": H, "strategy": "anchor"}])
+    assert alloc._regions == regions
+    assert {first["regionId"], packed["regionId"]} <= set(alloc._regions)
+
+
+@pytest.mark.asyncio
+async def test_reserve_regions_tries_largest_first(test_allocator):
+    alloc, session_id = await test_allocator
+    W, H = TEST_CELL_WIDTH, TEST_CELL_HEIGHT
+    # In request order the two wide objects fill row 0 and the full-height one no longer fits
+    placements = await layout_allocator.reserve_regions(session_id, [
+        {"width": 4 * W, "height": H},
+        {"width": 4 * W, "height": H},
+        {"width": W, "height": TEST_GRID_ROWS * H},
+    ])
+    assert [(p["x"], p["y"]) for p in placements] == [(W, 0), (W, H), (0, 0)]
+    assert len(alloc._regions) == 3
+
+
+@pytest.mark.asyncio
+async def test_reserve_regions_through_redis_store(fake_redis, monkeypatch):
+    store = layout_allocator.RedisAllocatorStore(fake_redis)
+    monkeypatch.setattr(layout_allocator, "_store", store)
+    batch = [{"width": 220, "height": 140, "group_id": "g"}] * 3
+    first = await layout_allocator.reserve_regions("redis-batch", batch)
+    second = await layout_allocator.reserve_regions("redis-batch", batch)
+    assert [p["x"] for p in first] == [0, 0, 0] and [p["x"] for p in second] == [220, 220, 220]
+    blob = await store.redis.get(layout_allocator.allocator_key("redis-batch"))
+    assert len(_GridAllocator.loads(blob)._regions) == 6
@@ -0,0 +1,39 @@
+from ai_tutor.services.metadata_index import MetadataIndex
+
+
+def _spec(**metadata):
+    return {"metadata": metadata}
+
+
+def test_postings_follow_updates_and_removals():
+    idx = MetadataIndex()
+    idx.update("a", _spec(role="axis", groupId="plane-1", semantic_tags=["physics", "graph"]))
+    idx.update("b", _spec(role="label", groupId="plane-1", semantic_tags="physics"))
+    idx.update("c", _spec(role="axis", groupId="plane-2", extra={"unhashable": []}))
+
+    assert idx.lookup("role", "axis") == {"a", "c"}
+    assert idx.lookup("semantic_tags", "physics") == {"a", "b"}
+    assert idx.lookup("semantic_tags", ["physics", "graph"]) == {"a"}
+
+    idx.update("a", _spec(role="label", groupId="plane-1"))  # Re-tagged
+    assert idx.lookup("role", "axis") == {"c"}
+    assert idx.lookup("semantic_tags", "graph") == set()
+
+    idx.remove("b")
+    idx.remove("missing")
+    assert idx.lookup("groupId", "plane-1") == {"a"}
+    assert ("semantic_tags", "physics") not in idx._postings  # Empty lists are dropped
+
+
+def test_candidates_split_indexed_and_residual_terms():
+    idx = MetadataIndex()
+    idx.update("a", _spec(role="axis", source="assistant", topic="x"))
+    idx.update("b", _spec(role="axis", source="user"))
+
+    keys, residual = idx.candidates({"meta.role": "axis", "metadata.source": "assistant", "topic": "x", "style.color": "red"})
+    assert keys == {"a"}
+    assert residual == {"topic": "x", "style.color": "red"}
+
+    assert idx.candidates({"topic": "x"}) == (None, {"topic": "x"})
+    assert idx.candidates({"role": "missing", "source": "user"})[0] == set()
+    assert idx.candidates({"role": None}) == (None, {"role": None})
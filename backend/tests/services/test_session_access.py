@@ -0,0 +1,116 @@
+import pytest
+from unittest.mock import MagicMock
+
+from ai_tutor.services import session_access
+from ai_tutor.services.session_access import SessionAccessCache
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _supabase(owned: bool) -> MagicMock:
+    client = MagicMock()
+    chain = client.table.return_value.select.return_value.eq.return_value.eq.return_value
+    chain.maybe_single.return_value.execute.return_value = MagicMock(data={"id": "s"} if owned else None)
+    return client
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    clock = _Clock()
+    cache = SessionAccessCache(allow_ttl_s=60, deny_ttl_s=5, max_entries=3, clock=clock)
+    monkeypatch.setattr(session_access, "_cache", cache)
+    return cache, clock
+
+
+def test_allowed_lookup_is_cached_until_ttl(cache):
+    cache, clock = cache
+    supabase = _supabase(owned=True)
+
+    assert session_access.user_owns_session(supabase, "u", "s")
+    assert session_access.user_owns_session(supabase, "u", "s")
+    assert supabase.table.call_count == 1
+
+    clock.now = 61
+    assert session_access.user_owns_session(supabase, "u", "s")
+    assert supabase.table.call_count == 2
+
+
+def test_denial_is_cached_briefly(cache):
+    cache, clock = cache
+    supabase = _supabase(owned=False)
+
+    assert not session_access.user_owns_session(supabase, "u", "s")
+    assert not session_access.user_owns_session(supabase, "u", "s")
+    assert supabase.table.call_count == 1
+
+    clock.now = 6
+    session_access.user_owns_session(supabase, "u", "s")
+    assert supabase.table.call_count == 2
+
+
+def test_lookup_errors_are_not_cached(cache):
+    supabase = _supabase(owned=True)
+    supabase.table.side_effect = [RuntimeError("db down"), supabase.table.return_value]
+
+    with pytest.raises(RuntimeError):
+        session_access.user_owns_session(supabase, "u", "s")
+    assert session_access.user_owns_session(supabase, "u", "s")
+
+
+def test_remember_and_invalidate(cache):
+    cache, _ = cache
+    supabase = _supabase(owned=False)
+    assert not session_access.user_owns_session(supabase, "u", "s")
+
+    # Session created after a denied poll
+    session_access.remember("u", "s")
+    assert session_access.user_owns_session(supabase, "u", "s")
+
+    session_access.remember("other", "s")
+    session_access.invalidate("s", user_id="u")
+    assert cache.get("u", "s") is None
+    assert cache.get("other", "s") is True
+
+    session_access.invalidate("s")
+    assert len(cache) == 0
+
+
+def test_cache_evicts_least_recently_used(cache):
+    cache, _ = cache
+    for sid in ("a", "b", "c"):
+        cache.put("u", sid, True)
+    cache.get("u", "a")  # refresh "a"
+    cache.put("u", "d", True)
+
+    assert cache.get("u", "b") is None
+    assert cache.get("u", "a") is True
+
+
+@pytest.mark.asyncio
+async def test_session_manager_drops_verdicts_of_vanished_sessions(cache):
+    from ai_tutor.session_manager import SessionManager
+
+    cache, _ = cache
+    manager = SessionManager()
+    session_access.remember("u", "s")
+    missing = MagicMock()
+    chain = missing.table.return_value.select.return_value.eq.return_value.eq.return_value
+    chain.maybe_single.return_value.execute.return_value = MagicMock(data=None)
+
+    assert await manager.get_session_context(missing, "s", "u") is None
+    assert cache.get("u", "s") is None
+
+    # An owner-scoped update that matched no row does the same
+    session_access.remember("u", "s")
+    update = missing.table.return_value.update.return_value.eq.return_value.eq.return_value
+    update.execute.return_value = MagicMock(data=[])
+    context = MagicMock(folder_id=None)
+    context.lean_dict.return_value = {}
+    assert await manager.update_session_context(missing, "s", "u", context)
+    assert cache.get("u", "s") is None
@@ -0,0 +1,107 @@
+import random
+
+import pytest
+
+from ai_tutor.services import spatial_index
+from ai_tutor.services.spatial_index import RTreeIndex
+
+
+def _random_boxes(rng, n, extent=2000):
+    return {f"o{i}": (rng.uniform(-extent, extent), rng.uniform(-extent, extent), rng.uniform(0, 300), rng.uniform(0, 300)) for i in range(n)}
+
+
+def test_grid_fallback_matches_rtree():
+    pytest.importorskip("rtree")
+    rng = random.Random(7)
+    boxes = _random_boxes(rng, 500)
+    boxes["huge"] = (-5000, -5000, 10000, 10000)
+    boxes["edge"] = (0, 0, 100, 100)
+    tree, grid = RTreeIndex(use_rtree=True), RTreeIndex(use_rtree=False)
+    for oid, rect in boxes.items():
+        tree.add_object(oid, *rect)
+        grid.add_object(oid, *rect)
+    # Move and drop a few, as deltas would
+    for oid in list(boxes)[:50]:
+        tree.remove_object(oid, *boxes[oid])
+        grid.remove_object(oid, *boxes[oid])
+        if int(oid[1:]) % 2:
+            boxes[oid] = (rng.uniform(-2000, 2000), rng.uniform(-2000, 2000), 50, 50)
+            tree.add_object(oid, *boxes[oid])
+            grid.add_object(oid, *boxes[oid])
+
+    queries = [(rng.uniform(-2500, 2500), rng.uniform(-2500, 2500), rng.uniform(0, 800), rng.uniform(0, 800)) for _ in range(200)]
+    queries += [(100, 100, 10, 10), (-1e9, -1e9, 2e9, 2e9)]  # touching edge, whole plane
+    for q in queries:
+        assert sorted(grid.query_intersecting_objects(*q)) == sorted(tree.query_intersecting_objects(*q))
+
+
+def test_grid_updates_do_not_need_the_old_box():
+    grid = spatial_index._GridIndex(cell=10)
+    grid.insert("a", (0, 0, 5, 5))
+    grid.insert("a", (100, 100, 105, 105))  # Move
+    assert grid.intersection((0, 0, 6, 6)) == []
+    assert grid.intersection((100, 100, 101, 101)) == ["a"]
+
+    grid.insert("big", (0, 0, 1000, 1000))  # Spans more than max_cells
+    grid.delete("a")
+    assert grid.intersection((100, 100, 101, 101)) == ["big"]
+    grid.delete("big")
+    assert len(grid) == 0 and not grid._cells and not grid._large
+
+
+@pytest.fixture(params=[True, False], ids=["rtree", "grid"])
+def make_index(request):
+    if request.param and not spatial_index._HAS_RTREE:
+        pytest.skip("rtree not installed")
+    return lambda: RTreeIndex(use_rtree=request.param)
+
+
+def test_bulk_load_and_id_keyed_updates(make_index):
+    idx = make_index()
+    idx.bulk_load([("a", 0, 0, 10, 10), ("b", 50, 50, 10, 10), ("a", 100, 100, 10, 10)])
+    assert len(idx) == 2 and idx.bbox_of("a") == (100, 100, 110, 110)
+    assert idx.query_intersecting_objects(0, 0, 20, 20) == []
+
+    idx.add_object("b", 200, 200, -20, -20)  # Move; negative sizes span backwards
+    assert idx.bbox_of("b") == (180, 180, 200, 200)
+    assert idx.query_intersecting_objects(50, 50, 10, 10) == []
+    idx.remove_object("b")  # The old box is not needed
+    idx.remove_object("missing")
+    assert idx.query_intersecting_objects(0, 0, 1000, 1000) == ["a"]
+
+    idx.bulk_load([])
+    assert len(idx) == 0 and idx.nearest(0, 0) == []
+
+
+def test_predicates_nearest_and_batch(make_index):
+    idx = make_index()
+    idx.bulk_load([
+        ("frame", 0, 0, 100, 100),
+        ("inner", 10, 10, 20, 20),
+        ("far", 500, 500, 10, 10),
+    ])
+    assert sorted(idx.query_within(0, 0, 100, 100)) == ["frame", "inner"]
+    assert idx.query_within(5, 5, 50, 50) == ["inner"]
+    assert sorted(idx.query_containing(15, 15, 0, 0)) == ["frame", "inner"]
+    assert idx.query_containing(40, 40, 0, 0) == ["frame"]
+
+    assert idx.nearest(480, 480, k=1) == ["far"]
+    assert idx.nearest(200, 200, k=2)[0] == "frame"
+    assert len(idx.nearest(15, 15, k=10)) == 3
+
+    batch = idx.query_batch([(0, 0, 5, 5), (505, 505, 1, 1), (300, 300, 1, 1)])
+    assert [sorted(ids) for ids in batch] == [["frame"], ["far"], []]
+    with pytest.raises(ValueError):
+        idx.query_batch([(0, 0, 1, 1)], predicate="overlaps")
+
+
+def test_nearest_matches_brute_force():
+    rng = random.Random(3)
+    boxes = _random_boxes(rng, 300)
+    grid = RTreeIndex(use_rtree=False)
+    grid.bulk_load((oid, *rect) for oid, rect in boxes.items())
+    for _ in range(50):
+        x, y = rng.uniform(-3000, 3000), rng.uniform(-3000, 3000)
+        expected = sorted(spatial_index._point_distance(grid.bbox_of(oid), x, y) for oid in boxes)[:5]
+        got = [spatial_index._point_distance(grid.bbox_of(oid), x, y) for oid in grid.nearest(x, y, k=5)]
+        assert got == pytest.approx(expected)
@@ -0,0 +1,108 @@
+import random
+import time
+
+import pytest
+
+from ai_tutor.services import board_digest, whiteboard_ephemeral
+from ai_tutor.services.board_digest import BoardDigest
+from ai_tutor.services.whiteboard_view import BoardView
+
+SESSION = "digest-session"
+
+
+@pytest.fixture(autouse=True)
+def _fresh_cache(monkeypatch):
+    monkeypatch.setattr(board_digest, "_cache", {})
+
+
+def _set(view: BoardView, key: str, spec) -> None:
+    view.apply_event("objects", {key: {"action": "delete"} if spec is None else {"action": "update", "newValue": spec}})
+
+
+def _random_spec(rng: random.Random, key: str) -> dict:
+    md = {"source": rng.choice(["user", "assistant"])}
+    if rng.random() < 0.3:
+        md["role"] = "question_tag"
+    if rng.random() < 0.6:
+        md["concept"] = rng.choice(["evaporation", "condensation", "runoff"])
+    return {"id": key, "kind": rng.choice(["text", "rect", "line"]), "x": rng.uniform(0, 900), "y": rng.uniform(0, 600),
+            "width": 100, "height": 40, "metadata": md}
+
+
+def _normalised(digest: dict) -> dict:
+    return {
+        "counts": digest["counts"],
+        "tags": sorted(t["id"] for t in digest["learner_question_tags"]),
+        "clusters": sorted((c["concept"], tuple(c["bbox"]), c["count"]) for c in digest["concept_clusters"]),
+    }
+
+
+def test_incremental_updates_match_a_full_rebuild():
+    rng = random.Random(7)
+    view = BoardView(SESSION)
+    for i in range(50):
+        _set(view, f"o{i}", _random_spec(rng, f"o{i}"))
+    board_digest.summarise(SESSION, view)
+
+    for _ in range(20):
+        for _ in range(rng.randint(1, 5)):
+            key = f"o{rng.randrange(60)}"
+            _set(view, key, None if rng.random() < 0.3 else _random_spec(rng, key))
+        incremental = board_digest.summarise(SESSION, view)
+        assert _normalised(incremental) == _normalised(BoardDigest.from_view(view).to_dict())
+
+
+def test_unchanged_board_is_served_from_cache():
+    view = BoardView(SESSION)
+    _set(view, "a", {"id": "a", "kind": "text", "metadata": {"source": "user", "concept": "c"}})
+    first = board_digest.summarise(SESSION, view)
+    assert board_digest.summarise(SESSION, view)["counts"] is first["counts"]
+
+    _set(view, "b", {"id": "b", "kind": "rect", "metadata": {"source": "assistant"}})
+    assert board_digest.summarise(SESSION, view)["counts"]["by_kind"] == {"text": 1, "rect": 1}
+
+
+def test_truncated_journal_falls_back_to_full_rebuild(monkeypatch):
+    view = BoardView(SESSION)
+    board_digest.summarise(SESSION, view)
+    for i in range(300):  # More batches than the journal keeps
+        _set(view, f"o{i}", {"id": f"o{i}", "kind": "text", "metadata": {}})
+    assert view.changed_since(0) is None
+    assert board_digest.summarise(SESSION, view)["counts"]["by_kind"] == {"text": 300}
+
+
+def test_ephemeral_summary_reads_the_hosted_store():
+    store = whiteboard_ephemeral.EphemeralStore(SESSION)
+    store.put({"id": "h", "kind": "highlight_stroke"}, now_ms=0)
+    store.put({"id": "p", "kind": "pointer_ping", "x": 3, "y": 4}, now_ms=0)
+    whiteboard_ephemeral.register(store)
+    try:
+        summary = board_digest.summarise(SESSION, BoardView(SESSION))["ephemeralSummary"]
+        assert summary["activeHighlights"] == 1
+        assert (summary["recentPointer"]["x"], summary["recentPointer"]["y"]) == (3, 4)
+    finally:
+        whiteboard_ephemeral.unregister(store)
+
+
+@pytest.mark.asyncio
+async def test_ephemeral_summary_on_a_worker_not_hosting_the_session(fake_redis):
+    from y_py import YDoc, encode_state_as_update  # type: ignore
+
+    from ai_tutor.services import whiteboard_store, whiteboard_view
+
+    # Another worker hosts the session; a legacy client wrote into the YDoc.
+    doc = YDoc()
+    now_ms = time.time() * 1000
+    with doc.begin_transaction() as txn:
+        doc.get_map("objects").set(txn, "a", {"id": "a", "kind": "text", "metadata": {"source": "user"}})
+        ephemeral = doc.get_map("ephemeral")
+        ephemeral.set(txn, "h", {"id": "h", "kind": "highlight_stroke", "metadata": {"expiresAt": now_ms + 60_000}})
+        ephemeral.set(txn, "p", {"id": "p", "kind": "pointer_ping", "x": 3, "y": 4, "metadata": {"expiresAt": now_ms + 60_000}})
+        ephemeral.set(txn, "old", {"id": "old", "kind": "highlight_stroke", "metadata": {"expiresAt": now_ms - 1}})
+    await whiteboard_store.append_updates(fake_redis, SESSION, [encode_state_as_update(doc)])
+
+    assert whiteboard_ephemeral.hosted_store(SESSION) is None
+    view = await whiteboard_view.get_view(fake_redis, SESSION)
+    summary = board_digest.summarise(SESSION, view)["ephemeralSummary"]
+    assert summary["activeHighlights"] == 1  # The expired one is left out
+    assert (summary["recentPointer"]["x"], summary["recentPointer"]["y"]) == (3, 4)
@@ -142,4 +142,84 @@ async def test_draw_text_invalid_input_raises_error():
 
 # Ensure pydantic.ValidationError is imported if still using conditional logic, 
 # but direct ToolInputError expectation is cleaner per skill's behavior.
-# from pydantic import ValidationError # if testing for direct pydantic error 
\ No newline at end of file
+# from pydantic import ValidationError # if testing for direct pydantic error 
+
+@pytest.mark.asyncio
+async def test_add_objects_flow_reserves_all_objects_in_one_batch(monkeypatch, caplog):
+    from ai_tutor.services import layout_allocator
+    from ai_tutor.skills.layout_board_ops import add_objects_to_board
+
+    monkeypatch.setattr(layout_allocator, "_allocators", {})
+    ctx_mock = AsyncMock()
+    ctx_mock.session_id = "flow-batch-session"
+    add_objects = add_objects_to_board.__original_func__
+
+    _, actions = await add_objects(ctx_mock, strategy="flow", group_id="mcq-1", specs=[
+        {"id": "question", "kind": "text", "width": 600, "height": 60},
+        {"id": "option-a", "kind": "text", "width": 400, "height": 40},
+        {"id": "pinned", "kind": "text", "x": 5, "y": 5},
+        {"id": "half-pct", "kind": "text", "xPct": 0.5},
+    ])
+    question, option, pinned, half_pct = actions[0]["objects"]
+    cell_h = layout_allocator._CELL_HEIGHT
+    assert (question["x"], question["y"]) == (0, 0)
+    assert (option["x"], option["y"]) == (0, cell_h)  # stacked with its group
+    assert (option["width"], option["height"]) == (400, 40)
+    assert (pinned["x"], pinned["y"]) == (5, 5)
+    # Any coordinate opts out of flow placement
+    assert "x" not in half_pct and "y" not in half_pct and "regionId" not in half_pct["metadata"]
+    allocator = layout_allocator._allocators["flow-batch-session"]
+    assert set(allocator._regions) == {question["metadata"]["regionId"], option["metadata"]["regionId"]}
+
+    # A batch that does not fit reserves nothing and passes through unplaced
+    taken = dict(allocator._regions)
+    huge = [{"id": f"big-{i}", "kind": "rect", "width": 880, "height": 700} for i in range(3)]
+    with caplog.at_level("WARNING", logger="ai_tutor.skills.layout_board_ops"):
+        _, actions = await add_objects(ctx_mock, strategy="flow", specs=huge)
+    assert "no room for 3 object(s)" in caplog.text
+    assert all("x" not in spec and "y" not in spec for spec in actions[0]["objects"])
+    assert allocator._regions == taken
+
+
+@pytest.mark.asyncio
+async def test_clear_board_resets_the_layout_allocator(monkeypatch):
+    from ai_tutor.services import layout_allocator
+    from ai_tutor.skills.drawing_tools import clear_board
+
+    monkeypatch.setattr(layout_allocator, "_allocators", {})
+    ctx_mock = AsyncMock()
+    ctx_mock.session_id = "clear-session"
+    first = await layout_allocator.reserve_region("clear-session", 400, 200)
+    await layout_allocator.reserve_region("clear-session", 400, 200)
+
+    _, actions = await clear_board.__original_func__(ctx_mock)
+    assert actions == [{"type": "CLEAR_BOARD"}]
+    assert layout_allocator._allocators["clear-session"]._regions == {}
+    again = await layout_allocator.reserve_region("clear-session", 400, 200)
+    assert (again["x"], again["y"]) == (first["x"], first["y"])
+
+
+@pytest.mark.asyncio
+async def test_skills_survive_allocator_conflicts(monkeypatch, caplog):
+    from ai_tutor.services import layout_allocator
+    from ai_tutor.skills.draw_axis import draw_axis_actions
+    from ai_tutor.skills.drawing_tools import clear_board
+    from ai_tutor.skills.layout_board_ops import add_objects_to_board
+
+    class _ConflictingStore(layout_allocator.AllocatorStore):
+        async def run(self, session_id, op):
+            raise layout_allocator.AllocatorConflictError(f"Layout update for session {session_id} conflicted")
+
+    monkeypatch.setattr(layout_allocator, "_store", _ConflictingStore())
+    ctx_mock = AsyncMock()
+    ctx_mock.session_id = "busy-session"
+
+    with caplog.at_level("WARNING"):
+        _, actions = await add_objects_to_board.__original_func__(
+            ctx_mock, strategy="flow", specs=[{"id": "a", "kind": "text", "width": 100, "height": 40}]
+        )
+        assert "x" not in actions[0]["objects"][0]  # Passed through unplaced
+        _, actions = await clear_board.__original_func__(ctx_mock)
+        assert actions == [{"type": "CLEAR_BOARD"}]
+    with pytest.raises(RuntimeError, match="draw_axis_actions: allocator busy"):
+        await draw_axis_actions.__original_func__(ctx_mock)
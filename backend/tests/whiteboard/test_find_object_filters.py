@@ -34,12 +34,26 @@ def build_index(objs):
     ({"role": "diagram"}, {"o1"}),
     ({"role": "annotation"}, {"o2"}),
     ({"role": "missing"}, set()),
+    ({"semantic_tags": "physics"}, {"o1"}),
+    ({"meta.semantic_tags": ["note"]}, {"o2"}),
+    ({"semantic_tags": ["physics", "note"]}, set()),
 ])
 def test_matches_meta(meta_query, expected_ids):
     filtered = {obj["id"] for obj in EXAMPLE_OBJECTS if _matches_meta(obj, meta_query)}
     assert filtered == expected_ids
 
 
+def test_semantic_tags_match_by_containment():
+    # Deliberate: a tag query matches objects carrying *at least* those tags,
+    # not only objects whose tag list is exactly the queried one.
+    spec = {"metadata": {"semantic_tags": ["physics", "optics", "lens"]}}
+    assert _matches_meta(spec, {"semantic_tags": "optics"})
+    assert _matches_meta(spec, {"semantic_tags": ["lens", "physics"]})
+    assert _matches_meta(spec, {"semantic_tags": ["physics", "optics", "lens"]})
+    assert not _matches_meta(spec, {"semantic_tags": ["physics", "chemistry"]})
+    assert not _matches_meta({"metadata": {}}, {"semantic_tags": "physics"})
+
+
 def test_spatial_only():
     idx = build_index(EXAMPLE_OBJECTS)
     # Query area intersects only o2
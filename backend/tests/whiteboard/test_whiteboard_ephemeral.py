@@ -0,0 +1,35 @@
+from ai_tutor.services import whiteboard_ephemeral
+from ai_tutor.services.whiteboard_ephemeral import EphemeralStore
+
+
+def test_put_defaults_and_clamps_expiry():
+    store = EphemeralStore("s")
+    tag = store.put({"id": "tag", "kind": "question_tag"}, now_ms=1_000)
+    assert tag["metadata"]["expiresAt"] == 1_000 + whiteboard_ephemeral.DEFAULT_TTL_MS
+
+    far = store.put({"id": "hl", "metadata": {"expiresAt": 10**15}}, now_ms=1_000)
+    assert far["metadata"]["expiresAt"] == 1_000 + whiteboard_ephemeral.MAX_TTL_MS
+
+    assert store.put({"kind": "no-id"}, now_ms=1_000) is None
+
+
+def test_expire_only_removes_due_entries_and_caps_new_ids():
+    store = EphemeralStore("s", max_entries=2)
+    store.put({"id": "a", "metadata": {"expiresAt": 100}}, now_ms=0)
+    store.put({"id": "b", "metadata": {"expiresAt": 500}}, now_ms=0)
+    assert store.put({"id": "c"}, now_ms=0) is None  # Full
+    assert store.put({"id": "a", "metadata": {"expiresAt": 200}}, now_ms=0) is not None  # Refresh is fine
+
+    assert store.expire(["a", "b"], now_ms=300) == ["a"]
+    assert [spec["id"] for spec in store.values()] == ["b"]
+
+
+def test_entries_reads_hosted_store_only():
+    store = EphemeralStore("hosted")
+    store.put({"id": "p"}, now_ms=0)
+    whiteboard_ephemeral.register(store)
+    try:
+        assert [spec["id"] for spec in whiteboard_ephemeral.entries("hosted")] == ["p"]
+        assert whiteboard_ephemeral.entries("elsewhere") == []
+    finally:
+        whiteboard_ephemeral.unregister(store)
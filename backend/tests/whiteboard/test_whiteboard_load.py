@@ -0,0 +1,37 @@
+"""Regression gate for the whiteboard sync path (see scripts/load_whiteboard_ws.py).
+
+Budgets can be tightened per environment with WHITEBOARD_LOAD_P95_MS /
+WHITEBOARD_LOAD_P99_MS; the report is printed with ``pytest -s``.
+"""
+
+import os
+
+import pytest
+
+pytest.importorskip("websockets")
+
+from scripts.load_whiteboard_ws import LoadConfig, format_report, percentiles, run_load  # noqa: E402
+
+P95_BUDGET_MS = float(os.environ.get("WHITEBOARD_LOAD_P95_MS", "150"))
+P99_BUDGET_MS = float(os.environ.get("WHITEBOARD_LOAD_P99_MS", "300"))
+
+
+def test_percentiles():
+    samples = [i / 1000 for i in range(1, 101)]  # 1..100 ms
+    result = percentiles(samples)
+    assert result["p50"] == pytest.approx(50.5)
+    assert result["p99"] == pytest.approx(99.01)
+    assert result["max"] == pytest.approx(100.0)
+    assert percentiles([])["n"] == 0
+
+
+@pytest.mark.asyncio
+async def test_sync_path_latency_under_load():
+    report = await run_load(LoadConfig(sessions=2, clients_per_session=3, seconds=1.5, rate=20))
+    print(format_report(report))
+
+    assert report.converged
+    # Every update reaches the other clients of its session (modulo coalescing).
+    assert report.deliveries >= report.updates_sent * (3 - 1) * 0.9
+    assert report.update_latency_ms["p95"] <= P95_BUDGET_MS
+    assert report.update_latency_ms["p99"] <= P99_BUDGET_MS
@@ -0,0 +1,32 @@
+import pytest
+
+from ai_tutor.services import whiteboard_protocol as proto
+
+
+@pytest.mark.parametrize("value", [0, 1, 127, 128, 300, 2**21, 2**40])
+def test_var_uint_roundtrip(value):
+    encoded = proto.write_var_uint(value)
+    assert proto.read_var_uint(encoded + b"tail", 0) == (value, len(encoded))
+
+
+def test_sync_message_roundtrip():
+    framed = proto.encode_sync(proto.SYNC_STEP2, b"\x01" * 200)
+    assert proto.decode_message(framed) == (proto.MESSAGE_SYNC, proto.SYNC_STEP2, b"\x01" * 200)
+    assert proto.decode_message(proto.encode_update(b"u")) == (proto.MESSAGE_SYNC, proto.SYNC_UPDATE, b"u")
+
+
+@pytest.mark.parametrize(
+    "data",
+    [b"", b"\x00", b"\x00\x02\x05abc", b"\x01\x00\x00", b"\x80"],
+)
+def test_decode_rejects_malformed_messages(data):
+    with pytest.raises(ValueError):
+        proto.decode_message(data)
+
+
+def test_ephemeral_message_roundtrip():
+    framed = proto.encode_ephemeral(b'{"set":[]}')
+    assert proto.message_type(framed) == proto.MESSAGE_EPHEMERAL
+    assert proto.decode_ephemeral(framed) == b'{"set":[]}'
+    with pytest.raises(ValueError):
+        proto.decode_ephemeral(proto.encode_update(b"u"))
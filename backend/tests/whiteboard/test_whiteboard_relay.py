@@ -0,0 +1,177 @@
+import asyncio
+import multiprocessing
+import os
+import socket
+import threading
+
+import pytest
+from y_py import YDoc, apply_update, encode_state_as_update, encode_state_vector  # type: ignore
+
+from ai_tutor.services.whiteboard_relay import KIND_UPDATE, WhiteboardRelay, decode_frame, encode_frame
+
+SESSION = "11111111-2222-3333-4444-555555555555"
+
+
+async def _wait_for(predicate, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        if asyncio.get_running_loop().time() > deadline:
+            return False
+        await asyncio.sleep(0.02)
+    return True
+
+
+def test_frame_roundtrip():
+    worker = b"w" * 16
+    assert decode_frame(encode_frame(KIND_UPDATE, worker, b"payload")) == (KIND_UPDATE, worker, b"payload")
+    with pytest.raises(ValueError):
+        decode_frame(b"short")
+
+
+@pytest.mark.asyncio
+async def test_relay_delivers_to_other_workers_and_suppresses_echo(fake_redis):
+    # Two workers on one Redis
+    relay_a = WhiteboardRelay(fake_redis)
+    relay_b = WhiteboardRelay(fake_redis)
+    received_a: list[bytes] = []
+    received_b: list[bytes] = []
+
+    async def on_a(update):
+        received_a.append(update)
+
+    async def on_b(update):
+        received_b.append(update)
+
+    await relay_a.subscribe(SESSION, on_a, lambda sv: None)
+    await relay_b.subscribe(SESSION, on_b, lambda sv: None)
+
+    await relay_a.publish_updates(SESSION, [b"u1", b"u2"])
+    assert await _wait_for(lambda: len(received_b) == 2)
+    await asyncio.sleep(0.05)
+    assert received_b == [b"u1", b"u2"]
+    assert received_a == []  # own frames are not re-applied
+
+    await relay_a.close()
+    await relay_b.close()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_publishes_keep_emission_order():
+    class _SlowFirstRedis:
+        """Pooled client stand-in: the first publish takes longest to land."""
+
+        def __init__(self):
+            self.published: list[bytes] = []
+            self.calls = 0
+
+        async def publish(self, channel, frame):
+            self.calls += 1
+            await asyncio.sleep(0.05 if self.calls == 1 else 0)
+            self.published.append(decode_frame(frame)[2])
+
+    redis = _SlowFirstRedis()
+    relay = WhiteboardRelay(redis)
+    await asyncio.gather(*(relay.publish_updates(SESSION, [f"u{i}".encode()]) for i in range(3)))
+    # y-py drops updates that arrive before their predecessors
+    assert redis.published == [b"u0", b"u1", b"u2"]
+
+
+@pytest.mark.asyncio
+async def test_sync_request_is_answered_with_missing_updates(fake_redis):
+    # Two workers on one Redis
+    relay_a = WhiteboardRelay(fake_redis)
+    relay_b = WhiteboardRelay(fake_redis)
+
+    host = YDoc()
+    with host.begin_transaction() as txn:
+        host.get_map("objects").set(txn, "unpersisted", {"id": "unpersisted"})
+    joiner = YDoc()
+    joiner_objects = joiner.get_map("objects")
+
+    async def on_a(update):
+        apply_update(host, update)
+
+    async def on_b(update):
+        apply_update(joiner, update)
+
+    await relay_a.subscribe(SESSION, on_a, lambda sv: encode_state_as_update(host, sv))
+    await relay_b.subscribe(SESSION, on_b, lambda sv: None)
+
+    await relay_b.request_sync(SESSION, encode_state_vector(joiner))
+    assert await _wait_for(lambda: "unpersisted" in list(joiner_objects.keys()))
+
+    await relay_a.close()
+    await relay_b.close()
+
+
+# --------------------------------------------------------------------------- #
+#  Multi-process convergence
+# --------------------------------------------------------------------------- #
+
+
+class _NullSocket:
+    async def send_bytes(self, data):
+        pass
+
+
+def _worker_main(redis_url: str, index: int, n_objects: int, results) -> None:
+    """Host SESSION in a separate process, write objects and report the final keys."""
+    import redis.asyncio as redis_asyncio
+
+    from ai_tutor.routers import whiteboard_ws
+
+    async def _run():
+        redis = redis_asyncio.from_url(redis_url)
+        doc = await whiteboard_ws._get_or_create_doc(SESSION, redis)
+        doc.attach(_NullSocket())  # Pretend a browser tab is attached here
+
+        client = YDoc()
+        for i in range(n_objects):
+            before = encode_state_vector(client)
+            with client.begin_transaction() as txn:
+                key = f"w{index}-{i}"
+                client.get_map("objects").set(txn, key, {"id": key, "metadata": {"source": "user"}})
+            await whiteboard_ws._handle_client_update(doc, encode_state_as_update(client, before), None)
+            await asyncio.sleep(0.01)
+
+        expected = 2 * n_objects
+        for _ in range(500):
+            if len(list(doc.objects.keys())) >= expected:
+                break
+            await asyncio.sleep(0.02)
+        results.put((index, sorted(doc.objects.keys())))
+        await whiteboard_ws.shutdown_whiteboard()
+        await redis.aclose()
+
+    asyncio.run(_run())
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_two_worker_processes_converge():
+    redis_url = os.environ.get("WHITEBOARD_TEST_REDIS_URL")
+    if not redis_url:
+        # Separate processes need a Redis over TCP: a real one, or fakeredis'
+        fakeredis = pytest.importorskip("fakeredis", reason="set WHITEBOARD_TEST_REDIS_URL or install fakeredis")
+        port = _free_port()
+        server = fakeredis.TcpFakeServer(("127.0.0.1", port), server_type="redis")
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        redis_url = f"redis://127.0.0.1:{port}/0"
+
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    n_objects = 20
+    procs = [ctx.Process(target=_worker_main, args=(redis_url, i, n_objects, results)) for i in range(2)]
+    for proc in procs:
+        proc.start()
+    reports = dict(results.get(timeout=60) for _ in procs)
+    for proc in procs:
+        proc.join(timeout=30)
+
+    expected = sorted(f"w{i}-{j}" for i in range(2) for j in range(n_objects))
+    assert reports[0] == expected
+    assert reports[1] == expected
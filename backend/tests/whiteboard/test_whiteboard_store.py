@@ -0,0 +1,172 @@
+import pytest
+from y_py import YDoc, apply_update, encode_state_as_update, encode_state_vector  # type: ignore
+
+from ai_tutor.services import whiteboard_store
+
+
+def _updates(n: int) -> list[bytes]:
+    """Return *n* incremental updates, each adding one object."""
+    doc = YDoc()
+    objects = doc.get_map("objects")
+    out = []
+    for i in range(n):
+        before = encode_state_vector(doc)
+        with doc.begin_transaction() as txn:
+            objects.set(txn, f"obj-{i}", {"id": f"obj-{i}"})
+        out.append(encode_state_as_update(doc, before))
+    return out
+
+
+def _keys(doc: YDoc) -> set:
+    objects = doc.get_map("objects")
+    return set(objects.keys())
+
+
+@pytest.mark.asyncio
+async def test_load_document_replays_base_and_tail(fake_redis):
+    updates = _updates(5)
+    base_doc = YDoc()
+    for u in updates[:3]:
+        apply_update(base_doc, u)
+    await fake_redis.set(whiteboard_store.snapshot_key("s"), encode_state_as_update(base_doc))
+    await whiteboard_store.append_updates(fake_redis, "s", updates[3:])
+
+    doc = await whiteboard_store.load_document(fake_redis, "s")
+    assert _keys(doc) == {f"obj-{i}" for i in range(5)}
+
+
+@pytest.mark.asyncio
+async def test_load_document_returns_none_when_empty(fake_redis):
+    assert await whiteboard_store.load_document(fake_redis, "missing") is None
+
+
+@pytest.mark.asyncio
+async def test_compact_folds_tail_into_base(fake_redis):
+    await whiteboard_store.append_updates(fake_redis, "s", _updates(10))
+
+    assert await whiteboard_store.compact(fake_redis, "s")
+    assert await fake_redis.llen(whiteboard_store.update_log_key("s")) == 0
+
+    doc = await whiteboard_store.load_document(fake_redis, "s")
+    assert _keys(doc) == {f"obj-{i}" for i in range(10)}
+    # Nothing left to compact
+    assert not await whiteboard_store.compact(fake_redis, "s")
+
+
+@pytest.mark.asyncio
+async def test_compact_drops_legacy_ephemeral_entries(fake_redis):
+    doc = YDoc()
+    with doc.begin_transaction() as txn:
+        doc.get_map("objects").set(txn, "obj", {"id": "obj"})
+        for i in range(100):
+            doc.get_map("ephemeral").set(txn, f"ptr-{i}", {"id": f"ptr-{i}", "points": list(range(50))})
+    update = encode_state_as_update(doc)
+    await whiteboard_store.append_updates(fake_redis, "s", [update])
+
+    assert await whiteboard_store.compact(fake_redis, "s")
+    base = await fake_redis.get(whiteboard_store.snapshot_key("s"))
+    assert len(whiteboard_store.decode_snapshot(base)) < len(update) // 4
+    loaded = await whiteboard_store.load_document(fake_redis, "s")
+    assert _keys(loaded) == {"obj"}
+    assert list(loaded.get_map("ephemeral").keys()) == []
+
+
+@pytest.mark.asyncio
+async def test_compact_keeps_updates_appended_after_its_read(fake_redis):
+    updates = _updates(4)
+    await whiteboard_store.append_updates(fake_redis, "s", updates[:2])
+
+    # Simulate an append racing with compaction: it lands after LRANGE.
+    original_lrange = fake_redis.lrange
+
+    async def racing_lrange(key, start, end):
+        result = await original_lrange(key, start, end)
+        await fake_redis.rpush(key, *updates[2:])
+        return result
+
+    fake_redis.lrange = racing_lrange
+    assert await whiteboard_store.compact(fake_redis, "s")
+    fake_redis.lrange = original_lrange
+
+    assert await fake_redis.llen(whiteboard_store.update_log_key("s")) == 2
+    doc = await whiteboard_store.load_document(fake_redis, "s")
+    assert _keys(doc) == {f"obj-{i}" for i in range(4)}
+
+
+def test_needs_compaction_thresholds(monkeypatch):
+    monkeypatch.setattr(whiteboard_store, "COMPACT_MAX_UPDATES", 10)
+    monkeypatch.setattr(whiteboard_store, "COMPACT_MAX_BYTES", 1000)
+    assert not whiteboard_store.needs_compaction(9, 999)
+    assert whiteboard_store.needs_compaction(10, 0)
+    assert whiteboard_store.needs_compaction(1, 1000)
+
+
+def _text_board(n: int) -> bytes:
+    doc = YDoc()
+    objects = doc.get_map("objects")
+    with doc.begin_transaction() as txn:
+        for i in range(n):
+            objects.set(txn, f"text-{i}", {
+                "id": f"text-{i}",
+                "kind": "text",
+                "text": "Evaporation turns liquid water into vapour that rises into the atmosphere.",
+                "metadata": {"source": "assistant", "role": "explanation"},
+            })
+    return encode_state_as_update(doc)
+
+
+def test_snapshot_container_roundtrip_compresses_text_boards():
+    raw = _text_board(200)
+    blob = whiteboard_store.encode_snapshot(raw)
+
+    assert blob.startswith(whiteboard_store.SNAPSHOT_MAGIC)
+    assert len(blob) < len(raw) / 4
+    assert whiteboard_store.decode_snapshot(blob) == raw
+
+
+def test_small_snapshots_are_stored_uncompressed():
+    raw = _text_board(1)
+    blob = whiteboard_store.encode_snapshot(raw)
+    assert blob[5] == whiteboard_store.CODEC_NONE
+    assert whiteboard_store.decode_snapshot(blob) == raw
+
+
+def test_legacy_raw_snapshot_is_read_as_is():
+    raw = _text_board(3)
+    assert whiteboard_store.decode_snapshot(raw) == raw
+
+
+@pytest.mark.parametrize("corrupt", [
+    lambda b: b[:-1] + bytes([b[-1] ^ 0xFF]),  # Body damaged
+    lambda b: b[:4] + b"\x09" + b[5:],  # Unknown version
+    lambda b: b[:5] + b"\xee" + b[6:],  # Unknown codec
+])
+def test_damaged_snapshot_is_rejected(corrupt):
+    blob = whiteboard_store.encode_snapshot(_text_board(50))
+    with pytest.raises(ValueError):
+        whiteboard_store.decode_snapshot(corrupt(blob))
+
+
+def test_registered_codec_is_used():
+    import zlib
+
+    whiteboard_store.register_codec(200, "zlib9", lambda d: zlib.compress(d, 9), zlib.decompress)
+    try:
+        raw = _text_board(50)
+        blob = whiteboard_store.encode_snapshot(raw, codec="zlib9")
+        assert blob[5] == 200
+        assert whiteboard_store.decode_snapshot(blob) == raw
+    finally:
+        whiteboard_store._CODECS.pop(200)
+
+
+@pytest.mark.asyncio
+async def test_compaction_writes_container_readers_accept(fake_redis, monkeypatch):
+    monkeypatch.setattr(whiteboard_store, "SNAPSHOT_COMPRESS_MIN_BYTES", 0)
+    await whiteboard_store.append_updates(fake_redis, "s", _updates(20))
+    assert await whiteboard_store.compact(fake_redis, "s")
+
+    stored = fake_redis.store[whiteboard_store.snapshot_key("s")]
+    assert stored.startswith(whiteboard_store.SNAPSHOT_MAGIC)
+    doc = await whiteboard_store.load_document(fake_redis, "s")
+    assert _keys(doc) == {f"obj-{i}" for i in range(20)}
@@ -0,0 +1,193 @@
+import types
+
+import pytest
+from y_py import YDoc, encode_state_as_update, encode_state_vector  # type: ignore
+
+from ai_tutor.routers import whiteboard_ws
+from ai_tutor.services import whiteboard_view
+
+SESSION = "view-session"
+
+
+def _write(client: YDoc, key: str, spec) -> bytes:
+    before = encode_state_vector(client)
+    with client.begin_transaction() as txn:
+        objects = client.get_map("objects")
+        if spec is None:
+            objects.pop(txn, key)
+        else:
+            objects.set(txn, key, spec)
+    return encode_state_as_update(client, before)
+
+
+@pytest.fixture(autouse=True)
+def _no_relay(monkeypatch):
+    monkeypatch.setattr(whiteboard_ws, "_RELAY_ENABLED", False)
+
+
+@pytest.mark.asyncio
+async def test_view_follows_applied_deltas(fake_redis):
+    wrapper = whiteboard_ws._SessionDoc(SESSION, fake_redis, coalesce_window_s=0)
+    client = YDoc()
+
+    await whiteboard_ws._handle_client_update(wrapper, _write(client, "a", {"id": "a", "kind": "rect", "metadata": {"source": "user"}}), None)
+    await whiteboard_ws._handle_client_update(wrapper, _write(client, "b", {"id": "b", "kind": "text", "metadata": {"source": "assistant"}}), None)
+    assert set(wrapper.view.objects) == {"a", "b"}
+    # The sanitiser patch is reflected, not the spoofed value
+    assert wrapper.view.get("b")["metadata"]["source"] == "user"
+
+    version = wrapper.view.version
+    await whiteboard_ws._handle_client_update(wrapper, _write(client, "a", None), None)
+    assert wrapper.view.get("a") is None
+    assert wrapper.view.version > version
+
+
+@pytest.mark.asyncio
+async def test_get_view_prefers_hosted_doc_and_falls_back_to_snapshot(fake_redis):
+    assert await whiteboard_view.get_view(fake_redis, SESSION) is None
+
+    wrapper = await whiteboard_ws._get_or_create_doc(SESSION, fake_redis)
+    try:
+        client = YDoc()
+        await whiteboard_ws._handle_client_update(wrapper, _write(client, "a", {"id": "a", "metadata": {"source": "user"}}), None)
+        await wrapper.close_window()
+
+        loads = fake_redis.calls["get"]
+        live = await whiteboard_view.get_view(fake_redis, SESSION)
+        assert live is wrapper.view and live.live
+        assert fake_redis.calls["get"] == loads  # No Redis read for a hosted session
+    finally:
+        await whiteboard_ws._release_doc(SESSION, wrapper, fake_redis)
+
+    detached = await whiteboard_view.get_view(fake_redis, SESSION)
+    assert detached is not wrapper.view and not detached.live
+    assert set(detached.objects) == {"a"}
+
+
+@pytest.mark.asyncio
+async def test_find_object_on_board_reads_hosted_view(fake_redis, monkeypatch):
+    from ai_tutor.skills import layout_board_ops
+
+    async def _redis():
+        return fake_redis
+
+    monkeypatch.setattr(layout_board_ops, "get_redis_client", _redis)
+    view = whiteboard_view.BoardView(SESSION)
+    view.apply_event(whiteboard_view.OBJECTS, {
+        "o1": {"action": "add", "newValue": {"x": 0, "y": 0, "width": 10, "height": 10, "metadata": {"role": "diagram"}}},
+        "o2": {"action": "add", "newValue": {"x": 50, "y": 0, "width": 10, "height": 10, "metadata": {"role": "note"}}},
+    })
+    whiteboard_view.register(view)
+    try:
+        ctx = types.SimpleNamespace(session_id=SESSION)
+        payload, _ = await layout_board_ops.find_object_on_board.__original_func__(ctx, meta_query={"role": "diagram"})
+        assert payload.message_text == "Found 1 objects matching criteria."
+        assert "id" not in view.get("o1")  # The shared spec was not mutated
+        bbox = await layout_board_ops._get_object_bbox_from_yjs(SESSION, "o2")
+        assert bbox is None  # No metadata.bbox / absolute coords in metadata
+    finally:
+        whiteboard_view.unregister(view)
+    assert fake_redis.calls.get("get", 0) == 0
+
+
+def test_spatial_index_follows_moves_and_deletes():
+    view = whiteboard_view.BoardView(SESSION)
+    view.apply_event(whiteboard_view.OBJECTS, {
+        "a": {"action": "add", "newValue": {"x": 0, "y": 0, "width": 10, "height": 10}},
+        "b": {"action": "add", "newValue": {"x": 0, "y": 0, "metadata": {"bbox": [100, 100, 10, 10]}}},
+        "pct": {"action": "add", "newValue": {"xPct": 0.1, "yPct": 0.1}},
+    })
+    assert set(view.spatial.query_intersecting_objects(0, 0, 200, 200)) == {"a", "b"}
+
+    view.apply_event(whiteboard_view.OBJECTS, {"a": {"action": "update", "newValue": {"x": 300, "y": 300, "width": 10, "height": 10}}})
+    assert view.spatial.query_intersecting_objects(0, 0, 20, 20) == []
+    assert view.spatial.query_intersecting_objects(305, 305, 1, 1) == ["a"]
+
+    view.apply_event(whiteboard_view.OBJECTS, {"b": {"action": "delete"}})
+    assert view.spatial.query_intersecting_objects(0, 0, 200, 200) == []
+
+
+@pytest.mark.asyncio
+async def test_spatial_index_is_per_session(fake_redis):
+    first = whiteboard_ws._SessionDoc("s1", fake_redis, coalesce_window_s=0)
+    second = whiteboard_ws._SessionDoc("s2", fake_redis, coalesce_window_s=0)
+    await whiteboard_ws._handle_client_update(first, _write(YDoc(), "a", {"id": "a", "x": 0, "y": 0, "width": 10, "height": 10}), None)
+    await whiteboard_ws._handle_client_update(second, _write(YDoc(), "b", {"id": "b", "x": 0, "y": 0, "width": 10, "height": 10}), None)
+
+    assert first.view.spatial.query_intersecting_objects(0, 0, 5, 5) == ["a"]
+    assert second.view.spatial.query_intersecting_objects(0, 0, 5, 5) == ["b"]
+
+    snapshot = YDoc()
+    _write(snapshot, "c", {"id": "c", "x": 0, "y": 0, "width": 10, "height": 10})
+    detached = whiteboard_view.BoardView.from_ydoc("s3", snapshot)
+    assert detached.spatial.query_intersecting_objects(0, 0, 5, 5) == ["c"]
+
+
+@pytest.mark.asyncio
+async def test_find_object_on_board_combines_metadata_and_spatial_indexes(fake_redis, monkeypatch):
+    from ai_tutor.skills import layout_board_ops
+
+    async def _redis():
+        return fake_redis
+
+    monkeypatch.setattr(layout_board_ops, "get_redis_client", _redis)
+    view = whiteboard_view.BoardView(SESSION)
+    view.apply_event(whiteboard_view.OBJECTS, {
+        f"o{i}": {"action": "add", "newValue": {
+            "x": i * 20, "y": 0, "width": 10, "height": 10,
+            "metadata": {"role": "tick" if i % 2 else "label", "semantic_tags": ["axis"], "topic": "t"},
+        }}
+        for i in range(10)
+    })
+    whiteboard_view.register(view)
+    try:
+        ctx = types.SimpleNamespace(session_id=SESSION)
+        find = layout_board_ops.find_object_on_board.__original_func__
+        payload, _ = await find(ctx, meta_query={"role": "tick", "semantic_tags": "axis", "topic": "t"}, spatial_query=(0, 0, 70, 10))
+        assert payload.message_text == "Found 2 objects matching criteria."  # o1, o3
+
+        view.apply_event(whiteboard_view.OBJECTS, {"o1": {"action": "update", "newValue": {"x": 20, "y": 0, "width": 10, "height": 10, "metadata": {"role": "label"}}}})
+        payload, _ = await find(ctx, meta_query={"role": "tick"}, spatial_query=(0, 0, 70, 10))
+        assert payload.message_text == "Found 1 objects matching criteria."
+    finally:
+        whiteboard_view.unregister(view)
+
+
+@pytest.mark.asyncio
+async def test_find_object_on_board_returns_matches_in_board_order(fake_redis, monkeypatch):
+    from ai_tutor.skills import layout_board_ops
+
+    async def _redis():
+        return fake_redis
+
+    monkeypatch.setattr(layout_board_ops, "get_redis_client", _redis)
+    # Capture the match list the skill hands to its response model
+    monkeypatch.setattr(layout_board_ops, "MessageResponse", types.SimpleNamespace)
+    view = whiteboard_view.BoardView(SESSION)
+    keys = [f"step-{i}" for i in range(40)]
+    view.apply_event(whiteboard_view.OBJECTS, {
+        key: {"action": "add", "newValue": {"x": i, "y": 0, "width": 1, "height": 1, "metadata": {"role": "step"}}}
+        for i, key in enumerate(keys)
+    })
+    whiteboard_view.register(view)
+    try:
+        ctx = types.SimpleNamespace(session_id=SESSION)
+        find = layout_board_ops.find_object_on_board.__original_func__
+        payload, _ = await find(ctx, meta_query={"role": "step"})
+        assert [spec["id"] for spec in payload.data] == keys
+        payload, _ = await find(ctx, meta_query={"role": "step"}, spatial_query=(10, 0, 10, 1))
+        assert [spec["id"] for spec in payload.data] == keys[9:21]
+        # Edits keep an object's place; a deleted and re-added one moves last
+        view.apply_event(whiteboard_view.OBJECTS, {
+            "step-3": {"action": "update", "newValue": {"x": 3, "y": 0, "width": 2, "height": 1, "metadata": {"role": "step"}}},
+            "step-5": {"action": "delete"},
+        })
+        view.apply_event(whiteboard_view.OBJECTS, {
+            "step-5": {"action": "add", "newValue": {"x": 5, "y": 0, "width": 1, "height": 1, "metadata": {"role": "step"}}},
+        })
+        payload, _ = await find(ctx, meta_query={"role": "step"})
+        expected = [key for key, _ in view.items()]
+        assert [spec["id"] for spec in payload.data] == expected
+        assert expected[3] == "step-3" and expected[-1] == "step-5"
+    finally:
+        whiteboard_view.unregister(view)
@@ -0,0 +1,707 @@
+import asyncio
+import time
+
+import pytest
+from y_py import YDoc, apply_update, encode_state_as_update, encode_state_vector  # type: ignore
+
+from ai_tutor.routers.whiteboard_ws import (
+    POLICY_DISCONNECT,
+    POLICY_RESYNC,
+    _SessionDoc,
+    _broadcast,
+    _sanitise_owner_fields,
+)
+
+
+def _seed_board(wrapper: _SessionDoc, n_objects: int) -> YDoc:
+    """Fill *wrapper* with *n_objects* and return a client doc in sync with it."""
+    client = YDoc()
+    objects = client.get_map("objects")
+    with client.begin_transaction() as txn:
+        for i in range(n_objects):
+            objects.set(txn, f"obj-{i}", {"id": f"obj-{i}", "kind": "rect", "metadata": {"source": "user"}})
+    apply_update(wrapper.ydoc, encode_state_as_update(client))
+    wrapper.take_dirty_keys()
+    return client
+
+
+def _client_write(client: YDoc, key: str, spec: dict) -> bytes:
+    """Write *spec* on *client* and return the incremental Yjs update."""
+    before = encode_state_vector(client)
+    with client.begin_transaction() as txn:
+        client.get_map("objects").set(txn, key, spec)
+    return encode_state_as_update(client, before)
+
+
+def _doc_with_persister(redis, interval_s=60.0, max_bytes=10_000_000) -> _SessionDoc:
+    return _SessionDoc(
+        "s1", redis, persist_interval_s=interval_s, persist_max_bytes=max_bytes, coalesce_window_s=0
+    )
+
+
+@pytest.mark.parametrize("board_size", [10, 5000])
+def test_sanitiser_only_visits_changed_keys(board_size, fake_redis):
+    wrapper = _SessionDoc("s1", fake_redis)
+    client = _seed_board(wrapper, board_size)
+
+    update = _client_write(client, "spoof", {"id": "spoof", "kind": "text", "metadata": {"source": "assistant"}})
+    apply_update(wrapper.ydoc, update)
+
+    # The work handed to the sanitiser is the delta, not the whole board.
+    dirty = wrapper.take_dirty_keys()
+    assert dirty == {"spoof"}
+
+    patched = _sanitise_owner_fields(wrapper, dirty)
+    assert patched == ["spoof"]
+    assert wrapper.objects.get("spoof")["metadata"]["source"] == "user"
+    # The patch itself must not leave keys behind for the next update.
+    assert wrapper.take_dirty_keys() == set()
+
+
+def test_sanitiser_rewrites_spoofed_update_to_existing_object(fake_redis):
+    wrapper = _SessionDoc("s1", fake_redis)
+    client = _seed_board(wrapper, 3)
+
+    update = _client_write(client, "obj-1", {"id": "obj-1", "kind": "rect", "metadata": {}})
+    apply_update(wrapper.ydoc, update)
+
+    assert _sanitise_owner_fields(wrapper, wrapper.take_dirty_keys()) == ["obj-1"]
+    assert wrapper.objects.get("obj-1")["metadata"]["source"] == "user"
+
+
+def test_sanitiser_ignores_deleted_keys(fake_redis):
+    wrapper = _SessionDoc("s1", fake_redis)
+    client = _seed_board(wrapper, 2)
+
+    before = encode_state_vector(client)
+    with client.begin_transaction() as txn:
+        client.get_map("objects").pop(txn, "obj-0")
+    apply_update(wrapper.ydoc, encode_state_as_update(client, before))
+
+    assert wrapper.take_dirty_keys() == set()
+
+
+@pytest.mark.asyncio
+async def test_persister_coalesces_updates_within_interval(fake_redis):
+    wrapper = _doc_with_persister(fake_redis, interval_s=0.05)
+    client = YDoc()
+
+    for i in range(200):
+        apply_update(wrapper.ydoc, _client_write(client, f"k{i}", {"metadata": {"source": "user"}}))
+    assert fake_redis.calls.get("rpush", 0) == 0  # Nothing written on the hot path
+
+    await asyncio.sleep(0.15)
+    assert fake_redis.calls["rpush"] == 1
+    assert not wrapper.persister.dirty
+    # Each write appends only the updates themselves, never a full snapshot.
+    assert len(fake_redis.store["yjs:updates:s1"]) == 200
+    assert "yjs:snapshot:s1" not in fake_redis.store
+
+
+@pytest.mark.asyncio
+async def test_persister_flushes_early_on_byte_threshold(fake_redis):
+    wrapper = _doc_with_persister(fake_redis, max_bytes=100)
+
+    wrapper.persister.mark_dirty(b"x" * 60)
+    await asyncio.sleep(0)
+    assert fake_redis.calls.get("rpush", 0) == 0
+    wrapper.persister.mark_dirty(b"x" * 60)
+    await asyncio.sleep(0.01)
+    assert fake_redis.calls["rpush"] == 1
+    await wrapper.persister.close()
+
+
+@pytest.mark.asyncio
+async def test_persister_close_flushes_pending_changes(fake_redis):
+    wrapper = _doc_with_persister(fake_redis)
+    client = YDoc()
+    apply_update(wrapper.ydoc, _client_write(client, "k", {"metadata": {"source": "user"}}))
+
+    assert await wrapper.persister.close()
+    assert fake_redis.calls["rpush"] == 1
+    # Closing a clean persister writes nothing.
+    assert await wrapper.persister.close()
+    assert fake_redis.calls["rpush"] == 1
+
+
+@pytest.mark.asyncio
+async def test_persister_triggers_compaction_past_threshold(fake_redis, monkeypatch):
+    from ai_tutor.services import whiteboard_store
+
+    monkeypatch.setattr(whiteboard_store, "COMPACT_MAX_UPDATES", 5)
+    wrapper = _doc_with_persister(fake_redis)
+    client = YDoc()
+    for i in range(6):
+        apply_update(wrapper.ydoc, _client_write(client, f"k{i}", {"metadata": {"source": "user"}}))
+
+    await wrapper.persister.close()
+    assert fake_redis.store["yjs:updates:s1"] == []
+    restored = await whiteboard_store.load_document(fake_redis, "s1")
+    objects = restored.get_map("objects")
+    assert len(objects.keys()) == 6
+
+
+class _FakeSocket:
+    """Records sent frames; ``stalled`` sockets block in send_bytes until released."""
+
+    def __init__(self, stalled: bool = False):
+        self.sent: list[bytes] = []
+        self.closed_with = None
+        self._release = asyncio.Event()
+        if not stalled:
+            self._release.set()
+
+    def release(self):
+        self._release.set()
+
+    async def send_bytes(self, data):
+        await self._release.wait()
+        self.sent.append(data)
+
+    async def close(self, code=1000, reason=""):
+        self.closed_with = code
+
+
+@pytest.mark.asyncio
+async def test_stalled_peer_does_not_delay_healthy_peers(fake_redis):
+    wrapper = _SessionDoc("s1", fake_redis)
+    healthy, stalled = _FakeSocket(), _FakeSocket(stalled=True)
+    wrapper.attach(healthy)
+    wrapper.attach(stalled, max_queue=1000)
+
+    for i in range(50):
+        _broadcast(f"u{i}".encode(), wrapper.connections, None)
+    await asyncio.sleep(0.01)
+
+    assert len(healthy.sent) == 50
+    assert stalled.sent == [] and wrapper.connections[stalled].backlog == 49
+    stalled.release()
+    await asyncio.sleep(0.01)
+    assert stalled.sent == healthy.sent
+    for ws in list(wrapper.connections):
+        await wrapper.detach(ws)
+
+
+@pytest.mark.asyncio
+async def test_overflowing_peer_is_resynced_with_full_state(fake_redis):
+    wrapper = _SessionDoc("s1", fake_redis)
+    client = _seed_board(wrapper, 3)
+    slow = _FakeSocket(stalled=True)
+    wrapper.attach(slow, max_queue=4, policy=POLICY_RESYNC)
+
+    for i in range(10):
+        _broadcast(_client_write(client, f"k{i}", {"metadata": {"source": "user"}}), wrapper.connections, None)
+    # The first frame is already in flight; the backlog collapsed to one resync.
+    assert wrapper.connections[slow].backlog <= 4
+
+    apply_update(wrapper.ydoc, encode_state_as_update(client))
+    slow.release()
+    await asyncio.sleep(0.01)
+
+    replica = YDoc()
+    for frame in slow.sent:
+        apply_update(replica, frame)
+    objects = replica.get_map("objects")
+    assert set(objects.keys()) == set(wrapper.objects.keys())
+    await wrapper.detach(slow)
+
+
+@pytest.mark.asyncio
+async def test_resync_keeps_handshake_and_ephemeral_frames_of_sync_peer(fake_redis, monkeypatch):
+    from ai_tutor.routers import whiteboard_ws
+    from ai_tutor.services import whiteboard_protocol as proto
+
+    monkeypatch.setattr(whiteboard_ws, "_RELAY_ENABLED", False)
+    wrapper = _SessionDoc("s1", fake_redis, persist_interval_s=60.0, coalesce_window_s=0)
+    writer_client = _seed_board(wrapper, 3)
+    slow = _FakeSocket(stalled=True)
+    writer = wrapper.attach(slow, frame=proto.encode_update, ephemeral=True, max_queue=4, policy=POLICY_RESYNC)
+    writer.send_message(proto.encode_sync(proto.SYNC_STEP1, encode_state_vector(wrapper.ydoc)))
+
+    # The peer's step 1 is answered, then a pointer and a burst of edits overflow its queue
+    peer = YDoc()
+    await whiteboard_ws._handle_sync_message(wrapper, writer, proto.encode_sync(proto.SYNC_STEP1, encode_state_vector(peer)), slow)
+    writer.send_message(proto.encode_ephemeral(b'{"set":[{"id":"ptr"}],"remove":[]}'))
+    for i in range(10):
+        update = _client_write(writer_client, f"k{i}", {"metadata": {"source": "user"}})
+        apply_update(wrapper.ydoc, update)
+        _broadcast(update, wrapper.connections, None)
+    assert writer.backlog <= 4
+
+    slow.release()
+    await asyncio.sleep(0.01)
+    kinds = []
+    for frame in slow.sent:
+        if proto.message_type(frame) == proto.MESSAGE_EPHEMERAL:
+            kinds.append("ephemeral")
+            continue
+        _, sync_type, payload = proto.decode_message(frame)
+        kinds.append(sync_type)
+        if sync_type != proto.SYNC_STEP1:
+            apply_update(peer, payload)
+    assert kinds[:3] == [proto.SYNC_STEP1, proto.SYNC_STEP2, "ephemeral"]
+    assert set(peer.get_map("objects").keys()) == set(wrapper.objects.keys())
+    await wrapper.detach(slow)
+
+
+@pytest.mark.asyncio
+async def test_overflowing_peer_is_disconnected_under_disconnect_policy(fake_redis):
+    wrapper = _SessionDoc("s1", fake_redis)
+    slow, healthy = _FakeSocket(stalled=True), _FakeSocket()
+    wrapper.attach(slow, max_queue=2, policy=POLICY_DISCONNECT)
+    wrapper.attach(healthy)
+
+    for i in range(5):
+        _broadcast(b"u", wrapper.connections, None)
+    await asyncio.sleep(0.01)
+
+    assert slow not in wrapper.connections
+    assert slow.closed_with == 1013
+    assert len(healthy.sent) == 5
+    await wrapper.detach(healthy)
+
+
+@pytest.mark.asyncio
+async def test_window_batches_burst_until_it_closes(fake_redis, monkeypatch):
+    from ai_tutor.routers import whiteboard_ws
+
+    monkeypatch.setattr(whiteboard_ws, "_RELAY_ENABLED", False)
+    wrapper = _SessionDoc("s1", fake_redis, persist_interval_s=60.0, coalesce_window_s=0.05)
+    sender, peer = _FakeSocket(), _FakeSocket()
+    wrapper.attach(sender)
+    wrapper.attach(peer)
+    client = YDoc()
+
+    inputs = []
+    for i in range(30):
+        update = _client_write(client, f"stroke-{i}", {"id": f"stroke-{i}", "metadata": {"source": "user"}})
+        inputs.append(update)
+        await whiteboard_ws._handle_client_update(wrapper, update, sender)
+    await asyncio.sleep(0)
+    assert peer.sent == []  # Held back until the window closes
+    await asyncio.sleep(0.1)
+
+    assert len(peer.sent) == 1  # One merged frame for the whole window
+    assert len(peer.sent[0]) <= sum(map(len, inputs))
+    assert sender.sent == []  # Its own transactions are not echoed
+    assert len(wrapper.persister._pending) == 1
+    replica = YDoc()
+    for frame in peer.sent:
+        apply_update(replica, frame)
+    objects = replica.get_map("objects")
+    assert len(objects.keys()) == 30
+    await wrapper.close_window()
+    for ws in list(wrapper.connections):
+        await wrapper.detach(ws)
+
+
+@pytest.mark.asyncio
+async def test_window_drops_superseded_writes(fake_redis, monkeypatch):
+    from ai_tutor.routers import whiteboard_ws
+
+    monkeypatch.setattr(whiteboard_ws, "_RELAY_ENABLED", False)
+    wrapper = _SessionDoc("s1", fake_redis, persist_interval_s=60.0, coalesce_window_s=0.05)
+    sender, peer = _FakeSocket(), _FakeSocket()
+    wrapper.attach(sender)
+    wrapper.attach(peer)
+    client = YDoc()
+
+    inputs = []
+    for i in range(30):
+        points = list(range(i * 4))  # A stroke growing with every frame
+        update = _client_write(client, "stroke", {"id": "stroke", "points": points, "metadata": {"source": "user"}})
+        inputs.append(update)
+        await whiteboard_ws._handle_client_update(wrapper, update, sender)
+    await asyncio.sleep(0.1)
+
+    assert len(peer.sent) == 1
+    assert len(peer.sent[0]) < sum(map(len, inputs)) / 4
+    replica = YDoc()
+    apply_update(replica, peer.sent[0])
+    assert replica.get_map("objects")["stroke"]["points"] == list(range(29 * 4))
+    await wrapper.close_window()
+    for ws in list(wrapper.connections):
+        await wrapper.detach(ws)
+
+
+@pytest.mark.asyncio
+async def test_window_output_is_not_inflated_by_delete_set(fake_redis, monkeypatch):
+    from ai_tutor.routers import whiteboard_ws
+
+    monkeypatch.setattr(whiteboard_ws, "_RELAY_ENABLED", False)
+    wrapper = _SessionDoc("s1", fake_redis, persist_interval_s=60.0, coalesce_window_s=0.02)
+    client = _seed_board(wrapper, 2000)
+    objects = client.get_map("objects")
+    # What a browser sends: each transaction's own update, not a state-vector diff
+    inputs: list[bytes] = []
+    client.observe_after_transaction(lambda event: inputs.append(event.get_update()))
+
+    # Every other object deleted: a long, fragmented delete set on the server
+    with client.begin_transaction() as txn:
+        for i in range(0, 2000, 2):
+            objects.pop(txn, f"obj-{i}")
+    await whiteboard_ws._handle_client_update(wrapper, inputs.pop(), None)
+    await wrapper.close_window()
+
+    peer = _FakeSocket()
+    wrapper.attach(peer)
+    with client.begin_transaction() as txn:
+        objects.set(txn, "obj-1", {"id": "obj-1", "kind": "rect", "x": 1, "metadata": {"source": "user"}})
+    await whiteboard_ws._handle_client_update(wrapper, inputs[0], None)
+    await wrapper.close_window()
+    await asyncio.sleep(0.01)
+    assert len(peer.sent) == 1
+    assert len(peer.sent[0]) <= len(inputs[0])
+
+    # Edits interleaved with further deletes inside one window
+    peer.sent.clear()
+    del inputs[:]
+    for i in range(3, 40, 4):
+        with client.begin_transaction() as txn:
+            objects.set(txn, f"obj-{i}", {"id": f"obj-{i}", "x": i, "metadata": {"source": "user"}})
+        await whiteboard_ws._handle_client_update(wrapper, inputs[-1], None)
+        with client.begin_transaction() as txn:
+            objects.pop(txn, f"obj-{i + 2}")
+        await whiteboard_ws._handle_client_update(wrapper, inputs[-1], None)
+    await wrapper.close_window()
+    await asyncio.sleep(0.01)
+    assert sum(map(len, peer.sent)) <= sum(map(len, inputs))
+    assert set(wrapper.objects.keys()) == set(objects.keys())
+    await wrapper.detach(peer)
+
+
+@pytest.mark.asyncio
+async def test_deleting_a_placed_object_releases_its_region(fake_redis, monkeypatch):
+    from ai_tutor.routers import whiteboard_ws
+    from ai_tutor.services import layout_allocator
+
+    monkeypatch.setattr(whiteboard_ws, "_RELAY_ENABLED", False)
+    monkeypatch.setattr(layout_allocator, "_allocators", {})
+    wrapper = _SessionDoc("s1", fake_redis, persist_interval_s=60.0, coalesce_window_s=0)
+    placed = await layout_allocator.reserve_region("s1", 400, 200)
+    client = YDoc()
+    spec = {"id": "box", "x": placed["x"], "y": placed["y"], "metadata": {"source": "user", "regionId": placed["regionId"]}}
+    await whiteboard_ws._handle_client_update(wrapper, _client_write(client, "box", spec), None)
+    assert placed["regionId"] in layout_allocator._allocators["s1"]._regions
+
+    before = encode_state_vector(client)
+    with client.begin_transaction() as txn:
+        client.get_map("objects").pop(txn, "box")
+    await whiteboard_ws._handle_client_update(wrapper, encode_state_as_update(client, before), None)
+    assert layout_allocator._allocators["s1"]._regions == {}
+
+
+@pytest.mark.asyncio
+async def test_window_sends_sanitiser_patch_back_to_origin(fake_redis, monkeypatch):
+    from ai_tutor.routers import whiteboard_ws
+
+    monkeypatch.setattr(whiteboard_ws, "_RELAY_ENABLED", False)
+    wrapper = _SessionDoc("s1", fake_redis, persist_interval_s=60.0, coalesce_window_s=0.01)
+    sender = _FakeSocket()
+    wrapper.attach(sender)
+    client = YDoc()
+
+    spoof = _client_write(client, "spoof", {"id": "spoof", "metadata": {"source": "assistant"}})
+    await whiteboard_ws._handle_client_update(wrapper, spoof, sender)
+    await asyncio.sleep(0.04)
+
+    for frame in sender.sent:
+        apply_update(client, frame)
+    assert client.get_map("objects").get("spoof")["metadata"]["source"] == "user"
+    await wrapper.detach(sender)
+
+
+@pytest.mark.asyncio
+async def test_window_does_not_re_emit_foreign_updates(fake_redis, monkeypatch):
+    from ai_tutor.routers import whiteboard_ws
+
+    monkeypatch.setattr(whiteboard_ws, "_RELAY_ENABLED", False)
+    wrapper = _SessionDoc("s1", fake_redis, persist_interval_s=60.0, coalesce_window_s=0.05)
+    local, remote = YDoc(), YDoc()
+
+    await whiteboard_ws._handle_client_update(wrapper, _client_write(local, "mine", {"metadata": {}}), None)
+    await whiteboard_ws._apply_remote_update(wrapper, _client_write(remote, "theirs", {"metadata": {}}))
+    await wrapper.close_window()
+
+    emitted = YDoc()
+    for update in wrapper.persister._pending:
+        apply_update(emitted, update)
+    objects = emitted.get_map("objects")
+    assert set(objects.keys()) == {"mine"}
+    assert set(wrapper.objects.keys()) == {"mine", "theirs"}
+
+
+@pytest.mark.asyncio
+async def test_sync_handshake_sends_only_missing_updates(fake_redis, monkeypatch):
+    from ai_tutor.routers import whiteboard_ws
+    from ai_tutor.services import whiteboard_protocol as proto
+
+    monkeypatch.setattr(whiteboard_ws, "_RELAY_ENABLED", False)
+    wrapper = _SessionDoc("s1", fake_redis, persist_interval_s=60.0, coalesce_window_s=0)
+    client = _seed_board(wrapper, 500)
+    # Something the reconnecting client missed while offline
+    server_side = YDoc()
+    apply_update(server_side, encode_state_as_update(wrapper.ydoc))
+    apply_update(wrapper.ydoc, _client_write(server_side, "missed", {"id": "missed", "metadata": {"source": "user"}}))
+
+    sock = _FakeSocket()
+    writer = wrapper.attach(sock, frame=proto.encode_update)
+    step1 = proto.encode_sync(proto.SYNC_STEP1, encode_state_vector(client))
+    await whiteboard_ws._handle_sync_message(wrapper, writer, step1, sock)
+    await asyncio.sleep(0.01)
+
+    _, sync_type, diff = proto.decode_message(sock.sent[-1])
+    assert sync_type == proto.SYNC_STEP2
+    assert len(diff) < len(wrapper.full_state()) // 50
+    apply_update(client, diff)
+    objects = client.get_map("objects")
+    assert "missed" in objects.keys() and len(objects.keys()) == 501
+
+    # Updates from a v2 client are unwrapped and applied like raw ones
+    framed = proto.encode_update(_client_write(client, "new", {"id": "new", "metadata": {"source": "user"}}))
+    await whiteboard_ws._handle_sync_message(wrapper, writer, framed, sock)
+    assert wrapper.objects.get("new") is not None
+    await wrapper.detach(sock)
+
+
+def _write_ephemeral(wrapper: _SessionDoc, key: str, expires_at_ms: float) -> None:
+    with wrapper.ydoc.begin_transaction() as txn:
+        wrapper.ephemeral.set(txn, key, {"id": key, "kind": "pointer", "metadata": {"expiresAt": expires_at_ms}})
+
+
+@pytest.fixture
+def expiry(monkeypatch):
+    from ai_tutor.routers import whiteboard_ws
+
+    scheduler = whiteboard_ws._ExpiryScheduler()
+    monkeypatch.setattr(whiteboard_ws, "_expiry", scheduler)
+    monkeypatch.setattr(whiteboard_ws, "_RELAY_ENABLED", False)
+    yield scheduler
+
+
+@pytest.mark.asyncio
+async def test_ephemeral_entries_expire_close_to_deadline(fake_redis, expiry, monkeypatch):
+    from ai_tutor.routers import whiteboard_ws
+
+    wrapper = _SessionDoc("s1", fake_redis, persist_interval_s=60.0, coalesce_window_s=0)
+    monkeypatch.setitem(whiteboard_ws._docs, "s1", wrapper)
+    now = time.time() * 1000
+    _write_ephemeral(wrapper, "pointer", now + 40)
+    _write_ephemeral(wrapper, "highlight", now + 3_600_000)
+    expiry.start()
+
+    await asyncio.sleep(0.02)
+    assert wrapper.ephemeral.get("pointer") is not None
+    await asyncio.sleep(0.08)
+    assert wrapper.ephemeral.get("pointer") is None
+    assert wrapper.ephemeral.get("highlight") is not None
+    await expiry.stop()
+
+
+def test_refreshed_entry_outlives_its_stale_heap_item(fake_redis, expiry, monkeypatch):
+    from ai_tutor.routers import whiteboard_ws
+
+    wrapper = _SessionDoc("s1", fake_redis, coalesce_window_s=0)
+    monkeypatch.setitem(whiteboard_ws._docs, "s1", wrapper)
+    _write_ephemeral(wrapper, "pointer", 1_000)
+    _write_ephemeral(wrapper, "pointer", 5_000)  # Refreshed before the first deadline
+
+    assert expiry.expire_due(now_ms=2_000) == []
+    assert wrapper.ephemeral.get("pointer") is not None
+    assert expiry.expire_due(now_ms=5_000) == [wrapper]
+    assert wrapper.ephemeral.get("pointer") is None
+    assert len(expiry) == 0
+
+
+def test_refreshes_do_not_grow_the_expiry_heap(fake_redis, expiry, monkeypatch):
+    from ai_tutor.routers import whiteboard_ws
+
+    wrapper = _SessionDoc("s1", fake_redis, coalesce_window_s=0)
+    monkeypatch.setitem(whiteboard_ws._docs, "s1", wrapper)
+    for i in range(1_000):  # A pointer refreshed at 60 Hz for ~17 s
+        _write_ephemeral(wrapper, "pointer", 1_000 + i)
+        _write_ephemeral(wrapper, "highlight", 500_000)
+    assert len(expiry) <= 4
+
+    assert expiry.expire_due(now_ms=1_998) == []
+    assert expiry.expire_due(now_ms=1_999) == [wrapper]
+    assert wrapper.ephemeral.get("pointer") is None
+    assert wrapper.ephemeral.get("highlight") is not None
+    assert len(expiry) == 1
+
+
+def test_expiry_skips_released_documents(fake_redis, expiry):
+    wrapper = _SessionDoc("gone", fake_redis, coalesce_window_s=0)  # Not registered in _docs
+    _write_ephemeral(wrapper, "pointer", 1_000)
+
+    assert expiry.expire_due(now_ms=2_000) == []
+    assert len(expiry) == 0
+
+
+@pytest.mark.asyncio
+async def test_ephemeral_channel_fans_out_without_touching_the_doc(fake_redis, expiry, monkeypatch):
+    import json
+
+    from ai_tutor.routers import whiteboard_ws
+    from ai_tutor.services import whiteboard_protocol as proto
+
+    wrapper = _SessionDoc("s1", fake_redis, persist_interval_s=60.0, coalesce_window_s=0)
+    monkeypatch.setitem(whiteboard_ws._docs, "s1", wrapper)
+    sender, peer, legacy = _FakeSocket(), _FakeSocket(), _FakeSocket()
+    writer = wrapper.attach(sender, frame=proto.encode_update, ephemeral=True)
+    wrapper.attach(peer, frame=proto.encode_update, ephemeral=True)
+    wrapper.attach(legacy)
+    state_before = wrapper.full_state()
+
+    spec = {"id": "ptr", "kind": "pointer_ping", "x": 1, "y": 2, "metadata": {"source": "assistant", "expiresAt": 1_000}}
+    message = proto.encode_ephemeral(json.dumps({"set": [spec]}).encode())
+    await whiteboard_ws._handle_sync_message(wrapper, writer, message, sender)
+    await asyncio.sleep(0.01)
+
+    assert wrapper.full_state() == state_before
+    assert not wrapper.persister.dirty
+    assert sender.sent == [] and legacy.sent == []
+    relayed = json.loads(proto.decode_ephemeral(peer.sent[-1]))
+    assert relayed["set"][0]["metadata"]["source"] == "user"
+    assert wrapper.ephemeral_store.get("ptr") is not None
+
+    expiry.expire_due(now_ms=time.time() * 1000)
+    await asyncio.sleep(0.01)
+    assert wrapper.ephemeral_store.get("ptr") is None
+    assert json.loads(proto.decode_ephemeral(peer.sent[-1])) == {"set": [], "remove": ["ptr"]}
+    for ws in list(wrapper.connections):
+        await wrapper.detach(ws)
+
+
+def test_legacy_ephemeral_map_is_mirrored_into_the_store(fake_redis, expiry):
+    wrapper = _SessionDoc("s1", fake_redis, coalesce_window_s=0)
+    _write_ephemeral(wrapper, "pointer", 5_000)
+    assert wrapper.ephemeral_store.get("pointer")["metadata"]["expiresAt"] == 5_000
+
+
+@pytest.mark.asyncio
+async def test_legacy_ephemeral_writes_reach_sync_protocol_peers(fake_redis, expiry, monkeypatch):
+    import json
+
+    from ai_tutor.routers import whiteboard_ws
+    from ai_tutor.services import whiteboard_protocol as proto
+
+    wrapper = _SessionDoc("s1", fake_redis, persist_interval_s=60.0, coalesce_window_s=0)
+    monkeypatch.setitem(whiteboard_ws._docs, "s1", wrapper)
+    legacy, other_legacy, peer = _FakeSocket(), _FakeSocket(), _FakeSocket()
+    wrapper.attach(legacy)
+    wrapper.attach(other_legacy)
+    wrapper.attach(peer, frame=proto.encode_update, ephemeral=True)
+
+    client = YDoc()
+    before = encode_state_vector(client)
+    with client.begin_transaction() as txn:
+        client.get_map("ephemeral").set(txn, "ptr", {"id": "ptr", "kind": "pointer", "metadata": {"expiresAt": 1_000}})
+    await whiteboard_ws._handle_client_update(wrapper, encode_state_as_update(client, before), legacy)
+    await asyncio.sleep(0.01)
+
+    # Legacy peers get the Yjs update, the sync-protocol peer the channel message
+    assert legacy.sent == [] and len(other_legacy.sent) == 1
+    def channel():
+        return [json.loads(proto.decode_ephemeral(frame)) for frame in peer.sent if frame[0] == proto.MESSAGE_EPHEMERAL]
+
+    assert [entry["id"] for entry in channel()[-1]["set"]] == ["ptr"]
+
+    expiry.expire_due(now_ms=2_000)
+    await asyncio.sleep(0.01)
+    assert channel()[-1] == {"set": [], "remove": ["ptr"]}
+    for ws in list(wrapper.connections):
+        await wrapper.detach(ws)
+
+
+@pytest.mark.asyncio
+async def test_memory_budget_evicts_least_recently_active_idle_doc(fake_redis, monkeypatch):
+    from ai_tutor.routers import whiteboard_ws
+
+    monkeypatch.setattr(whiteboard_ws, "_RELAY_ENABLED", False)
+    budget = whiteboard_ws._MemoryBudget(budget_bytes=1 << 40, min_idle_s=0.0)
+    monkeypatch.setattr(whiteboard_ws, "_budget", budget)
+    monkeypatch.setattr(whiteboard_ws, "_docs", {})
+
+    docs = {}
+    for name in ("old", "mid", "new"):
+        docs[name] = await whiteboard_ws._get_or_create_doc(name, fake_redis)
+        docs[name].attach(_FakeSocket())
+        client = YDoc()
+        await whiteboard_ws._handle_client_update(docs[name], _client_write(client, "k", {"text": "x" * 2000, "metadata": {}}), None)
+        await docs[name].close_window()
+        await asyncio.sleep(0.001)
+    old_sock = next(iter(docs["old"].connections))
+
+    # Room for everything but the oldest document (sizes vary with client ids)
+    for wrapper in docs.values():
+        wrapper.recalibrate()
+    budget.budget_bytes = budget.resident_bytes - docs["old"].charged
+    assert await budget.enforce() == 1
+
+    assert set(whiteboard_ws._docs) == {"mid", "new"}
+    await asyncio.sleep(0.01)
+    assert old_sock.closed_with == 1001
+    assert budget.resident_bytes <= budget.budget_bytes
+    # Nothing was lost: the evicted board was persisted first
+    restored = await whiteboard_ws.whiteboard_store.load_document(fake_redis, "old")
+    objects = restored.get_map("objects")
+    assert list(objects.keys()) == ["k"]
+    for name in ("mid", "new"):
+        for ws in list(docs[name].connections):
+            await docs[name].detach(ws)
+
+
+@pytest.mark.asyncio
+async def test_memory_budget_keeps_recently_active_docs(fake_redis, monkeypatch):
+    from ai_tutor.routers import whiteboard_ws
+
+    monkeypatch.setattr(whiteboard_ws, "_RELAY_ENABLED", False)
+    budget = whiteboard_ws._MemoryBudget(budget_bytes=1, min_idle_s=60.0)
+    monkeypatch.setattr(whiteboard_ws, "_budget", budget)
+    monkeypatch.setattr(whiteboard_ws, "_docs", {})
+
+    wrapper = await whiteboard_ws._get_or_create_doc("busy", fake_redis)
+    await whiteboard_ws._handle_client_update(wrapper, _client_write(YDoc(), "k", {"metadata": {}}), None)
+
+    assert await budget.enforce() == 0
+    assert "busy" in whiteboard_ws._docs
+    await wrapper.close_window()
+
+
+@pytest.mark.asyncio
+async def test_ingress_limiter_actions():
+    from ai_tutor.routers import whiteboard_ws
+
+    dropper = whiteboard_ws._IngressLimiter(
+        msgs_per_s=10, msg_burst=3, bytes_per_s=1e9, byte_burst=1e9, max_message_bytes=100, action="drop"
+    )
+    verdicts = [await dropper.admit(10) for _ in range(5)]
+    assert verdicts == ["", "", "", "drop", "drop"]
+    assert await dropper.admit(101) == "close"  # Oversize default
+
+    delayer = whiteboard_ws._IngressLimiter(
+        msgs_per_s=1e6, msg_burst=1e6, bytes_per_s=10_000, byte_burst=1_000, max_message_bytes=1_000, action="delay"
+    )
+    start = time.monotonic()
+    for _ in range(3):
+        assert await delayer.admit(1_000) == ""
+    # Burst covers the first message; the other two wait ~0.1 s each.
+    assert 0.15 <= time.monotonic() - start < 1.0
+
+
+@pytest.mark.asyncio
+async def test_ingress_limiter_does_not_hold_the_session_lock(fake_redis, monkeypatch):
+    from ai_tutor.routers import whiteboard_ws
+
+    monkeypatch.setattr(whiteboard_ws, "_RELAY_ENABLED", False)
+    wrapper = _SessionDoc("s1", fake_redis, persist_interval_s=60.0, coalesce_window_s=0)
+    flooder = whiteboard_ws._IngressLimiter(msgs_per_s=5, msg_burst=1, action="delay")
+    assert await flooder.admit(10) == ""
+    throttled = asyncio.create_task(flooder.admit(10))  # Waits ~0.2 s
+
+    # Another client's update goes straight through meanwhile.
+    start = time.monotonic()
+    await whiteboard_ws._handle_client_update(wrapper, _client_write(YDoc(), "k", {"metadata": {}}), None)
+    assert time.monotonic() - start < 0.1
+    assert await throttled == ""
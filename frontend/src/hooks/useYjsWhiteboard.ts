@@ -16,7 +16,93 @@ import { CanvasObjectSpec, WhiteboardAction } from '@/lib/types';
  * the top-level `objects` Y.Map we emit an `ADD_OBJECTS` action; when an entry
  * is deleted we emit `DELETE_OBJECTS`.  This is sufficient for Phase-0, which
  * focuses on unidirectional AI-driven drawing.
+ *
+ * The socket uses the sync protocol (`?proto=2`, y-protocols framing): on
+ * (re)connect we send our state vector and the server replies with only the
+ * updates we are missing.  The Y.Doc outlives individual sockets, so a
+ * reconnect after a brief drop downloads a few bytes instead of the board.
+ *
+ * Pointer pings, highlights and question tags go over the ephemeral channel
+ * (message type 1, JSON `{set, remove}`) instead of the Y.Doc: the server
+ * relays them to peers but never persists them.  Entries are dropped locally
+ * when their `metadata.expiresAt` passes.
  */
+
+// --- y-protocols sync framing (lib0 varUint) --- //
+const MESSAGE_SYNC = 0;
+const MESSAGE_EPHEMERAL = 1;
+const SYNC_STEP1 = 0;
+const SYNC_STEP2 = 1;
+const SYNC_UPDATE = 2;
+const RECONNECT_DELAY_MS = [500, 1000, 2000, 5000];
+
+function writeVarUint(out: number[], value: number) {
+  while (value > 0x7f) {
+    out.push(0x80 | (value & 0x7f));
+    value = Math.floor(value / 128);
+  }
+  out.push(value);
+}
+
+function encodeSync(syncType: number, payload: Uint8Array): Uint8Array {
+  const header: number[] = [];
+  writeVarUint(header, MESSAGE_SYNC);
+  writeVarUint(header, syncType);
+  writeVarUint(header, payload.length);
+  const out = new Uint8Array(header.length + payload.length);
+  out.set(header, 0);
+  out.set(payload, header.length);
+  return out;
+}
+
+function encodeEphemeral(change: EphemeralChange): Uint8Array {
+  const payload = new TextEncoder().encode(JSON.stringify(change));
+  const header: number[] = [];
+  writeVarUint(header, MESSAGE_EPHEMERAL);
+  writeVarUint(header, payload.length);
+  const out = new Uint8Array(header.length + payload.length);
+  out.set(header, 0);
+  out.set(payload, header.length);
+  return out;
+}
+
+type EphemeralChange = { set?: CanvasObjectSpec[]; remove?: string[] };
+
+type DecodedMessage =
+  | { type: typeof MESSAGE_SYNC; syncType: number; payload: Uint8Array }
+  | { type: typeof MESSAGE_EPHEMERAL; change: EphemeralChange };
+
+function decodeMessage(data: Uint8Array): DecodedMessage | null {
+  let pos = 0;
+  const readVarUint = (): number => {
+    let value = 0;
+    let mult = 1;
+    while (pos < data.length) {
+      const byte = data[pos++];
+      value += (byte & 0x7f) * mult;
+      if (byte < 0x80) return value;
+      mult *= 128;
+    }
+    throw new Error('truncated varUint');
+  };
+  try {
+    const messageType = readVarUint();
+    if (messageType === MESSAGE_EPHEMERAL) {
+      const length = readVarUint();
+      if (pos + length > data.length) return null;
+      const change = JSON.parse(new TextDecoder().decode(data.subarray(pos, pos + length)));
+      return { type: MESSAGE_EPHEMERAL, change };
+    }
+    if (messageType !== MESSAGE_SYNC) return null;
+    const syncType = readVarUint();
+    const length = readVarUint();
+    if (pos + length > data.length) return null;
+    return { type: MESSAGE_SYNC, syncType, payload: data.subarray(pos, pos + length) };
+  } catch {
+    return null;
+  }
+}
+
 export function useYjsWhiteboard(
   enabled: boolean,
   dispatchWhiteboardAction: (action: WhiteboardAction | WhiteboardAction[]) => void
@@ -27,32 +113,35 @@ export function useYjsWhiteboard(
 
   const wsRef = useRef<WebSocket | null>(null);
   const docRef = useRef<Y.Doc | null>(null);
+  // Local rendering of an ephemeral entry (set by the effect below)
+  const showEphemeralRef = useRef<((spec: CanvasObjectSpec) => void) | null>(null);
 
-  // Function to add/update an ephemeral object in the Yjs doc
+  // Send a pointer / highlight / question tag over the ephemeral channel
   const writeEphemeral = useCallback((spec: CanvasObjectSpec) => {
-    if (!docRef.current) return;
-    const ephemeralMap = docRef.current.getMap<CanvasObjectSpec>('ephemeral');
-    ephemeralMap.set(spec.id, spec);
+    showEphemeralRef.current?.(spec);
+    const ws = wsRef.current;
+    if (ws && ws.readyState === WebSocket.OPEN) {
+      ws.send(encodeEphemeral({ set: [spec] }));
+    }
   }, []);
 
   useEffect(() => {
     if (!enabled || !sessionId || !token) return;
 
     const backendOrigin = process.env.NEXT_PUBLIC_BACKEND_WS_ORIGIN || 'ws://localhost:8001';
-    const wsUrl = `${backendOrigin}/ws/v2/session/${sessionId}/whiteboard?token=${token}`;
-
-    const ws = new WebSocket(wsUrl);
-    ws.binaryType = 'arraybuffer';
-    wsRef.current = ws;
+    const wsUrl = `${backendOrigin}/ws/v2/session/${sessionId}/whiteboard?token=${token}&proto=2`;
 
     const doc = new Y.Doc();
     docRef.current = doc;
 
     // ------- Relay local updates to server ------- //
+    // Edits made while disconnected are not lost: the server's sync step 1 on
+    // reconnect makes us send back everything it is missing.
     doc.on('update', (update: Uint8Array, origin) => {
       if (origin === 'remote') return; // Skip echoes
-      if (ws.readyState === WebSocket.OPEN) {
-        ws.send(update);
+      const ws = wsRef.current;
+      if (ws && ws.readyState === WebSocket.OPEN) {
+        ws.send(encodeSync(SYNC_UPDATE, update));
       }
     });
 
@@ -99,42 +188,83 @@ export function useYjsWhiteboard(
       if (deleted.length) dispatchWhiteboardAction({ type: 'DELETE_OBJECTS', ids: deleted } as any);
     });
 
-    // ------- Observe ephemeral object changes ------- //
-    const ephemeralMap = doc.getMap<CanvasObjectSpec>('ephemeral');
-    ephemeralMap.observe(event => {
-      event.keys.forEach((change, key) => {
-        if (change.action === 'add') {
-          const spec = ephemeralMap.get(key);
-          if (spec) dispatchWhiteboardAction({ type: 'ADD_EPHEMERAL', spec } as any);
-        } else if (change.action === 'delete') {
-          dispatchWhiteboardAction({ type: 'DELETE_EPHEMERAL', id: key } as any);
-        }
-      });
-    });
+    // ------- Ephemeral entries (not part of the Y.Doc) ------- //
+    const ephemeralTimers = new Map<string, ReturnType<typeof setTimeout>>();
+    const hideEphemeral = (id: string) => {
+      clearTimeout(ephemeralTimers.get(id));
+      if (ephemeralTimers.delete(id)) {
+        dispatchWhiteboardAction({ type: 'DELETE_EPHEMERAL', id } as any);
+      }
+    };
+    const showEphemeral = (spec: CanvasObjectSpec) => {
+      if (!spec?.id) return;
+      // Replace an earlier version (e.g. a pointer that moved)
+      if (ephemeralTimers.has(spec.id)) {
+        clearTimeout(ephemeralTimers.get(spec.id));
+        dispatchWhiteboardAction({ type: 'DELETE_EPHEMERAL', id: spec.id } as any);
+      }
+      dispatchWhiteboardAction({ type: 'ADD_EPHEMERAL', spec } as any);
+      const expiresAt = (spec.metadata as any)?.expiresAt;
+      const ttl = typeof expiresAt === 'number' ? Math.max(0, expiresAt - Date.now()) : 2 ** 31 - 1;
+      ephemeralTimers.set(spec.id, setTimeout(() => hideEphemeral(spec.id), Math.min(ttl, 2 ** 31 - 1)));
+    };
+    showEphemeralRef.current = showEphemeral;
 
     // ------- WebSocket handlers ------- //
-    ws.onopen = () => {
-      // No-op; initial state will arrive via server soon.
-    };
+    let disposed = false;
+    let attempt = 0;
+    let reconnectTimer: ReturnType<typeof setTimeout> | undefined;
 
-    ws.onmessage = ev => {
-      const data = new Uint8Array(ev.data);
-      Y.applyUpdate(doc, data, 'remote');
-    };
+    const connect = () => {
+      const ws = new WebSocket(wsUrl);
+      ws.binaryType = 'arraybuffer';
+      wsRef.current = ws;
 
-    ws.onclose = () => {
-      console.info('[useYjsWhiteboard] socket closed');
-    };
+      ws.onopen = () => {
+        attempt = 0;
+        // Sync step 1: tell the server what we already have.
+        ws.send(encodeSync(SYNC_STEP1, Y.encodeStateVector(doc)));
+      };
 
-    ws.onerror = err => {
-      console.error('[useYjsWhiteboard] socket error', err);
+      ws.onmessage = ev => {
+        const msg = decodeMessage(new Uint8Array(ev.data));
+        if (!msg) return;
+        if (msg.type === MESSAGE_EPHEMERAL) {
+          (msg.change.set ?? []).forEach(showEphemeral);
+          (msg.change.remove ?? []).forEach(hideEphemeral);
+        } else if (msg.syncType === SYNC_STEP1) {
+          // Server's state vector: send back whatever it is missing.
+          ws.send(encodeSync(SYNC_STEP2, Y.encodeStateAsUpdate(doc, msg.payload)));
+        } else if (msg.syncType === SYNC_STEP2 || msg.syncType === SYNC_UPDATE) {
+          Y.applyUpdate(doc, msg.payload, 'remote');
+        }
+      };
+
+      ws.onclose = ev => {
+        console.info('[useYjsWhiteboard] socket closed');
+        // 1008 / 44xx: auth or tenancy rejection – retrying will not help.
+        if (disposed || ev.code === 1008 || (ev.code >= 4400 && ev.code < 4500)) return;
+        const delay = RECONNECT_DELAY_MS[Math.min(attempt++, RECONNECT_DELAY_MS.length - 1)];
+        reconnectTimer = setTimeout(connect, delay);
+      };
+
+      ws.onerror = err => {
+        console.error('[useYjsWhiteboard] socket error', err);
+      };
     };
 
+    connect();
+
     // When the Y.Doc is initially synced (or any time we connect) populate canvas
     emitFullCanvas();
 
     return () => {
-      ws.close();
+      disposed = true;
+      clearTimeout(reconnectTimer);
+      ephemeralTimers.forEach(timer => clearTimeout(timer));
+      showEphemeralRef.current = null;
+      wsRef.current?.close();
+      wsRef.current = null;
       doc.destroy();
     };
     // eslint-disable-next-line react-hooks/exhaustive-deps